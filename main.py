@@ -13,6 +13,7 @@ from services.order_service.main import order_app
 from services.payment_service.main import payment_app
 from services.session_service.main import session_app
 from services.orchestrator.main import app as orchestrator_app
+from services.orchestrator.compensation_queue import compensation_queue
 
 app = FastAPI(title="Ecommerce Cluster")
 
@@ -24,10 +25,19 @@ async def startup_event():
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS order_schema"))
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS payment_schema"))
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS session_schema"))
+        await conn.execute(text("CREATE SCHEMA IF NOT EXISTS orchestrator_schema"))
 
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
 
+    # Mounted sub-apps never run their own startup handlers, so the saga
+    # compensation worker has to be started here
+    await compensation_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await compensation_queue.stop()
+
 app.mount("/products", product_app)
 app.mount("/orders", order_app)
 app.mount("/payments", payment_app)
@@ -1,11 +1,23 @@
-from typing import Literal, TypedDict, List
-from langchain_core.messages import BaseMessage, ToolMessage, HumanMessage
+import os
+from typing import Annotated, Literal, TypedDict, List
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
 
 from .agents import llm, sales_prompt, checkout_prompt
-from .tools import ECommerceTools
+from .tools import ECommerceTools, CheckoutUnavailable, load_cart, run_checkout, session_locks
+from .tool_executor import ParallelToolNode
+from .responses import render_cart, render_checkout
+from .fast_path import parse_intent, record_miss, run_intent
+from .checkpointer import BoundedMemorySaver
+from .context_policy import context_policy
+
+# "deterministic": the Checkout node calls the cart/saga code directly and
+# renders a template; the LLM agent only handles ambiguous requests.
+# "agent": always use the LLM Checkout agent.
+CHECKOUT_NODE_MODE = os.getenv("CHECKOUT_NODE_MODE", "deterministic")
 
 
 # -----------------------------
@@ -28,25 +40,72 @@ checkout_tools = [
 # -----------------------------
 sales_node = create_react_agent(
     llm,
-    tools=sales_tools,
-    state_modifier=sales_prompt,
+    tools=ParallelToolNode(sales_tools, agent="Sales"),
+    state_modifier=context_policy.wrap("Sales", sales_prompt),
 )
 
-checkout_node = create_react_agent(
+checkout_agent = create_react_agent(
     llm,
-    tools=checkout_tools,
-    state_modifier=checkout_prompt,
+    tools=ParallelToolNode(checkout_tools, agent="Checkout"),
+    state_modifier=context_policy.wrap("Checkout", checkout_prompt),
 )
 
 
 class AgentState(TypedDict):
-    messages: List[BaseMessage]
+    # Appended (and merged by message id) across turns, so the checkpointed
+    # thread really carries the conversation; context_policy bounds what is sent.
+    messages: Annotated[List[BaseMessage], add_messages]
+
+
+# -----------------------------
+# DETERMINISTIC CHECKOUT
+# -----------------------------
+# Requests the fixed view_cart -> checkout -> report procedure cannot express
+# (e.g. "checkout, then checkout again") still go to the LLM agent.
+AMBIGUOUS_CHECKOUT_WORDS = ["again", "twice", "then checkout", "then check out", "only", "except", "but not"]
+CART_VIEW_PHRASES = ["view cart", "my cart", "show cart", "see cart", "in my cart", "what's in"]
+PURCHASE_WORDS = ["checkout", "check out", "pay", "buy", "purchase", "order"]
+
+
+def _current_turn(messages: List[BaseMessage]) -> tuple[str, List[BaseMessage]]:
+    """(last human text lower-cased, messages after it)."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return str(messages[i].content).lower(), messages[i + 1:]
+    return "", list(messages)
+
+
+async def checkout_node(state: AgentState, config: RunnableConfig):
+    human, turn = _current_turn(state["messages"])
+    added_this_turn = any(isinstance(m, ToolMessage) and m.name == "add_to_cart" for m in turn)
+
+    if CHECKOUT_NODE_MODE != "deterministic" or any(w in human for w in AMBIGUOUS_CHECKOUT_WORDS):
+        return await checkout_agent.ainvoke(state, config)
+
+    # The thread id IS the session id (see ChatService)
+    session_id = config["configurable"]["thread_id"]
+    wants_view_only = (
+        not added_this_turn
+        and any(p in human for p in CART_VIEW_PHRASES)
+        and not any(w in human for w in PURCHASE_WORDS)
+    )
+    try:
+        if wants_view_only:
+            content = render_cart(await load_cart(session_id))
+        else:
+            async with session_locks.hold(session_id):
+                content = render_checkout(await run_checkout(session_id))
+    except CheckoutUnavailable as e:
+        content = str(e)
+    except Exception as e:
+        content = f"Checkout failed: {e}"
+    return {"messages": [AIMessage(content=content, name="Checkout")]}
 
 
 # -----------------------------
 # SUPERVISOR
 # -----------------------------
-def supervisor_node(state: AgentState) -> Literal["Sales", "Checkout", "__end__"]:
+def supervisor_node(state: AgentState) -> Literal["FastPath", "Sales", "Checkout", "__end__"]:
     messages = state["messages"]
     if not messages:
         return "__end__"
@@ -54,6 +113,11 @@ def supervisor_node(state: AgentState) -> Literal["Sales", "Checkout", "__end__"
     last_message = messages[-1]
     if not isinstance(last_message, HumanMessage):
         return "Sales"
+
+    # Simple, unambiguous commands are answered without any LLM call
+    if parse_intent(last_message.content):
+        return "FastPath"
+    record_miss()
     
     content = last_message.content.lower()
     
@@ -67,6 +131,12 @@ def supervisor_node(state: AgentState) -> Literal["Sales", "Checkout", "__end__"
     return "Sales"
 
 
+async def fast_path_node(state: AgentState, config: RunnableConfig):
+    intent, args = parse_intent(state["messages"][-1].content)
+    content = await run_intent(intent, args, config["configurable"]["thread_id"])
+    return {"messages": [AIMessage(content=content, name="FastPath")]}
+
+
 # -----------------------------
 # ROUTING AFTER SALES
 # -----------------------------
@@ -107,9 +177,10 @@ def post_sales_router(state: AgentState) -> Literal["Checkout", "__end__"]:
 # -----------------------------
 class AgentFactory:
     @staticmethod
-    def create_agent():
+    def create_agent(checkpointer=None):
         workflow = StateGraph(AgentState)
 
+        workflow.add_node("FastPath", fast_path_node)
         workflow.add_node("Sales", sales_node)
         workflow.add_node("Checkout", checkout_node)
 
@@ -118,12 +189,16 @@ class AgentFactory:
             START,
             supervisor_node,
             {
+                "FastPath": "FastPath",
                 "Sales": "Sales",
                 "Checkout": "Checkout",
                 "__end__": END,
             },
         )
 
+        # Fast path answers are final
+        workflow.add_edge("FastPath", END)
+
         # After Sales → Decide if Checkout is needed
         workflow.add_conditional_edges(
             "Sales",
@@ -137,5 +212,7 @@ class AgentFactory:
         # Checkout → End
         workflow.add_edge("Checkout", END)
 
-        checkpointer = MemorySaver()
+        # Bounded in-memory state unless a durable checkpointer is passed in
+        if checkpointer is None:
+            checkpointer = BoundedMemorySaver()
         return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
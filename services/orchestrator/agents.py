@@ -1,7 +1,9 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+from .llm_provider import create_llm
+
+# LLM_PROVIDER=openai (gpt-4o-mini) or fake (scripted, offline)
+llm = create_llm()
 
 # -------------------------------
 # SALES AGENT (SMART BUY HANDLER)
@@ -14,6 +16,7 @@ You are a highly capable Sales Agent for an online retailer.
 
 Rules:
 1. **Search First**: Always use 'search_products' to find products. If the query is empty, it returns all products.
+   Results may come as a table: a header row (id|name|price|stock) then one '|'-separated row per product.
 2. **Implicit Reference ("Buy it")**:
    - If the user says "buy it" immediately after a search, assume they are referring to the products just found.
    - You MUST extract the 'id' from the previous search results.
@@ -21,6 +24,7 @@ Rules:
    - Search for "all" to get the full list.
    - You MUST call 'add_to_cart' separately for EACH individual product.
    - **CRITICAL**: Do NOT pass a list or array of IDs into a single tool call. You must execute the tool multiple times (once per item).
+   - Emit ALL of those 'add_to_cart' calls together in ONE response (parallel tool calls), not one per turn. They are applied to the cart as a single batch.
 4. **Removal**:
    - If the user asks to "remove" an item, first search for the product to get its ID (if not known), then call 'remove_from_cart'.
 5. **Validate Stock**: You MUST check the 'stock' value from the search results. If the user requests a quantity greater than the available stock (even ridiculously large numbers like 9999999), **REFUSE** the purchase specifically due to "insufficient stock", state the actual stock available, and offer them that amount. Do not just say the quantity is "invalid".
@@ -46,7 +50,7 @@ checkout_prompt = ChatPromptTemplate.from_messages([
 You are a Checkout Agent.
 
 Rules:
-1. Always call 'view_cart' first to see the cart state.
+1. Always call 'view_cart' first to see the cart state (possibly a table: a header row, then one '|'-separated row per cart line).
 2. If the cart has items, call 'checkout' to process the entire cart.
 3. **CRITICAL DATA RULE**: In your final response, you MUST explicitly list the following details for **EVERY** item purchased, exactly as returned by the 'checkout' tool:
    - **Product Name**
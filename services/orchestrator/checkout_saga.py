@@ -1,5 +1,7 @@
 import os
 import logging
+from .compensation_queue import compensation_queue
+from .http_clients import http_clients
 from .saga import SagaOrchestrator
 
 logger = logging.getLogger(__name__)
@@ -10,63 +12,103 @@ ORDER_URL = os.getenv("ORDER_URL", "http://localhost:8002")
 PAYMENT_URL = os.getenv("PAYMENT_URL", "http://localhost:8003")
 SESSION_URL = os.getenv("SESSION_URL", "http://localhost:8004")
 
-# Security Headers for internal service-to-service communication
-API_HEADERS = {"X-Internal-API-Key": os.getenv("INTERNAL_API_KEY", "internal-cluster-key-change-me")}
+# "direct": one conditional UPDATE on products.stock per item.
+# "holds":  TTL hold on bucketed stock, confirmed only after payment succeeds.
+STOCK_RESERVATION_MODE = os.getenv("STOCK_RESERVATION_MODE", "direct")
+
+# Every call goes through the shared, pooled per-service clients (http_clients.py),
+# which also carry the internal API key header.
 
 # --- ACTIONS ---
 
 async def lock_cart_item(ctx: dict):
-    client, session_id, pid = ctx["client"], ctx["session_id"], ctx["pid"]
-    resp = await client.delete(f"{SESSION_URL}/{session_id}/items/{pid}", headers=API_HEADERS)
+    session_id, pid = ctx["session_id"], ctx["pid"]
+    resp = await http_clients.get("session").delete(f"{SESSION_URL}/{session_id}/items/{pid}")
     if resp.status_code != 200:
         raise Exception("Item already processed or removed")
 
 async def fetch_product(ctx: dict):
-    client, pid = ctx["client"], ctx["pid"]
-    resp = await client.get(f"{PRODUCT_URL}/{pid}", headers=API_HEADERS)
+    # The checkout tool batch-prefetches every cart product; only fall back to
+    # a per-item lookup when this product was not part of that batch.
+    if "unit_price" in ctx:
+        return
+    pid = ctx["pid"]
+    resp = await http_clients.get("product").get(f"{PRODUCT_URL}/{pid}")
     resp.raise_for_status()
     product = resp.json()
     ctx["product_name"] = product.get("name", "Unknown Product")
     ctx["unit_price"] = product["price"]
 
 async def reduce_stock(ctx: dict):
-    client, pid, qty = ctx["client"], ctx["pid"], ctx["qty"]
-    resp = await client.post(f"{PRODUCT_URL}/{pid}/reduce_stock", json={"quantity": qty}, headers=API_HEADERS)
+    pid, qty = ctx["pid"], ctx["qty"]
+    resp = await http_clients.get("product").post(f"{PRODUCT_URL}/{pid}/reduce_stock", json={"quantity": qty})
+    resp.raise_for_status()
+
+async def hold_stock(ctx: dict):
+    pid, qty = ctx["pid"], ctx["qty"]
+    resp = await http_clients.get("product").post(f"{PRODUCT_URL}/holds", json={"product_id": pid, "quantity": qty})
+    resp.raise_for_status()
+    ctx["hold_id"] = resp.json()["id"]
+
+async def confirm_hold(ctx: dict):
+    hold_id = ctx["hold_id"]
+    resp = await http_clients.get("product").post(f"{PRODUCT_URL}/holds/{hold_id}/confirm")
     resp.raise_for_status()
 
 async def create_order(ctx: dict):
-    client, pid, qty, price = ctx["client"], ctx["pid"], ctx["qty"], ctx["unit_price"]
+    pid, qty, price = ctx["pid"], ctx["qty"], ctx["unit_price"]
     payload = {"product_id": pid, "quantity": qty, "unit_price": price}
-    resp = await client.post(f"{ORDER_URL}/", json=payload, headers=API_HEADERS)
+    resp = await http_clients.get("order").post(f"{ORDER_URL}/", json=payload)
     resp.raise_for_status()
     order = resp.json()
     ctx["order_id"] = order["id"]
     ctx["total_price"] = order["total_price"]
 
 async def process_payment(ctx: dict):
-    client, order_id, amount = ctx["client"], ctx["order_id"], ctx["total_price"]
+    order_id, amount = ctx["order_id"], ctx["total_price"]
     payload = {"order_id": order_id, "amount": amount}
-    resp = await client.post(f"{PAYMENT_URL}/", json=payload, headers=API_HEADERS)
+    resp = await http_clients.get("payment").post(f"{PAYMENT_URL}/", json=payload)
     resp.raise_for_status()
     payment = resp.json()
     ctx["transaction_id"] = payment.get("transaction_id")
 
 
 # --- COMPENSATIONS (Rollbacks) ---
+# Compensations must raise on failure so the compensation queue retries them
+# with backoff. A 404 means the target is already gone (session expired,
+# product deleted, hold reaped, order removed): there is nothing left to undo,
+# so it counts as done instead of being retried until it goes dead.
+
+def _raise_unless_gone(resp, what: str):
+    if resp.status_code == 404:
+        logger.warning(f"Compensation skipped, {what} no longer exists")
+        return
+    resp.raise_for_status()
 
 async def rollback_cart_item(ctx: dict):
-    client, session_id, pid, qty = ctx["client"], ctx["session_id"], ctx["pid"], ctx["qty"]
+    session_id, pid, qty = ctx["session_id"], ctx["pid"], ctx["qty"]
     payload = {"product_id": pid, "quantity": qty}
-    await client.post(f"{SESSION_URL}/{session_id}/items", json=payload, headers=API_HEADERS)
+    resp = await http_clients.get("session").post(f"{SESSION_URL}/{session_id}/items", json=payload)
+    _raise_unless_gone(resp, f"session {session_id}")
 
 async def rollback_stock(ctx: dict):
-    client, pid, qty = ctx["client"], ctx["pid"], ctx["qty"]
-    await client.post(f"{PRODUCT_URL}/{pid}/restore_stock", json={"quantity": qty}, headers=API_HEADERS)
+    pid, qty = ctx["pid"], ctx["qty"]
+    resp = await http_clients.get("product").post(f"{PRODUCT_URL}/{pid}/restore_stock", json={"quantity": qty})
+    _raise_unless_gone(resp, f"product {pid}")
+
+async def release_hold(ctx: dict):
+    hold_id = ctx.get("hold_id")
+    if hold_id:
+        # Releasing an already released or expired hold is a no-op (200)
+        resp = await http_clients.get("product").post(f"{PRODUCT_URL}/holds/{hold_id}/release")
+        _raise_unless_gone(resp, f"hold {hold_id}")
 
 async def rollback_order(ctx: dict):
-    client, order_id = ctx["client"], ctx.get("order_id")
+    order_id = ctx.get("order_id")
     if order_id:
-        await client.patch(f"{ORDER_URL}/{order_id}/cancel", headers=API_HEADERS)
+        # Cancelling an already cancelled order is a no-op (200)
+        resp = await http_clients.get("order").patch(f"{ORDER_URL}/{order_id}/cancel")
+        _raise_unless_gone(resp, f"order {order_id}")
 
 async def rollback_payment(ctx: dict):
     tx_id = ctx.get("transaction_id")
@@ -78,10 +120,33 @@ async def rollback_payment(ctx: dict):
 # --- BUILDER FACTORY ---
 
 def build_checkout_saga() -> SagaOrchestrator:
-    saga = SagaOrchestrator()
-    saga.add_step("lock_cart_item", lock_cart_item, rollback_cart_item)
-    saga.add_step("fetch_product", fetch_product, None) # Read-only, no rollback needed
-    saga.add_step("reduce_stock", reduce_stock, rollback_stock)
-    saga.add_step("create_order", create_order, rollback_order)
-    saga.add_step("process_payment", process_payment, rollback_payment)
-    return saga
\ No newline at end of file
+    """
+    Dependency graph (per cart item):
+
+        lock_cart_item ──┬──> reduce_stock|hold_stock ──┐
+                         └──> create_order <── fetch_product
+                                   └──> process_payment <┘ ──> [confirm_hold]
+
+    Locking the cart line and reading the product are independent, and the
+    order row only needs the lock and the price, so it is created while stock
+    is being reserved. Payment still waits for BOTH the order and the stock.
+    """
+    stock_step = "hold_stock" if STOCK_RESERVATION_MODE == "holds" else "reduce_stock"
+
+    saga = SagaOrchestrator("checkout", compensation_queue)
+    saga.add_step("lock_cart_item", lock_cart_item, rollback_cart_item, depends_on=[])
+    saga.add_step("fetch_product", fetch_product, None, depends_on=[]) # Read-only, no rollback needed
+    if STOCK_RESERVATION_MODE == "holds":
+        saga.add_step("hold_stock", hold_stock, release_hold, depends_on=["lock_cart_item"])
+    else:
+        saga.add_step("reduce_stock", reduce_stock, rollback_stock, depends_on=["lock_cart_item"])
+    saga.add_step("create_order", create_order, rollback_order, depends_on=["lock_cart_item", "fetch_product"])
+    saga.add_step("process_payment", process_payment, rollback_payment, depends_on=["create_order", stock_step])
+    if STOCK_RESERVATION_MODE == "holds":
+        # An expired hold fails here, which refunds the payment and cancels the order
+        saga.add_step("confirm_hold", confirm_hold, None, depends_on=["process_payment"])
+    return saga
+
+
+# Lets the compensation worker map queued step names back to their rollbacks
+compensation_queue.register("checkout", build_checkout_saga)
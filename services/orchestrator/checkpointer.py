@@ -0,0 +1,291 @@
+"""
+LangGraph checkpointers for conversation state.
+
+The stock MemorySaver keeps every checkpoint of every thread forever, and each
+checkpoint holds the FULL message list, so orchestrator RAM grows with both the
+number of conversations and the square of their length. It also pins a thread
+to one process.
+
+Select with CHECKPOINTER_BACKEND:
+  - "memory" (default): BoundedMemorySaver. Keeps only the newest checkpoints
+                        per thread, evicts idle threads (TTL) and the least
+                        recently used ones past a thread count / byte cap.
+                        One process only.
+  - "postgres": AsyncPostgresSaver in `orchestrator_schema` of the shared DB.
+                Any worker or replica can serve any session_id. Needs the
+                `checkpoint-postgres` extra.
+  - "sqlite":   AsyncSqliteSaver on CHECKPOINT_SQLITE_PATH, for local runs.
+                Needs the `checkpoint-sqlite` extra.
+
+Every backend serializes through CompressedSerializer, so large payloads
+(message histories, tool results) are stored zlib-compressed.
+"""
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from shared.config.database import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from shared.observability import (
+    ecomm_checkpoint_bytes,
+    ecomm_checkpoint_evictions_total,
+    ecomm_checkpoint_threads,
+)
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory")
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "10000"))
+CHECKPOINT_THREAD_TTL_SECONDS = float(os.getenv("CHECKPOINT_THREAD_TTL_SECONDS", "86400"))
+CHECKPOINT_MAX_BYTES = int(os.getenv("CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "2"))
+CHECKPOINT_COMPRESS_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "1024"))
+CHECKPOINT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite")
+CHECKPOINT_PG_POOL_SIZE = int(os.getenv("CHECKPOINT_PG_POOL_SIZE", "10"))
+
+
+class CompressedSerializer:
+    """
+    Wraps a serde and zlib-compresses payloads above `min_bytes`. Compressed
+    blobs carry a "z:" type prefix, so uncompressed rows written earlier (or
+    with compression disabled) still load.
+    """
+
+    PREFIX = "z:"
+
+    def __init__(self, inner=None, min_bytes: int = CHECKPOINT_COMPRESS_MIN_BYTES):
+        self.inner = inner or JsonPlusSerializer()
+        self.min_bytes = min_bytes
+
+    def dumps(self, obj):
+        return self.inner.dumps(obj)
+
+    def loads(self, data):
+        return self.inner.loads(data)
+
+    def dumps_typed(self, obj):
+        type_, data = self.inner.dumps_typed(obj)
+        if self.min_bytes and len(data) >= self.min_bytes:
+            return f"{self.PREFIX}{type_}", zlib.compress(data)
+        return type_, data
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.startswith(self.PREFIX):
+            return self.inner.loads_typed((type_[len(self.PREFIX):], zlib.decompress(payload)))
+        return self.inner.loads_typed(data)
+
+
+def _nbytes(value) -> int:
+    """Approximate footprint: the serialized bytes held in a storage entry."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return 0
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver with per-thread retention and LRU/TTL eviction.
+
+    Only the newest `keep_per_thread` checkpoints (and their pending writes) of
+    each namespace are retained, and only the newest subgraph namespace; older
+    ones are never read by a normal invoke. Whole threads are evicted when idle for `ttl_seconds`, or least
+    recently used first once `max_threads` or `max_bytes` is exceeded. An
+    evicted session simply starts a fresh conversation.
+
+    MemorySaver's async methods run the sync ones in a thread pool, so all
+    storage access is serialized with a lock.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int = CHECKPOINT_MAX_THREADS,
+        ttl_seconds: float = CHECKPOINT_THREAD_TTL_SECONDS,
+        max_bytes: int = CHECKPOINT_MAX_BYTES,
+        keep_per_thread: int = CHECKPOINT_KEEP_PER_THREAD,
+        serde=None,
+    ):
+        super().__init__(serde=serde or CompressedSerializer())
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.keep_per_thread = max(1, keep_per_thread)
+        self._lock = threading.RLock()
+        # thread_id -> [last_access (monotonic), bytes]; oldest access first
+        self._threads: "OrderedDict[str, list]" = OrderedDict()
+        self._total_bytes = 0
+
+    def get_tuple(self, config):
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            self._evict_expired()
+            if thread_id in self._threads:
+                self._threads[thread_id][0] = time.monotonic()
+                self._threads.move_to_end(thread_id)
+            return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            self._prune(thread_id, config["configurable"]["checkpoint_ns"])
+            self._account(thread_id)
+            self._evict(keep=thread_id)
+            return result
+
+    def put_writes(self, config, writes, task_id):
+        with self._lock:
+            super().put_writes(config, writes, task_id)
+            self._account(config["configurable"]["thread_id"])
+
+    def _prune(self, thread_id: str, checkpoint_ns: str):
+        namespaces = self.storage[thread_id]
+        # Each turn runs its subgraph under a fresh "<node>:<task_id>" namespace;
+        # only the newest one can still be resumed, earlier turns' are dead weight
+        subgraphs = [ns for ns in namespaces if ns]
+        if len(subgraphs) > 1:
+            latest = max(subgraphs, key=lambda ns: max(namespaces[ns], default=""))
+            for ns in subgraphs:
+                if ns != latest:
+                    for key in list(self._writes_keys(thread_id, {ns: namespaces.pop(ns)})):
+                        self.writes.pop(key, None)
+
+        checkpoints = namespaces.get(checkpoint_ns)
+        if checkpoints is None or len(checkpoints) <= self.keep_per_thread:
+            return
+        # Checkpoint ids are time-ordered (uuid6), so sorting gives age order
+        for checkpoint_id in sorted(checkpoints)[: -self.keep_per_thread]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+    def _writes_keys(self, thread_id: str, namespaces: dict):
+        for checkpoint_ns, checkpoints in namespaces.items():
+            for checkpoint_id in checkpoints:
+                yield (thread_id, checkpoint_ns, checkpoint_id)
+
+    def _account(self, thread_id: str):
+        namespaces = self.storage.get(thread_id, {})
+        size = _nbytes(namespaces) + sum(
+            _nbytes(self.writes.get(key, {})) for key in self._writes_keys(thread_id, namespaces)
+        )
+        entry = self._threads.pop(thread_id, None)
+        self._total_bytes += size - (entry[1] if entry else 0)
+        self._threads[thread_id] = [time.monotonic(), size]
+        self._observe()
+
+    def _drop(self, thread_id: str, reason: str):
+        _, size = self._threads.pop(thread_id)
+        self._total_bytes -= size
+        for key in list(self._writes_keys(thread_id, self.storage.pop(thread_id, {}))):
+            self.writes.pop(key, None)
+        ecomm_checkpoint_evictions_total.labels(reason=reason).inc()
+
+    def _evict_expired(self):
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._threads:
+            thread_id, (last_access, _) = next(iter(self._threads.items()))
+            if last_access > deadline:
+                break
+            self._drop(thread_id, "expired")
+        self._observe()
+
+    def _evict(self, keep: str):
+        self._evict_expired()
+        while len(self._threads) > 1 and (
+            len(self._threads) > self.max_threads or self._total_bytes > self.max_bytes
+        ):
+            thread_id = next(iter(self._threads))
+            if thread_id == keep:
+                break  # Never evict the thread being written
+            self._drop(thread_id, "lru" if len(self._threads) > self.max_threads else "memory")
+        self._observe()
+
+    def _observe(self):
+        ecomm_checkpoint_threads.set(len(self._threads))
+        ecomm_checkpoint_bytes.set(self._total_bytes)
+
+
+class CheckpointerRegistry:
+    """Owns the checkpointer and whatever connection it needs (like http_clients)."""
+
+    def __init__(self, backend: str = CHECKPOINTER_BACKEND):
+        self.backend = backend
+        self._saver = None
+        self._resource = None  # psycopg pool / aiosqlite connection
+
+    async def start(self):
+        """Opens the configured backend. Durable savers need a running loop, hence not at import."""
+        if self._saver is not None:
+            return self._saver
+        serde = CompressedSerializer()
+        if self.backend == "memory":
+            self._saver = BoundedMemorySaver(serde=serde)
+        elif self.backend == "postgres":
+            self._saver = await self._start_postgres(serde)
+        elif self.backend == "sqlite":
+            self._saver = await self._start_sqlite(serde)
+        else:
+            raise ValueError(f"Unknown CHECKPOINTER_BACKEND '{self.backend}' (expected memory, postgres or sqlite)")
+        logger.info(f"Conversation checkpointer: {self.backend}")
+        return self._saver
+
+    async def _start_postgres(self, serde):
+        try:
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+            from psycopg.rows import dict_row
+            from psycopg_pool import AsyncConnectionPool
+        except ImportError as e:
+            raise RuntimeError(
+                "CHECKPOINTER_BACKEND=postgres requires the 'checkpoint-postgres' extra "
+                "(pip install 'langgraph-checkpoint-postgres<2' 'psycopg[binary,pool]')"
+            ) from e
+        conninfo = (
+            f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+            "?options=-csearch_path%3Dorchestrator_schema"
+        )
+        pool = AsyncConnectionPool(
+            conninfo,
+            max_size=CHECKPOINT_PG_POOL_SIZE,
+            open=False,
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        )
+        await pool.open()
+        async with pool.connection() as conn:
+            await conn.execute("CREATE SCHEMA IF NOT EXISTS orchestrator_schema")
+        self._resource = pool
+        saver = AsyncPostgresSaver(pool, serde=serde)
+        await saver.setup()
+        return saver
+
+    async def _start_sqlite(self, serde):
+        try:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError as e:
+            raise RuntimeError(
+                "CHECKPOINTER_BACKEND=sqlite requires the 'checkpoint-sqlite' extra "
+                "(pip install 'langgraph-checkpoint-sqlite<2')"
+            ) from e
+        conn = await aiosqlite.connect(CHECKPOINT_SQLITE_PATH)
+        self._resource = conn
+        saver = AsyncSqliteSaver(conn, serde=serde)
+        await saver.setup()
+        return saver
+
+    async def close(self):
+        resource, self._resource, self._saver = self._resource, None, None
+        if resource is not None:
+            await resource.close()
+
+
+checkpointers = CheckpointerRegistry()
@@ -0,0 +1,246 @@
+"""
+Durable, asynchronous saga compensation.
+
+A failed saga used to await every compensation (more HTTP calls to session,
+product and order) before the user got an answer. Now the saga writes its
+rollback plan to `orchestrator_schema.saga_compensations` and returns at once;
+a background worker drains the table with exponential backoff.
+
+Rows are claimed one at a time with a short lease (next_attempt_at pushed
+forward under SKIP LOCKED) and a fresh claim_token, so several replicas can
+share the queue and a row claimed by a crashed process is picked up again
+once its lease runs out. The lease is renewed before every step, and every
+renewal and progress write is conditional on the token: a worker whose lease
+lapsed and was re-claimed elsewhere stops instead of repeating steps such as
+restore_stock. Keep the lease above one step's HTTP timeout.
+
+The queue is only used while this process runs a worker: start() is called
+from the startup of services/orchestrator/main.py and of the root main.py
+(where the orchestrator is a mounted sub-app and its own startup never
+runs). Without a running worker, sagas roll back inline instead of queueing
+rows nobody drains.
+
+  SAGA_COMPENSATION_MODE            "queue" (default) | "inline"
+  COMPENSATION_POLL_INTERVAL_SECONDS  (default 1)
+  COMPENSATION_BATCH                  (default 20 rows per drain pass)
+  COMPENSATION_LEASE_SECONDS          (default 30)
+  COMPENSATION_MAX_ATTEMPTS           (default 8, then the row is marked 'dead')
+  COMPENSATION_BACKOFF_BASE_SECONDS   (default 1, doubled per attempt, capped at 300)
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import timedelta
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.orm import aliased
+
+from shared.config.database import AsyncSessionLocal, Base, engine
+from shared.observability import (
+    ecomm_saga_compensation_lag_seconds,
+    ecomm_saga_compensation_queue_depth,
+    ecomm_saga_compensation_retries_total,
+    ecomm_saga_compensation_total,
+)
+
+from .models import SagaCompensation
+
+logger = logging.getLogger(__name__)
+
+SAGA_COMPENSATION_MODE = os.getenv("SAGA_COMPENSATION_MODE", "queue")
+COMPENSATION_POLL_INTERVAL_SECONDS = float(os.getenv("COMPENSATION_POLL_INTERVAL_SECONDS", "1"))
+COMPENSATION_BATCH = int(os.getenv("COMPENSATION_BATCH", "20"))
+COMPENSATION_LEASE_SECONDS = float(os.getenv("COMPENSATION_LEASE_SECONDS", "30"))
+COMPENSATION_MAX_ATTEMPTS = int(os.getenv("COMPENSATION_MAX_ATTEMPTS", "8"))
+COMPENSATION_BACKOFF_BASE_SECONDS = float(os.getenv("COMPENSATION_BACKOFF_BASE_SECONDS", "1"))
+COMPENSATION_BACKOFF_MAX_SECONDS = 300.0
+
+
+class CompensationQueue:
+    def __init__(self):
+        # saga name -> builder returning a SagaOrchestrator; used to resolve
+        # step names back to compensation callables (also after a restart)
+        self._sagas = {}
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Queue rollbacks only while a worker in this process will drain them."""
+        return SAGA_COMPENSATION_MODE == "queue" and self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        """Creates the table if needed and starts the worker. No-op in inline mode or if already running."""
+        if SAGA_COMPENSATION_MODE != "queue" or self.enabled:
+            return
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE SCHEMA IF NOT EXISTS orchestrator_schema"))
+                await conn.run_sync(Base.metadata.create_all, tables=[SagaCompensation.__table__])
+                await conn.execute(text(
+                    "ALTER TABLE orchestrator_schema.saga_compensations "
+                    "ADD COLUMN IF NOT EXISTS claim_token VARCHAR"
+                ))
+                for index in SagaCompensation.__table__.indexes:
+                    await conn.run_sync(index.create, checkfirst=True)
+        except Exception as e:
+            # Sagas fall back to inline rollback when the queue cannot be written
+            logger.error(f"Compensation queue unavailable, rolling back inline: {e}")
+            return
+        self._worker = asyncio.create_task(self.run_worker())
+
+    async def stop(self):
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            worker.cancel()
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+
+    def register(self, saga_name: str, builder):
+        self._sagas[saga_name] = builder
+
+    def _compensations(self, saga_name: str) -> dict:
+        saga = self._sagas[saga_name]()
+        return {step.name: step.compensation for step in saga.steps if step.compensation}
+
+    async def enqueue(self, saga_name: str, failed_step: str, step_names: list[str], ctx: dict):
+        """Persists the rollback plan. Raises if it could not be stored (caller falls back to inline)."""
+        async with AsyncSessionLocal() as db:
+            db.add(SagaCompensation(
+                saga_name=saga_name,
+                failed_step=failed_step,
+                remaining_steps=step_names,
+                ctx=ctx,
+            ))
+            await db.commit()
+        self._wakeup.set()
+
+    async def _claim(self, db):
+        """Leases the most overdue pending row to this worker, or returns None."""
+        due = aliased(SagaCompensation)
+        claimable = (
+            select(due.id)
+            .where(due.status == "pending", due.next_attempt_at <= func.now())
+            .order_by(due.next_attempt_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(SagaCompensation)
+            .where(SagaCompensation.id.in_(claimable))
+            .values(
+                next_attempt_at=func.now() + timedelta(seconds=COMPENSATION_LEASE_SECONDS),
+                claim_token=uuid.uuid4().hex,
+            )
+            .returning(SagaCompensation)
+            # Refresh a row this session already holds, or it keeps the previous claim_token
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        entry = result.scalars().first()
+        await db.commit()
+        return entry
+
+    async def _update_claimed(self, db, entry: SagaCompensation, **values) -> bool:
+        """Writes `values` only while `entry` is still ours; False if the claim was lost."""
+        result = await db.execute(
+            update(SagaCompensation)
+            .where(
+                SagaCompensation.id == entry.id,
+                SagaCompensation.claim_token == entry.claim_token,
+                SagaCompensation.status == "pending",
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if result.rowcount != 1:
+            logger.warning(f"Lost the claim on saga compensation #{entry.id}; another worker owns it now")
+            return False
+        return True
+
+    async def _run_entry(self, db, entry: SagaCompensation):
+        compensations = self._compensations(entry.saga_name)
+        remaining = list(entry.remaining_steps)
+        ctx = dict(entry.ctx)
+        while remaining:
+            step_name = remaining[0]
+            # Renew the lease so no other worker can claim the row while this step runs
+            lease = func.now() + timedelta(seconds=COMPENSATION_LEASE_SECONDS)
+            if not await self._update_claimed(db, entry, next_attempt_at=lease):
+                return
+            try:
+                await compensations[step_name](ctx)
+            except Exception as e:
+                attempts = entry.attempts + 1
+                ecomm_saga_compensation_retries_total.labels(step_name=step_name).inc()
+                if attempts >= COMPENSATION_MAX_ATTEMPTS:
+                    logger.critical(
+                        f"CRITICAL: Compensation '{step_name}' of saga #{entry.id} gave up after "
+                        f"{attempts} attempts. Manual intervention required. Error: {e}"
+                    )
+                    status, delay = "dead", 0
+                else:
+                    logger.warning(f"Compensation '{step_name}' of saga #{entry.id} failed (attempt {attempts}): {e}")
+                    status = "pending"
+                    delay = min(COMPENSATION_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), COMPENSATION_BACKOFF_MAX_SECONDS)
+                await self._update_claimed(
+                    db,
+                    entry,
+                    status=status,
+                    attempts=attempts,
+                    last_error=str(e)[:500],
+                    next_attempt_at=func.now() + timedelta(seconds=delay),
+                )
+                return
+
+            remaining.pop(0)
+            ecomm_saga_compensation_total.labels(step_name=step_name).inc()
+            logger.info(f"Rollback successful for step '{step_name}' (saga #{entry.id})")
+            # Record progress per step so a crash never replays a finished compensation
+            if not await self._update_claimed(
+                db, entry, remaining_steps=remaining, status="pending" if remaining else "done"
+            ):
+                return
+
+    async def _observe(self, db):
+        depth, lag = (await db.execute(
+            select(func.count(), func.extract("epoch", func.now() - func.min(SagaCompensation.created_at)))
+            .where(SagaCompensation.status == "pending")
+        )).one()
+        ecomm_saga_compensation_queue_depth.set(depth)
+        ecomm_saga_compensation_lag_seconds.set(float(lag or 0))
+
+    async def drain_once(self, db) -> int:
+        # One row at a time: a claimed row never waits, lease ticking, behind others
+        drained = 0
+        while drained < COMPENSATION_BATCH:
+            entry = await self._claim(db)
+            if entry is None:
+                break
+            await self._run_entry(db, entry)
+            drained += 1
+        await self._observe(db)
+        return drained
+
+    async def run_worker(self):
+        """Background loop started by start(). Safe to run on every replica (SKIP LOCKED + leases)."""
+        while True:
+            self._wakeup.clear()
+            try:
+                async with AsyncSessionLocal() as db:
+                    if await self.drain_once(db) >= COMPENSATION_BATCH:
+                        continue  # Backlog: keep draining without sleeping
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Compensation worker iteration failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), COMPENSATION_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+compensation_queue = CompensationQueue()
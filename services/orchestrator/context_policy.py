@@ -0,0 +1,125 @@
+"""
+What each agent actually sends to the LLM.
+
+The checkpointed thread keeps the whole conversation, but resending all of it
+on every call makes long sessions slower and more expensive per turn. Before
+the agent's prompt template is applied, the history is reduced:
+
+  1. System instructions are de-duplicated (latest copy of each, moved first).
+  2. Tool results from turns older than CONTEXT_TOOL_RESULT_TURNS are elided to
+     a short preview; the current and previous turn keep theirs in full, so
+     "buy it" right after a search still sees the product ids.
+  3. The rest is windowed to CONTEXT_MAX_TOKENS, cutting only at a human turn
+     so an AI tool call is never separated from its tool results. The current
+     turn is always kept.
+
+CONTEXT_MAX_TOKENS=0 disables the window. Token counts are a provider-neutral
+estimate (~4 characters per token) and are exported per call as
+ecomm_llm_prompt_tokens{agent, stage="history"|"prompt"}.
+"""
+import os
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage, trim_messages
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from shared.observability import ecomm_llm_prompt_tokens
+
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+CONTEXT_TOOL_RESULT_TURNS = int(os.getenv("CONTEXT_TOOL_RESULT_TURNS", "2"))
+CONTEXT_ELIDED_TOOL_CHARS = int(os.getenv("CONTEXT_ELIDED_TOOL_CHARS", "200"))
+
+# Fixed id for the per-session instruction ChatService sends every turn: the
+# add_messages reducer replaces a message with the same id instead of appending.
+SESSION_INSTRUCTION_ID = "session-instruction"
+
+
+def approximate_tokens(messages: list[BaseMessage]) -> int:
+    total = 0
+    for message in messages:
+        total += 4 + len(str(message.content)) // 4  # ~4 chars per token + role overhead
+        for call in getattr(message, "tool_calls", None) or []:
+            total += len(str(call.get("args", ""))) // 4 + 4
+    return total
+
+
+class ContextPolicy:
+    def __init__(
+        self,
+        max_tokens: int = CONTEXT_MAX_TOKENS,
+        tool_result_turns: int = CONTEXT_TOOL_RESULT_TURNS,
+        elided_tool_chars: int = CONTEXT_ELIDED_TOOL_CHARS,
+    ):
+        self.max_tokens = max_tokens
+        self.tool_result_turns = tool_result_turns
+        self.elided_tool_chars = elided_tool_chars
+
+    def apply(self, messages: list[BaseMessage]) -> list[BaseMessage]:
+        system, history = self._dedupe_system(messages)
+        history = self._elide_old_tool_results(history)
+        return system + self._window(history, self.max_tokens - approximate_tokens(system))
+
+    @staticmethod
+    def _dedupe_system(messages: list[BaseMessage]):
+        latest: dict[str, SystemMessage] = {}
+        history = []
+        for message in messages:
+            if isinstance(message, SystemMessage):
+                latest.pop(message.content, None)
+                latest[message.content] = message
+            else:
+                history.append(message)
+        return list(latest.values()), history
+
+    def _elide_old_tool_results(self, history: list[BaseMessage]) -> list[BaseMessage]:
+        human_positions = [i for i, m in enumerate(history) if isinstance(m, HumanMessage)]
+        if len(human_positions) <= self.tool_result_turns:
+            return history
+        boundary = human_positions[-self.tool_result_turns] if self.tool_result_turns else len(history)
+
+        reduced = []
+        for i, message in enumerate(history):
+            content = str(message.content)
+            if i < boundary and isinstance(message, ToolMessage) and len(content) > self.elided_tool_chars:
+                message = message.copy(update={
+                    "content": f"{content[:self.elided_tool_chars]}... "
+                               f"[{len(content) - self.elided_tool_chars} chars elided from an earlier turn]"
+                })
+            reduced.append(message)
+        return reduced
+
+    def _window(self, history: list[BaseMessage], budget: int) -> list[BaseMessage]:
+        if self.max_tokens <= 0:
+            return history
+        window = trim_messages(
+            history,
+            max_tokens=max(budget, 0),
+            token_counter=approximate_tokens,
+            strategy="last",
+            start_on="human",
+        )
+        if window:
+            return window
+        # The current turn alone is over budget: send it anyway rather than nothing
+        last_human = max((i for i, m in enumerate(history) if isinstance(m, HumanMessage)), default=0)
+        return history[last_human:]
+
+    def wrap(self, agent: str, prompt: Runnable) -> Runnable:
+        """state_modifier for create_react_agent: policy -> agent prompt -> token metrics."""
+
+        def reduce_history(state: dict) -> dict:
+            ecomm_llm_prompt_tokens.labels(agent=agent, stage="history").observe(
+                approximate_tokens(state["messages"])
+            )
+            return {**state, "messages": self.apply(state["messages"])}
+
+        def observe_prompt(prompt_value: PromptValue) -> PromptValue:
+            ecomm_llm_prompt_tokens.labels(agent=agent, stage="prompt").observe(
+                approximate_tokens(prompt_value.to_messages())
+            )
+            return prompt_value
+
+        return RunnableLambda(reduce_history) | prompt | RunnableLambda(observe_prompt)
+
+
+context_policy = ContextPolicy()
@@ -0,0 +1,78 @@
+"""
+LLM-free fast path for short, unambiguous commands.
+
+The supervisor asks `parse_intent` first. A message is only taken when the
+WHOLE message matches one of the patterns below, so "show my cart and buy a
+mouse" still goes to the agents. Matched commands call the product/session
+code directly and answer from a template.
+
+Metrics:
+  ecomm_fast_path_requests_total{intent}   intent="none" for fall-throughs
+  ecomm_fast_path_latency_seconds{intent}
+"""
+import re
+import time
+
+from shared.observability import ecomm_fast_path_latency_seconds, ecomm_fast_path_requests_total
+
+from .responses import render_cart, render_not_in_cart, render_products, render_removed
+from .tools import list_products, load_cart, remove_cart_line, session_locks
+
+_POLITE = r"(?:please\s+|can you\s+|could you\s+)?"
+_TRAILER = r"(?:\s+please)?[\s.!?]*"
+
+INTENT_PATTERNS = [
+    ("view_cart", re.compile(
+        rf"^{_POLITE}(?:show|view|see|display|check)(?:\s+me)?\s+(?:my|the)\s+cart{_TRAILER}$"
+        rf"|^what'?s\s+in\s+my\s+cart{_TRAILER}$"
+        rf"|^my\s+cart{_TRAILER}$"
+    )),
+    ("remove_item", re.compile(
+        rf"^{_POLITE}(?:remove|delete)\s+(?:product|item)\s*(?:id\s*)?#?(?P<product_id>\d+)"
+        rf"(?:\s+from\s+(?:my|the)\s+cart)?{_TRAILER}$"
+    )),
+    ("list_products", re.compile(
+        rf"^{_POLITE}(?:list|show|display|see)(?:\s+me)?\s+(?:all\s+)?(?:the\s+|your\s+)?(?:available\s+)?products{_TRAILER}$"
+        rf"|^what\s+(?:products\s+)?do\s+you\s+(?:have|sell){_TRAILER}$"
+    )),
+]
+
+
+def parse_intent(text: str):
+    """(intent, args) for a fast-path command, else None."""
+    normalized = " ".join(text.lower().split())
+    for intent, pattern in INTENT_PATTERNS:
+        match = pattern.match(normalized)
+        if match:
+            return intent, {k: int(v) for k, v in match.groupdict().items() if v is not None}
+    return None
+
+
+def record_miss():
+    ecomm_fast_path_requests_total.labels(intent="none").inc()
+
+
+async def run_intent(intent: str, args: dict, session_id: str) -> str:
+    started = time.perf_counter()
+    try:
+        if intent == "view_cart":
+            return render_cart(await load_cart(session_id))
+        if intent == "remove_item":
+            product_id = args["product_id"]
+            async with session_locks.hold(session_id):
+                cart = await load_cart(session_id)
+                items = (cart or {}).get("items", [])
+                if not any(int(item["product_id"]) == product_id for item in items):
+                    return render_not_in_cart(product_id, cart)
+                await remove_cart_line(session_id, product_id)
+            # The lock kept other writers out, so the cart is what we loaded minus that line
+            cart["items"] = [item for item in items if int(item["product_id"]) != product_id]
+            return render_removed(product_id, cart)
+        if intent == "list_products":
+            return render_products(await list_products())
+        raise ValueError(f"Unknown fast-path intent '{intent}'")
+    except Exception as e:
+        return f"Sorry, I couldn't complete that right now: {e}"
+    finally:
+        ecomm_fast_path_requests_total.labels(intent=intent).inc()
+        ecomm_fast_path_latency_seconds.labels(intent=intent).observe(time.perf_counter() - started)
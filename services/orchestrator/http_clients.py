@@ -0,0 +1,146 @@
+"""
+Application-lifetime HTTP clients for every downstream service.
+
+Before this, every tool call and checkout opened its own httpx.AsyncClient and
+paid TCP connect again. Now each downstream gets ONE pooled client, created on
+startup and closed on shutdown, so connections are reused across tool calls,
+saga steps and chat turns.
+
+Pool sizing is per downstream, so a slow service cannot starve the others:
+  HTTP_POOL_MAX_CONNECTIONS[_<NAME>]   (default 100)
+  HTTP_POOL_MAX_KEEPALIVE[_<NAME>]     (default 20)
+  HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS   (default 30)
+  HTTP_CLIENT_TIMEOUT_SECONDS          (default 15)
+  HTTP2_ENABLED=true                   (needs the `h2` package)
+"""
+import asyncio
+import os
+import time
+
+import httpx
+
+from shared.observability import (
+    ecomm_http_pool_in_use,
+    ecomm_http_pool_limit,
+    ecomm_http_pool_wait_seconds,
+)
+
+API_HEADERS = {"X-Internal-API-Key": os.getenv("INTERNAL_API_KEY", "internal-cluster-key-change-me")}
+
+DOWNSTREAM_URLS = {
+    "product": os.getenv("PRODUCT_URL", "http://localhost:8001"),
+    "order": os.getenv("ORDER_URL", "http://localhost:8002"),
+    "payment": os.getenv("PAYMENT_URL", "http://localhost:8003"),
+    "session": os.getenv("SESSION_URL", "http://localhost:8004"),
+}
+
+HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_CLIENT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CLIENT_TIMEOUT_SECONDS", "15"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+
+def _pool_setting(setting: str, downstream: str, default: int) -> int:
+    """Per-downstream override (e.g. HTTP_POOL_MAX_CONNECTIONS_PRODUCT), else the global value."""
+    return int(os.getenv(f"{setting}_{downstream.upper()}", os.getenv(setting, str(default))))
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body wrapper that frees the pool slot once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx does not expose pool occupancy or how long a request queued for a
+    connection. We gate requests with a semaphore sized to the pool limit, so
+    the queueing happens here where it can be measured, and the pool itself
+    never has to wait.
+    """
+
+    def __init__(self, downstream: str, max_connections: int, **kwargs):
+        super().__init__(**kwargs)
+        self.downstream = downstream
+        self._slots = asyncio.Semaphore(max_connections)
+        ecomm_http_pool_limit.labels(downstream=downstream).set(max_connections)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        await self._slots.acquire()
+        ecomm_http_pool_wait_seconds.labels(downstream=self.downstream).observe(time.perf_counter() - started)
+        ecomm_http_pool_in_use.labels(downstream=self.downstream).inc()
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._slots.release()
+                ecomm_http_pool_in_use.labels(downstream=self.downstream).dec()
+
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+
+class HttpClientRegistry:
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, downstream: str) -> httpx.AsyncClient:
+        max_connections = _pool_setting("HTTP_POOL_MAX_CONNECTIONS", downstream, 100)
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=_pool_setting("HTTP_POOL_MAX_KEEPALIVE", downstream, 20),
+            keepalive_expiry=HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        transport = InstrumentedTransport(
+            downstream, max_connections, limits=limits, http2=HTTP2_ENABLED
+        )
+        return httpx.AsyncClient(
+            base_url=DOWNSTREAM_URLS[downstream],
+            headers=API_HEADERS,
+            timeout=HTTP_CLIENT_TIMEOUT_SECONDS,
+            transport=transport,
+        )
+
+    async def start(self):
+        for downstream in DOWNSTREAM_URLS:
+            if downstream not in self._clients:
+                self._clients[downstream] = self._create(downstream)
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get(self, downstream: str) -> httpx.AsyncClient:
+        """The shared client for `downstream`. Created lazily if startup has not run (e.g. scripts)."""
+        client = self._clients.get(downstream)
+        if client is None:
+            client = self._clients[downstream] = self._create(downstream)
+        return client
+
+
+http_clients = HttpClientRegistry()
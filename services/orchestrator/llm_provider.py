@@ -0,0 +1,264 @@
+"""
+Chat model used by the agents, selected by LLM_PROVIDER.
+
+  LLM_PROVIDER=openai   (default) ChatOpenAI, model LLM_MODEL (gpt-4o-mini)
+  LLM_PROVIDER=fake     ScriptedChatModel: no network, no API key
+
+The fake model is rule-based, not random. It reads the latest user message and
+the tool results of the current turn and answers the way the prompts in
+agents.py ask the real agents to: search first, one add_to_cart per product
+(in one parallel step), refuse bad quantities and insufficient stock, list
+cheapest-price ties instead of buying, view_cart -> checkout -> report. It
+emits real tool calls, so the rest of the graph (ToolNode, cart batching,
+sagas, checkpointer, telemetry) runs exactly as in production. That makes it
+the backend for load tests and offline runs; it is not a quality benchmark.
+
+  FAKE_LLM_LATENCY_MS         mean delay per call (default 300)
+  FAKE_LLM_LATENCY_JITTER_MS  +/- spread around the mean (default 0)
+                              derived from the prompt, so reruns are identical
+"""
+import asyncio
+import ast
+import os
+import re
+import time
+import zlib
+from typing import Any, List, Optional
+from uuid import uuid4
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from .context_policy import approximate_tokens
+from .tool_encoding import decode_table
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_LATENCY_JITTER_MS = float(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "0"))
+
+SESSION_ID_PATTERN = re.compile(r"session_id is '([^']+)'")
+BUY_WORDS = {"buy", "add", "order", "purchase", "get", "want", "need"}
+REMOVE_WORDS = {"remove", "delete"}
+EVERYTHING_WORDS = {"everything", "every", "each", "all"}
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+# Words that never belong in a product search
+STOP_WORDS = BUY_WORDS | REMOVE_WORDS | EVERYTHING_WORDS | set(NUMBER_WORDS) | {
+    "find", "search", "show", "list", "me", "i", "please", "the", "some", "of", "to", "my", "from",
+    "cart", "and", "then", "checkout", "check", "out", "unit", "units", "item", "items", "product",
+    "products", "cheapest", "you", "have", "do", "what", "is", "are", "for", "with", "it", "available",
+}
+
+
+def _current_turn(messages: List[BaseMessage]) -> tuple[str, List[BaseMessage]]:
+    """(last human text lower-cased, messages after it)."""
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return str(messages[i].content).lower(), messages[i + 1:]
+    return "", list(messages)
+
+
+def _session_id(messages: List[BaseMessage]) -> str:
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            match = SESSION_ID_PATTERN.search(str(message.content))
+            if match:
+                return match.group(1)
+    return "unknown"
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"-?\d+|[a-z][a-z0-9']*", text)
+
+
+def _quantity(words: List[str]) -> int:
+    for word in words:
+        if re.fullmatch(r"-?\d+", word):
+            return int(word)
+    for word in words:
+        if word in NUMBER_WORDS:
+            return NUMBER_WORDS[word]
+    return 1
+
+
+def _search_queries(text: str) -> List[str]:
+    """One query per "A and B" part; [""] (everything) when nothing specific is named."""
+    queries = []
+    for part in re.split(r"\band\b|,", text):
+        terms = [w for w in _words(part) if w not in STOP_WORDS and not re.fullmatch(r"-?\d+", w)]
+        if terms:
+            # Naive singular of the head noun, so "tennis balls" still matches "Tennis Ball"
+            if len(terms[-1]) > 3 and terms[-1].endswith("s") and not terms[-1].endswith("ss"):
+                terms[-1] = terms[-1][:-1]
+            queries.append(" ".join(terms))
+    return queries or [""]
+
+
+def _parse_products(content: str) -> Optional[List[dict]]:
+    """Search results in either TOOL_RESULT_FORMAT; None if the tool reported an error."""
+    if content.startswith("No products found"):
+        return []
+    if content.startswith("id|"):
+        try:
+            return decode_table(content)
+        except ValueError:
+            return None
+    try:
+        products = ast.literal_eval(content)
+    except (ValueError, SyntaxError):
+        return None
+    return products if isinstance(products, list) else None
+
+
+def _describe(product: dict) -> str:
+    return f"{product['name']} (ID {product['id']}) - ${product['price']}, {product['stock']} in stock"
+
+
+def _tool_call(name: str, **args) -> dict:
+    return {"name": name, "args": args, "id": f"call_{uuid4().hex[:24]}", "type": "tool_call"}
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic stand-in for the Sales and Checkout agents' LLM."""
+
+    model_name: str = "scripted-fake"
+    latency_ms: float = FAKE_LLM_LATENCY_MS
+    jitter_ms: float = FAKE_LLM_LATENCY_JITTER_MS
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _delay_seconds(self, messages: List[BaseMessage]) -> float:
+        if self.jitter_ms <= 0:
+            return max(self.latency_ms, 0) / 1000
+        # Same prompt -> same delay: runs are repeatable without a shared RNG
+        digest = zlib.crc32("".join(str(m.content) for m in messages).encode())
+        spread = (digest % 2001) / 1000 - 1  # [-1, 1]
+        return max(self.latency_ms + spread * self.jitter_ms, 0) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay_seconds(messages))
+        return self._result(messages, kwargs.get("tools") or [])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay_seconds(messages))
+        return self._result(messages, kwargs.get("tools") or [])
+
+    def _result(self, messages: List[BaseMessage], tools: List[dict]) -> ChatResult:
+        tool_names = {t["function"]["name"] for t in tools}
+        if "checkout" in tool_names:
+            message = self._checkout_step(messages)
+        else:
+            message = self._sales_step(messages)
+
+        input_tokens = approximate_tokens(messages)
+        output_tokens = approximate_tokens([message]) + sum(len(str(c["args"])) // 4 for c in message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        message.response_metadata = {"model_name": self.model_name, "finish_reason": "tool_calls" if message.tool_calls else "stop"}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    # --- Sales agent ---
+
+    def _sales_step(self, messages: List[BaseMessage]) -> AIMessage:
+        human, turn = _current_turn(messages)
+        session_id = _session_id(messages)
+        words = _words(human)
+        results = [m for m in turn if isinstance(m, ToolMessage)]
+
+        cart_results = [m for m in results if m.name in ("add_to_cart", "remove_from_cart")]
+        if cart_results:
+            return AIMessage(content="\n".join(str(m.content) for m in cart_results))
+
+        searches = [m for m in results if m.name == "search_products"]
+        if not searches:
+            return AIMessage(content="", tool_calls=[
+                _tool_call("search_products", query=query) for query in _search_queries(human)
+            ])
+
+        found: List[List[dict]] = []
+        for search in searches:
+            products = _parse_products(str(search.content))
+            if products is None:
+                return AIMessage(content=f"Sorry, I couldn't search the catalog right now: {search.content}")
+            found.append(products)
+        if not any(found):
+            return AIMessage(content="Sorry, that product is unavailable: nothing in the catalog matches your request.")
+
+        if REMOVE_WORDS.intersection(words):
+            targets = [products[0] for products in found if products]
+            return AIMessage(content="", tool_calls=[
+                _tool_call("remove_from_cart", session_id=session_id, product_id=p["id"]) for p in targets
+            ])
+
+        if not BUY_WORDS.intersection(words):
+            listed = [p for products in found for p in products]
+            return AIMessage(content="Here is what I found:\n" + "\n".join(f"- {_describe(p)}" for p in listed))
+
+        if EVERYTHING_WORDS.intersection(words):
+            targets = [p for products in found for p in products]
+        else:
+            targets = []
+            for products in found:
+                if not products:
+                    continue
+                cheapest = min(p["price"] for p in products)
+                tied = [p for p in products if p["price"] == cheapest]
+                if "cheapest" in words and len(tied) > 1:
+                    return AIMessage(content=(
+                        f"Several products share the lowest price of ${cheapest}:\n"
+                        + "\n".join(f"- {_describe(p)}" for p in tied)
+                        + "\nWhich one would you like?"
+                    ))
+                targets.append(tied[0] if "cheapest" in words else products[0])
+
+        quantity = _quantity(words)
+        if quantity <= 0:
+            return AIMessage(content=f"I can't add {quantity} items: the quantity must be a positive number.")
+        for product in targets:
+            if quantity > product["stock"]:
+                return AIMessage(content=(
+                    f"Sorry, insufficient stock for {product['name']}: you asked for {quantity} "
+                    f"but only {product['stock']} are available. Would you like {product['stock']} instead?"
+                ))
+        return AIMessage(content="", tool_calls=[
+            _tool_call("add_to_cart", session_id=session_id, product_id=p["id"], quantity=quantity) for p in targets
+        ])
+
+    # --- Checkout agent ---
+
+    def _checkout_step(self, messages: List[BaseMessage]) -> AIMessage:
+        _, turn = _current_turn(messages)
+        session_id = _session_id(messages)
+        # The Sales agent may already have run tools in this turn
+        results = [m for m in turn if isinstance(m, ToolMessage) and m.name in ("view_cart", "checkout")]
+
+        if not results:
+            return AIMessage(content="", tool_calls=[_tool_call("view_cart", session_id=session_id)])
+        last = results[-1]
+        if last.name == "view_cart":
+            if "cart is empty" in str(last.content).lower() or str(last.content).startswith("Error"):
+                return AIMessage(content="Your cart is empty, so there is nothing to check out.")
+            return AIMessage(content="", tool_calls=[_tool_call("checkout", session_id=session_id)])
+        return AIMessage(content=f"Checkout finished:\n{last.content}")
+
+
+def create_llm(model: Optional[str] = None) -> BaseChatModel:
+    """The chat model for LLM_PROVIDER; `model` overrides LLM_MODEL for the OpenAI provider."""
+    if LLM_PROVIDER == "fake":
+        return ScriptedChatModel()
+    if LLM_PROVIDER == "openai":
+        from langchain_openai import ChatOpenAI
+
+        # stream_usage: token counts are reported for streamed calls (/chat/stream) too
+        return ChatOpenAI(model=model or LLM_MODEL, temperature=0, stream_usage=True)
+    raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}' (expected openai or fake)")
@@ -3,7 +3,10 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from shared.security import limiter
 from shared.observability import setup_observability
-from .router import router
+from .router import router, chat_service
+from .http_clients import http_clients
+from .checkpointer import checkpointers
+from .compensation_queue import compensation_queue
 
 app = FastAPI(
     title="Orchestrator Service",
@@ -17,4 +20,17 @@ setup_observability(app, "orchestrator_service")
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-app.include_router(router)
\ No newline at end of file
+app.include_router(router)
+
+# --- SHARED HTTP POOLS + CHECKPOINTER + COMPENSATION WORKER ---
+@app.on_event("startup")
+async def startup_event():
+    await http_clients.start()
+    await chat_service.start()
+    await compensation_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await compensation_queue.stop()
+    await checkpointers.close()
+    await http_clients.close()
\ No newline at end of file
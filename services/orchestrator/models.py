@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
+from shared.config.database import Base
+
+
+class SagaCompensation(Base):
+    """
+    Durable rollback plan of ONE failed saga. `remaining_steps` lists the
+    compensations still to run, in order; the worker pops each one as it
+    succeeds, so a crash re-runs at most the step that was in flight.
+    """
+    __tablename__ = "saga_compensations"
+    __table_args__ = {"schema": "orchestrator_schema"}
+
+    id = Column(Integer, primary_key=True)
+    saga_name = Column(String, nullable=False)
+    failed_step = Column(String, nullable=False)
+    remaining_steps = Column(JSONB, nullable=False)
+    ctx = Column(JSONB, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending -> done | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Set on every claim; renewals and progress writes must match it
+    claim_token = Column(String, nullable=True)
+
+
+# The worker only ever polls pending rows by due time
+Index(
+    "ix_saga_compensations_due",
+    SagaCompensation.next_attempt_at,
+    postgresql_where=SagaCompensation.status == "pending",
+)
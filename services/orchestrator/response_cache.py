@@ -0,0 +1,107 @@
+"""
+Opt-in cache of final answers for read-only browsing turns.
+
+"what products do you have" or "cheapest racket" cost a full ReAct loop plus
+a product search, yet the answer only depends on the question and the
+catalog. With RESPONSE_CACHE_ENABLED=true, ChatService keys such answers on
+(normalised message text, catalog version from product_service) and serves
+repeats without touching the LLM.
+
+A turn is stored only when:
+  - every tool it called is read-only (search_products), and it called at
+    least one, so the answer is grounded in catalog data, not chat history;
+  - the message does not lean on earlier turns ("buy it", "that one").
+Any product write changes the catalog version, so stale entries are simply
+never looked up again and age out through LRU/TTL.
+
+  RESPONSE_CACHE_MAXSIZE      (default 1000)
+  RESPONSE_CACHE_TTL_SECONDS  (default 300)
+"""
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
+
+from shared.observability import ecomm_response_cache_events_total
+
+from .http_clients import http_clients
+
+PRODUCT_URL = os.getenv("PRODUCT_URL", "http://localhost:8001")
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+READ_ONLY_TOOLS = {"search_products"}
+CONTEXT_WORDS = {"it", "its", "that", "this", "those", "these", "them", "one", "ones", "again", "else", "more"}
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s$.']", " ", text.lower()).split()).strip(" .")
+
+
+def is_context_free(text: str) -> bool:
+    return not CONTEXT_WORDS.intersection(normalize(text).split())
+
+
+def is_read_only_turn(messages: list[BaseMessage]) -> bool:
+    """True if the latest turn called only read-only tools, and at least one."""
+    tools_called = set()
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage):
+            tools_called.add(message.name)
+    return bool(tools_called) and tools_called <= READ_ONLY_TOOLS
+
+
+async def fetch_catalog_version() -> Optional[str]:
+    try:
+        resp = await http_clients.get("product").get(f"{PRODUCT_URL}/catalog/version")
+        resp.raise_for_status()
+        return resp.json()["version"]
+    except Exception:
+        return None  # No version, no caching: never risk a stale answer
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple[str, str], tuple[float, str]]" = OrderedDict()
+
+    def get(self, text: str, version: str) -> Optional[str]:
+        key = (normalize(text), version)
+        entry = self._entries.get(key)
+        if entry is None:
+            ecomm_response_cache_events_total.labels(event="miss").inc()
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            ecomm_response_cache_events_total.labels(event="expired").inc()
+            ecomm_response_cache_events_total.labels(event="miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        ecomm_response_cache_events_total.labels(event="hit").inc()
+        return response
+
+    def put(self, text: str, version: str, response: str):
+        if self.maxsize <= 0:
+            return
+        key = (normalize(text), version)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        ecomm_response_cache_events_total.labels(event="store").inc()
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            ecomm_response_cache_events_total.labels(event="eviction").inc()
+
+    def clear(self):
+        self._entries.clear()
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAXSIZE, RESPONSE_CACHE_TTL_SECONDS)
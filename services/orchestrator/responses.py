@@ -0,0 +1,58 @@
+"""
+Templated user-facing responses for the LLM-free paths (deterministic
+Checkout node and the supervisor's fast path).
+"""
+
+
+def render_checkout(results: list[dict]) -> str:
+    lines = []
+    for result in results:
+        if result["ok"]:
+            lines.append(
+                f"- **Product Name:** {result['product_name']} | "
+                f"**Order ID:** {result['order_id']} | "
+                f"**Transaction ID:** {result['transaction_id']} | "
+                f"**Total Paid:** ${result['total_price']}"
+            )
+        else:
+            lines.append(
+                f"- Product {result['product_id']}: checkout failed; the transaction was aborted and rolled back."
+            )
+    if all(result["ok"] for result in results):
+        header = "Your order is complete:"
+    elif any(result["ok"] for result in results):
+        header = "Checkout finished, but some items could not be purchased:"
+    else:
+        header = "Checkout failed:"
+    return "\n".join([header, *lines])
+
+
+def render_cart(cart: dict | None) -> str:
+    items = (cart or {}).get("items", [])
+    if not items:
+        return "Cart is empty."
+    lines = ["Your cart:"]
+    for item in items:
+        name = item.get("name", f"Product {item['product_id']}")
+        price = f" @ ${item['price']}" if "price" in item else ""
+        lines.append(f"- {name} (ID {item['product_id']}) x {item['quantity']}{price}")
+    return "\n".join(lines)
+
+
+def render_products(products: list[dict]) -> str:
+    if not products:
+        return "No products are available right now."
+    lines = ["Here are our products:"]
+    for product in products:
+        lines.append(
+            f"- {product['name']} (ID {product['id']}) — ${product['price']}, {product['stock']} in stock"
+        )
+    return "\n".join(lines)
+
+
+def render_removed(product_id: int, cart: dict | None) -> str:
+    return f"Removed product {product_id} from your cart.\n{render_cart(cart)}"
+
+
+def render_not_in_cart(product_id: int, cart: dict | None) -> str:
+    return f"Product {product_id} is not in your cart, so there was nothing to remove.\n{render_cart(cart)}"
@@ -1,8 +1,16 @@
+import json
+import os
+import time
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from shared.security import get_current_user, limiter
+from shared.observability import ecomm_chat_latency_seconds, ecomm_chat_ttfb_seconds
 from .schemas import ChatRequest, ChatResponse
 from .service import ChatService
 
+# Per user (JWT) or IP; raise it for load tests, e.g. RATE_LIMIT_CHAT=100000/minute
+RATE_LIMIT_CHAT = os.getenv("RATE_LIMIT_CHAT", "10/minute")
+
 router = APIRouter()
 chat_service = ChatService() # Initialize Service
 
@@ -12,12 +20,13 @@ async def health_check():
 
 # --- SECURE ENDPOINT ---
 @router.post("/chat", response_model=ChatResponse)
-@limiter.limit("10/minute")  # Rate limit: 10 requests per minute per user/IP
+@limiter.limit(RATE_LIMIT_CHAT)  # Default: 10 requests per minute per user/IP
 async def chat_endpoint(
     request: Request,                         
     payload: ChatRequest,                      
     user_id: str = Depends(get_current_user)   
 ):
+    started = time.perf_counter()
     try:
         response_text = await chat_service.process_message(
             session_id=payload.session_id,
@@ -25,4 +34,42 @@ async def chat_endpoint(
         )
         return ChatResponse(response=response_text)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ecomm_chat_latency_seconds.labels(endpoint="chat").observe(time.perf_counter() - started)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_turn(session_id: str, message: str):
+    started = time.perf_counter()
+    first_event = True
+    try:
+        async for event, data in chat_service.stream_message(session_id, message):
+            if first_event:
+                # What the user perceives: how soon SOMETHING shows up
+                ecomm_chat_ttfb_seconds.labels(endpoint="chat_stream").observe(time.perf_counter() - started)
+                first_event = False
+            yield _sse(event, data)
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+    finally:
+        ecomm_chat_latency_seconds.labels(endpoint="chat_stream").observe(time.perf_counter() - started)
+
+
+# --- SECURE STREAMING ENDPOINT ---
+@router.post("/chat/stream")
+@limiter.limit(RATE_LIMIT_CHAT)
+async def chat_stream_endpoint(
+    request: Request,
+    payload: ChatRequest,
+    user_id: str = Depends(get_current_user)
+):
+    """Server-Sent Events: node, tool_start, tool_end, token ... then final (or error)."""
+    return StreamingResponse(
+        _stream_turn(payload.session_id, payload.message),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
\ No newline at end of file
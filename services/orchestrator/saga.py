@@ -1,38 +1,102 @@
+import asyncio
 import logging
 from shared.observability import ecomm_saga_compensation_total
 
 logger = logging.getLogger(__name__)
 
+# Sentinel: "depends on the step added just before" (the classic linear saga)
+PREVIOUS_STEP = object()
+
 class SagaStep:
-    def __init__(self, name, action, compensation=None):
+    def __init__(self, name, action, compensation=None, depends_on=()):
         self.name = name
         self.action = action
         self.compensation = compensation
+        self.depends_on = tuple(depends_on)
 
 class SagaOrchestrator:
-    def __init__(self):
+    """
+    Steps form a DAG. By default each step depends on the one added before it,
+    which is the plain sequential saga; pass `depends_on` to let independent
+    steps run concurrently. Dependencies must already be added, so the graph is
+    acyclic by construction.
+
+    With a `compensation_queue`, a failed saga persists its rollback plan and
+    returns immediately; the queue's worker runs the compensations. If the
+    plan cannot be stored, compensations run inline as before.
+    """
+
+    def __init__(self, name: str = "saga", compensation_queue=None):
+        self.name = name
+        self.compensation_queue = compensation_queue
         self.steps = []
 
-    def add_step(self, name: str, action, compensation=None):
-        """Builder pattern to add a step and its rollback compensation."""
-        self.steps.append(SagaStep(name, action, compensation))
+    def add_step(self, name: str, action, compensation=None, depends_on=PREVIOUS_STEP):
+        """Builder pattern to add a step, its rollback compensation and its prerequisites."""
+        known = {step.name for step in self.steps}
+        if name in known:
+            raise ValueError(f"Duplicate saga step '{name}'")
+        if depends_on is PREVIOUS_STEP:
+            depends_on = [self.steps[-1].name] if self.steps else []
+        missing = [dep for dep in depends_on if dep not in known]
+        if missing:
+            raise ValueError(f"Saga step '{name}' depends on unknown step(s): {missing}")
+        self.steps.append(SagaStep(name, action, compensation, depends_on))
         return self
 
     async def execute(self, ctx: dict):
-        """Executes steps sequentially. Triggers rollback on any exception."""
-        executed_steps = []
-        try:
-            for step in self.steps:
-                await step.action(ctx)
-                executed_steps.append(step)
-            return True
-        except Exception as e:
-            logger.error(f"Saga execution failed at step '{step.name}': {e}")
-            await self._rollback(executed_steps, ctx)
-            raise e
+        """
+        Starts every step as soon as its dependencies have completed. On the
+        first failure no new steps are started, in-flight steps are allowed to
+        finish (so their side effects can be compensated), then rollback runs.
+        """
+        completed = []      # Completion order is a valid topological order
+        done_names = set()
+        pending = list(self.steps)
+        running = {}        # task -> step
+        failure = None
+
+        while True:
+            if failure is None:
+                for step in [s for s in pending if done_names.issuperset(s.depends_on)]:
+                    pending.remove(step)
+                    running[asyncio.create_task(step.action(ctx))] = step
+            if not running:
+                break
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                step = running.pop(task)
+                if task.exception() is None:
+                    completed.append(step)
+                    done_names.add(step.name)
+                elif failure is None:
+                    failure = (step, task.exception())
+                    logger.error(f"Saga execution failed at step '{step.name}': {failure[1]}")
+                else:
+                    logger.error(f"Saga step '{step.name}' also failed during abort: {task.exception()}")
+
+        if failure is not None:
+            await self._compensate(completed, ctx, failure[0])
+            raise failure[1]
+        return True
+
+    async def _compensate(self, executed_steps: list, ctx: dict, failed_step: SagaStep):
+        queue = self.compensation_queue
+        if queue is not None and queue.enabled:
+            plan = [step.name for step in reversed(executed_steps) if step.compensation]
+            if not plan:
+                return
+            try:
+                await queue.enqueue(self.name, failed_step.name, plan, ctx)
+                logger.info(f"Saga rollback queued: {plan}")
+                return
+            except Exception as e:
+                logger.error(f"Could not queue saga compensations, rolling back inline: {e}")
+        await self._rollback(executed_steps, ctx)
 
     async def _rollback(self, executed_steps: list, ctx: dict):
-        """Executes compensations in reverse order. Wraps each in a try/except."""
+        """Executes compensations in reverse completion (reverse topological) order. Wraps each in a try/except."""
         logger.info("Initiating Saga Rollback...")
         for step in reversed(executed_steps):
             if step.compensation:
@@ -42,4 +106,4 @@ class SagaOrchestrator:
                     ecomm_saga_compensation_total.labels(step_name=step.name).inc()
                 except Exception as ce:
                     # A failing compensation MUST NOT block other compensations
-                    logger.critical(f"CRITICAL: Compensation failed for '{step.name}'. Manual intervention may be required. Error: {ce}")
\ No newline at end of file
+                    logger.critical(f"CRITICAL: Compensation failed for '{step.name}'. Manual intervention may be required. Error: {ce}")
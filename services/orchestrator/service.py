@@ -1,26 +1,106 @@
-from langchain_core.messages import SystemMessage, HumanMessage
+from typing import AsyncIterator
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
 from .agent import AgentFactory
+from .checkpointer import checkpointers
+from .context_policy import SESSION_INSTRUCTION_ID
+from .telemetry import telemetry_handler
+from .response_cache import (
+    RESPONSE_CACHE_ENABLED,
+    fetch_catalog_version,
+    is_context_free,
+    is_read_only_turn,
+    response_cache,
+)
+
+# Graph nodes reported as "node" events on the streaming endpoint
+STREAMED_NODES = {"FastPath", "Sales", "Checkout"}
 
 class ChatService:
     def __init__(self):
         self.agent = AgentFactory.create_agent()
 
-    async def process_message(self, session_id: str, message: str) -> str:
+    async def start(self):
+        """Recompiles the graph on the configured checkpointer (durable ones need the event loop)."""
+        self.agent = AgentFactory.create_agent(await checkpointers.start())
+
+    def _prepare(self, session_id: str, message: str):
         # Config contains the session_id for memory (LangGraph Checkpointer)
-        config = {"configurable": {"thread_id": session_id}}
-        
+        # and the handler that times LLM calls, graph nodes and tools
+        config = {"configurable": {"thread_id": session_id}, "callbacks": [telemetry_handler]}
+
         # We inject the session_id explicitly so the LLM knows it.
         # This prevents it from hallucinating "session_id" as the ID.
         system_instruction = f"You are a shopping assistant. Your current session_id is '{session_id}'. You MUST use this ID for all tool calls."
-        
+
         inputs = {
             "messages": [
-                SystemMessage(content=system_instruction),
+                # Stable id: replaces last turn's copy instead of piling up
+                SystemMessage(content=system_instruction, id=SESSION_INSTRUCTION_ID),
                 HumanMessage(content=message)
             ]
         }
-        
+        return config, inputs
+
+    async def _cached_response(self, config: dict, inputs: dict, message: str):
+        """(catalog version, cached answer). Opt-in: repeated browsing questions skip the LLM entirely."""
+        if not (RESPONSE_CACHE_ENABLED and is_context_free(message)):
+            return None, None
+        version = await fetch_catalog_version()
+        cached = response_cache.get(message, version) if version else None
+        if cached is not None:
+            # Still record the exchange so follow-up turns have context
+            await self.agent.aupdate_state(
+                config,
+                {"messages": [*inputs["messages"], AIMessage(content=cached)]},
+                as_node="FastPath",
+            )
+        return version, cached
+
+    def _remember(self, version, message: str, messages: list, response: str):
+        if version and is_read_only_turn(messages):
+            response_cache.put(message, version, response)
+
+    async def process_message(self, session_id: str, message: str) -> str:
+        config, inputs = self._prepare(session_id, message)
+
+        version, cached = await self._cached_response(config, inputs, message)
+        if cached is not None:
+            return cached
+
         result = await self.agent.ainvoke(inputs, config=config)
-        
+        response = result["messages"][-1].content
+        self._remember(version, message, result["messages"], response)
+
         # Return the last message from the AI
-        return result["messages"][-1].content
\ No newline at end of file
+        return response
+
+    async def stream_message(self, session_id: str, message: str) -> AsyncIterator[tuple[str, dict]]:
+        """
+        Same turn as process_message, yielded as (event, data) while it runs:
+        node, tool_start, tool_end, token, and finally final.
+        """
+        config, inputs = self._prepare(session_id, message)
+
+        version, cached = await self._cached_response(config, inputs, message)
+        if cached is not None:
+            yield "final", {"response": cached, "cached": True}
+            return
+
+        async for event in self.agent.astream_events(inputs, config=config, version="v2"):
+            kind, name = event["event"], event["name"]
+            if kind == "on_chain_start" and name in STREAMED_NODES and event["metadata"].get("langgraph_node") == name:
+                yield "node", {"node": name}
+            elif kind == "on_tool_start":
+                yield "tool_start", {"tool": name, "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                yield "tool_end", {"tool": name, "output": str(event["data"].get("output"))}
+            elif kind == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if content:
+                    yield "token", {"content": content}
+
+        state = await self.agent.aget_state(config)
+        messages = state.values["messages"]
+        response = messages[-1].content
+        self._remember(version, message, messages, response)
+        yield "final", {"response": response, "cached": False}
@@ -0,0 +1,166 @@
+"""
+LangChain callback handler that accounts for where a chat turn spends time.
+
+Registered on every ChatService run. For each LLM call, graph node and tool
+it records a Prometheus histogram and an OpenTelemetry span, nested under the
+nearest traced ancestor (and ultimately under the FastAPI request span):
+
+  ecomm_llm_tokens_total{model, type}             prompt / completion tokens
+  ecomm_llm_latency_seconds{model}
+  ecomm_graph_node_latency_seconds{node}          Sales, Checkout, FastPath, supervisor, post_sales_router
+  ecomm_tool_latency_seconds{tool, status}
+
+The handler is stateless between runs apart from in-flight run ids, so one
+instance is shared by all requests.
+"""
+import time
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
+
+from shared.observability import (
+    ecomm_graph_node_latency_seconds,
+    ecomm_llm_latency_seconds,
+    ecomm_llm_tokens_total,
+    ecomm_tool_latency_seconds,
+)
+
+tracer = trace.get_tracer(__name__)
+
+# Chain runs worth timing: graph nodes plus the routing functions
+TRACKED_CHAINS = {
+    "FastPath": "FastPath",
+    "Sales": "Sales",
+    "Checkout": "Checkout",
+    "supervisor_node": "supervisor",
+    "post_sales_router": "post_sales_router",
+}
+
+
+class TelemetryCallbackHandler(BaseCallbackHandler):
+    # Run in the event loop, not a thread pool: keeps the OTel context of the
+    # request and avoids a thread hop per callback
+    run_inline = True
+
+    def __init__(self):
+        self._parents: dict[UUID, Optional[UUID]] = {}
+        # run_id -> (kind, label, started, span)
+        self._runs: dict[UUID, tuple[str, str, float, Any]] = {}
+
+    # --- bookkeeping ---
+
+    def _parent_span(self, parent_run_id: Optional[UUID]):
+        while parent_run_id is not None:
+            run = self._runs.get(parent_run_id)
+            if run is not None:
+                return run[3]
+            parent_run_id = self._parents.get(parent_run_id)
+        return None
+
+    def _start(self, kind: str, label: str, span_name: str, run_id: UUID, parent_run_id: Optional[UUID], **attributes):
+        parent = self._parent_span(parent_run_id)
+        context = trace.set_span_in_context(parent) if parent is not None else None
+        span = tracer.start_span(span_name, context=context, attributes=attributes)
+        self._runs[run_id] = (kind, label, time.perf_counter(), span)
+
+    def _finish(self, run_id: UUID, error: Optional[BaseException] = None):
+        self._parents.pop(run_id, None)
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        kind, label, started, span = run
+        elapsed = time.perf_counter() - started
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
+        return kind, label, elapsed, span
+
+    # --- graph nodes ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        self._parents[run_id] = parent_run_id
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        node = TRACKED_CHAINS.get(name)
+        # Only the graph's own task for that node, not same-named inner runnables
+        if node is not None and (metadata or {}).get("langgraph_node"):
+            self._start("node", node, f"graph.node {node}", run_id, parent_run_id, **{"graph.node": node})
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished and finished[0] == "node":
+            ecomm_graph_node_latency_seconds.labels(node=finished[1]).observe(finished[2])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        finished = self._finish(run_id, error)
+        if finished and finished[0] == "node":
+            ecomm_graph_node_latency_seconds.labels(node=finished[1]).observe(finished[2])
+
+    # --- LLM calls ---
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = (metadata or {}).get("ls_model_name") or params.get("model_name") or params.get("model") or "unknown"
+        self._parents[run_id] = parent_run_id
+        self._start("llm", model, f"llm {model}", run_id, parent_run_id, **{"llm.model": model})
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self.on_chat_model_start(serialized, [], run_id=run_id, parent_run_id=parent_run_id, metadata=metadata, **kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if not finished:
+            return
+        _, model, elapsed, span = finished
+        ecomm_llm_latency_seconds.labels(model=model).observe(elapsed)
+
+        prompt_tokens, completion_tokens = _token_usage(response)
+        if prompt_tokens:
+            ecomm_llm_tokens_total.labels(model=model, type="prompt").inc(prompt_tokens)
+        if completion_tokens:
+            ecomm_llm_tokens_total.labels(model=model, type="completion").inc(completion_tokens)
+        span.set_attribute("llm.prompt_tokens", prompt_tokens)
+        span.set_attribute("llm.completion_tokens", completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        finished = self._finish(run_id, error)
+        if finished:
+            ecomm_llm_latency_seconds.labels(model=finished[1]).observe(finished[2])
+
+    # --- tools ---
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        tool_name = kwargs.get("name") or (serialized or {}).get("name") or "unknown"
+        self._parents[run_id] = parent_run_id
+        self._start("tool", tool_name, f"tool {tool_name}", run_id, parent_run_id, **{"tool.name": tool_name})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished:
+            ecomm_tool_latency_seconds.labels(tool=finished[1], status="ok").observe(finished[2])
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        finished = self._finish(run_id, error)
+        if finished:
+            ecomm_tool_latency_seconds.labels(tool=finished[1], status="error").observe(finished[2])
+
+
+def _token_usage(response) -> tuple[int, int]:
+    """(prompt, completion) tokens from usage_metadata, else the provider's llm_output."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if prompt or completion:
+        return prompt, completion
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+
+telemetry_handler = TelemetryCallbackHandler()
@@ -0,0 +1,79 @@
+"""
+How search_products and view_cart results are written into the conversation.
+
+Tool results stay in the checkpointed thread and are re-sent on later LLM
+calls (until context_policy elides them), so their size is paid many times.
+The old encoding was the Python repr of the JSON: every key repeated on every
+row, plus fields the agents never use (sku, user_id, is_active).
+
+  TOOL_RESULT_FORMAT=table  (default) header row + one '|'-delimited row per
+                            record, only the fields the agents need
+  TOOL_RESULT_FORMAT=repr   the previous str(...) output
+
+    id|name|price|stock
+    3|Tennis Ball|5.0|50
+    4|Ping Pong Ball|5.0|50
+
+`python tests/bench_tool_encoding.py` compares the two.
+"""
+import os
+
+TOOL_RESULT_FORMAT = os.getenv("TOOL_RESULT_FORMAT", "table")
+
+DELIMITER = "|"
+PRODUCT_FIELDS = ("id", "name", "price", "stock")
+CART_FIELDS = ("product_id", "name", "quantity", "price")
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    # A stray delimiter or newline in a name must not shift the columns
+    return str(value).replace(DELIMITER, "/").replace("\n", " ")
+
+
+def encode_table(rows: list[dict], fields: tuple[str, ...]) -> str:
+    lines = [DELIMITER.join(fields)]
+    lines.extend(DELIMITER.join(_cell(row.get(field)) for field in fields) for row in rows)
+    return "\n".join(lines)
+
+
+def _value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def decode_table(text: str) -> list[dict]:
+    """Inverse of encode_table, with numeric cells converted back to int/float."""
+    lines = text.strip().splitlines()
+    if not lines:
+        return []
+    fields = lines[0].split(DELIMITER)
+    rows = []
+    for line in lines[1:]:
+        cells = line.split(DELIMITER)
+        if len(cells) != len(fields):
+            raise ValueError(f"Row has {len(cells)} cells, header has {len(fields)}: {line!r}")
+        rows.append({field: _value(cell) for field, cell in zip(fields, cells)})
+    return rows
+
+
+def encode_products(products: list[dict], fmt: str = None) -> str:
+    if (fmt or TOOL_RESULT_FORMAT) == "repr":
+        return str(products)
+    if not products:
+        return "No products found."
+    return encode_table(products, PRODUCT_FIELDS)
+
+
+def encode_cart(cart: dict | None, fmt: str = None) -> str:
+    if (fmt or TOOL_RESULT_FORMAT) == "repr":
+        return "Cart is empty." if cart is None else str(cart)
+    items = (cart or {}).get("items", [])
+    if not items:
+        return "Cart is empty."
+    return encode_table(items, CART_FIELDS)
@@ -0,0 +1,123 @@
+"""
+Tool node of the ReAct agents: runs the tool calls of one LLM step in
+parallel, with limits.
+
+LangGraph's ToolNode already gathers every call of an AIMessage. This
+subclass keeps that, results still in call order, and adds:
+
+  - A concurrency cap per tool, shared by all requests in the process, so a
+    50-call fan-out cannot monopolise a downstream service:
+      TOOL_MAX_CONCURRENCY  default cap for every tool (default 8)
+      TOOL_CONCURRENCY      per-tool overrides, e.g. "search_products=4,checkout=2"
+    add_to_cart is uncapped unless listed in TOOL_CONCURRENCY: its calls
+    are coalesced into one HTTP request anyway, and a cap would split them.
+  - Per-session ordering of cart writes. The step's MUTATING_TOOLS calls are
+    applied in call order under the session's lock (tools.session_locks),
+    so they never interleave with another step or request writing the same
+    cart. A run of consecutive add_to_cart calls still goes out together, so
+    CartBatcher folds it into one batch write. Read-only calls, and writes to
+    other sessions, proceed in parallel.
+
+Metrics:
+  ecomm_tool_step_fanout{agent}             tool calls per LLM step
+  ecomm_tool_step_latency_seconds{agent}    wall time of the whole step
+  ecomm_tool_wait_seconds{tool, reason}     queued for the cap ('concurrency') or the session ('session')
+"""
+import asyncio
+import os
+import time
+from contextlib import nullcontext
+from typing import Optional
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import ToolNode
+
+from shared.observability import ecomm_tool_step_fanout, ecomm_tool_step_latency_seconds, ecomm_tool_wait_seconds
+
+from .tools import session_locks
+
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "8"))
+
+# Tools that write the cart; everything else may run in any order
+MUTATING_TOOLS = {"add_to_cart", "remove_from_cart", "checkout"}
+# Mutating tools whose consecutive calls are safe (and cheaper) to send together
+BATCHED_TOOLS = {"add_to_cart"}
+
+
+def _parse_limits(spec: str) -> dict[str, int]:
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+class ToolConcurrencyLimits:
+    def __init__(self, default: int, overrides: dict[str, int]):
+        self.default = default
+        self.overrides = overrides
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def get(self, tool_name: str) -> Optional[asyncio.Semaphore]:
+        if tool_name in BATCHED_TOOLS and tool_name not in self.overrides:
+            return None
+        semaphore = self._semaphores.get(tool_name)
+        if semaphore is None:
+            limit = self.overrides.get(tool_name, self.default)
+            semaphore = self._semaphores[tool_name] = asyncio.Semaphore(max(limit, 1))
+        return semaphore
+
+
+tool_limits = ToolConcurrencyLimits(TOOL_MAX_CONCURRENCY, _parse_limits(os.getenv("TOOL_CONCURRENCY", "")))
+
+
+class ParallelToolNode(ToolNode):
+    def __init__(self, tools, *, agent: str, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.agent = agent
+
+    async def _afunc(self, input, config: RunnableConfig):
+        tool_calls, output_type = self._parse_input(input)
+        started = time.perf_counter()
+        outputs: list[ToolMessage] = [None] * len(tool_calls)
+
+        async def run(index: int):
+            outputs[index] = await self._arun_limited(tool_calls[index], config)
+
+        # session -> groups of call indexes, in call order; a group runs concurrently
+        lanes: dict[str, list[list[int]]] = {}
+        tasks = []
+        for index, call in enumerate(tool_calls):
+            if call["name"] not in MUTATING_TOOLS:
+                tasks.append(run(index))
+                continue
+            groups = lanes.setdefault(str(call["args"].get("session_id")), [])
+            previous = tool_calls[groups[-1][-1]]["name"] if groups else None
+            if call["name"] in BATCHED_TOOLS and previous == call["name"]:
+                groups[-1].append(index)
+            else:
+                groups.append([index])
+        tasks.extend(self._run_lane(session_id, groups, run, tool_calls) for session_id, groups in lanes.items())
+        await asyncio.gather(*tasks)
+
+        ecomm_tool_step_fanout.labels(agent=self.agent).observe(len(tool_calls))
+        ecomm_tool_step_latency_seconds.labels(agent=self.agent).observe(time.perf_counter() - started)
+        return outputs if output_type == "list" else {"messages": outputs}
+
+    async def _run_lane(self, session_id: str, groups: list[list[int]], run, tool_calls: list):
+        queued = time.perf_counter()
+        async with session_locks.hold(session_id):
+            for group in groups:
+                waited = time.perf_counter() - queued
+                for index in group:
+                    ecomm_tool_wait_seconds.labels(tool=tool_calls[index]["name"], reason="session").observe(waited)
+                await asyncio.gather(*(run(index) for index in group))
+
+    async def _arun_limited(self, call, config: RunnableConfig) -> ToolMessage:
+        if call["name"] not in self.tools_by_name:
+            return await self._arun_one(call, config)  # Answered with ToolNode's invalid-tool message
+        queued = time.perf_counter()
+        async with tool_limits.get(call["name"]) or nullcontext():
+            ecomm_tool_wait_seconds.labels(tool=call["name"], reason="concurrency").observe(time.perf_counter() - queued)
+            return await self._arun_one(call, config)
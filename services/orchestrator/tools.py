@@ -7,10 +7,14 @@ each item before processing it. The bulk-clear at the end was:
   3. A misleading suggestion that the cart is cleared in one shot rather than atomically
 
 All other logic (async httpx, internal API key headers, mutex lock) retained.
+HTTP calls go through the shared pooled clients in http_clients.py.
 """
 import os
 import asyncio
+from contextlib import asynccontextmanager
 from .checkout_saga import build_checkout_saga
+from .http_clients import http_clients
+from .tool_encoding import encode_cart, encode_products
 from langchain_core.tools import tool
 import httpx
 
@@ -19,12 +23,286 @@ ORDER_URL = os.getenv("ORDER_URL", "http://localhost:8002")
 PAYMENT_URL = os.getenv("PAYMENT_URL", "http://localhost:8003")
 SESSION_URL = os.getenv("SESSION_URL", "http://localhost:8004")
 
-API_HEADERS = {"X-Internal-API-Key": os.getenv("INTERNAL_API_KEY", "internal-cluster-key-change-me")}
+# How long the first add_to_cart of an LLM step waits for its siblings
+CART_BATCH_WINDOW_SECONDS = float(os.getenv("CART_BATCH_WINDOW_MS", "5")) / 1000
+
+# Max per-item sagas of ONE checkout running at the same time
+CHECKOUT_MAX_CONCURRENCY = int(os.getenv("CHECKOUT_MAX_CONCURRENCY", "5"))
 
 # Application-layer lock to prevent parallel double-spend by the LLM
 active_checkouts: set = set()
 
 
+class SessionLocks:
+    """
+    One asyncio.Lock per session id, so cart writes to the same session run
+    one at a time while other sessions proceed. Entries are dropped once no
+    one holds or waits for them. Process-local: across replicas the Session
+    Service's own transactions remain the guard.
+    """
+
+    def __init__(self):
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str):
+        lock, users = self._locks.get(session_id) or (asyncio.Lock(), 0)
+        self._locks[session_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[session_id]
+            if users == 1:
+                del self._locks[session_id]
+            else:
+                self._locks[session_id] = (lock, users - 1)
+
+
+session_locks = SessionLocks()
+
+
+class CartBatcher:
+    """
+    Coalesces add_to_cart tool calls for the same session into ONE
+    POST /{session_id}/items:batch request.
+
+    The ReAct ToolNode runs every tool call of one AIMessage concurrently, so
+    "buy one of everything" arrives here as N near-simultaneous calls. The
+    first call opens a short window; every call for that session landing in
+    the window joins the batch and gets its own per-item result back.
+
+    The batch is one transaction on the Session Service. If it rejects
+    specific lines (422 pointing at items[i]), those lines get the service's
+    own message and the rest are re-sent without them, so one bad call does
+    not fail its siblings.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._pending: dict[str, list[tuple[int, int, asyncio.Future]]] = {}
+        # The loop only keeps weak references to tasks; hold the flushes until done
+        self._tasks: set[asyncio.Task] = set()
+
+    async def add(self, session_id: str, product_id: int, quantity: int) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(session_id)
+        if batch is None:
+            batch = self._pending[session_id] = []
+            task = loop.create_task(self._flush_after_window(session_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch.append((product_id, quantity, future))
+        return await future
+
+    async def _flush_after_window(self, session_id: str):
+        await asyncio.sleep(self.window_seconds)
+        batch = self._pending.pop(session_id, [])
+        try:
+            results = await self._send(session_id, [(pid, qty) for pid, qty, _ in batch])
+        except Exception as e:
+            results = [f"Error connecting to Session Service: {e}"] * len(batch)
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _send(self, session_id: str, lines: list[tuple[int, int]]) -> list[str]:
+        """One tool result per line, in order."""
+        payload = {"items": [{"product_id": pid, "quantity": qty} for pid, qty in lines]}
+        try:
+            resp = await http_clients.get("session").post(f"{SESSION_URL}/{session_id}/items:batch", json=payload)
+        except httpx.HTTPError as e:
+            return [f"Error connecting to Session Service: {e}"] * len(lines)
+        if resp.is_success:
+            return [f"Successfully added {qty} of product {pid} to cart." for pid, qty in lines]
+
+        rejected = _rejected_lines(resp)
+        if not rejected:
+            # Nothing points at a line (e.g. unknown session): every line failed together
+            reason = _error_detail(resp)
+            return [f"Error adding product {pid} to cart: {reason}" for pid, _ in lines]
+
+        results = [
+            f"Error adding product {pid} to cart: {rejected[i]}" if i in rejected else None
+            for i, (pid, _) in enumerate(lines)
+        ]
+        retry = [i for i in range(len(lines)) if i not in rejected]
+        if retry:
+            for i, result in zip(retry, await self._send(session_id, [lines[i] for i in retry])):
+                results[i] = result
+        return results
+
+
+def _error_detail(resp: httpx.Response) -> str:
+    """FastAPI's `detail` with the status code, or the raw body if there is none."""
+    try:
+        body = resp.json()
+    except ValueError:
+        body = None
+    detail = body.get("detail") if isinstance(body, dict) else None
+    return f"{detail or resp.text or resp.reason_phrase} (HTTP {resp.status_code})"
+
+
+def _rejected_lines(resp: httpx.Response) -> dict[int, str]:
+    """
+    {line index: message} from a 422 whose errors ALL point at items[i].
+    Empty if any error is about the request as a whole.
+    """
+    if resp.status_code != 422:
+        return {}
+    try:
+        errors = resp.json().get("detail")
+    except (ValueError, AttributeError):
+        return {}
+    if not isinstance(errors, list):
+        return {}
+    rejected: dict[int, str] = {}
+    for error in errors:
+        loc = error.get("loc", []) if isinstance(error, dict) else []
+        if len(loc) < 3 or list(loc[:2]) != ["body", "items"] or not isinstance(loc[2], int):
+            return {}
+        field = ".".join(str(part) for part in loc[3:])
+        message = error.get("msg", "rejected")
+        rejected.setdefault(loc[2], f"{field}: {message}" if field else message)
+    return rejected
+
+
+cart_batcher = CartBatcher(CART_BATCH_WINDOW_SECONDS)
+
+
+async def fetch_products_by_ids(product_ids: list[int]) -> dict[int, dict]:
+    """Resolves many product ids with ONE call to the product batch endpoint."""
+    if not product_ids:
+        return {}
+    resp = await http_clients.get("product").get(
+        f"{PRODUCT_URL}/batch", params={"ids": ",".join(str(pid) for pid in product_ids)}
+    )
+    resp.raise_for_status()
+    return {p["id"]: p for p in resp.json()["products"]}
+
+
+class CheckoutUnavailable(Exception):
+    """Nothing was bought, for a reason the user should be told (empty cart, checkout in flight)."""
+
+
+async def _checkout_item(session_id: str, item: dict, product: dict | None) -> dict:
+    """Runs ONE cart line through its own saga; failures roll back only this line."""
+    ctx = {
+        "session_id": session_id,
+        "pid": int(item["product_id"]),
+        "qty": int(item["quantity"]),
+    }
+    if product:
+        ctx["product_name"] = product.get("name", "Unknown Product")
+        ctx["unit_price"] = product["price"]
+    saga = build_checkout_saga()
+    try:
+        await saga.execute(ctx)
+        return {
+            "ok": True,
+            "product_id": ctx["pid"],
+            "product_name": ctx["product_name"],
+            "order_id": ctx["order_id"],
+            "transaction_id": ctx["transaction_id"],
+            "total_price": ctx["total_price"],
+        }
+    except Exception:
+        # The saga has already queued (or run) its rollback; just report the failure
+        return {"ok": False, "product_id": ctx["pid"]}
+
+
+def format_checkout_result(result: dict) -> str:
+    if result["ok"]:
+        return (
+            f"Success! Ordered {result['product_name']}. "
+            f"Order ID: {result['order_id']} | "
+            f"Transaction ID: {result['transaction_id']} | "
+            f"Total Paid: ${result['total_price']}"
+        )
+    return (
+        f"Error processing Product {result['product_id']}: "
+        f"Transaction aborted and rolled back."
+    )
+
+
+async def list_products(query: str = "", limit: int = 20) -> list[dict]:
+    """The `limit` cheapest products matching `query`, straight from the (price, id) index."""
+    resp = await http_clients.get("product").get(
+        f"{PRODUCT_URL}/",
+        params={"query": query, "sort": "price", "order": "asc", "limit": limit},
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def remove_cart_line(session_id: str, product_id: int) -> None:
+    resp = await http_clients.get("session").delete(f"{SESSION_URL}/{session_id}/items/{int(product_id)}")
+    resp.raise_for_status()
+
+
+async def load_cart(session_id: str) -> dict | None:
+    """The cart with each line enriched with name and price, or None if the session is unknown."""
+    resp = await http_clients.get("session").get(f"{SESSION_URL}/{session_id}")
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+    cart = resp.json()
+    items = cart.get("items", [])
+    try:
+        products = await fetch_products_by_ids([int(i["product_id"]) for i in items])
+    except httpx.HTTPError:
+        products = {}  # Names are a nicety; the bare cart is still correct
+    for item in items:
+        product = products.get(int(item["product_id"]))
+        if product:
+            item["name"] = product["name"]
+            item["price"] = product["price"]
+    return cart
+
+
+async def run_checkout(session_id: str) -> list[dict]:
+    """
+    Buys everything in the cart, one saga per line. Returns per-line results in
+    cart order; raises CheckoutUnavailable when nothing could be attempted.
+    """
+    # Mutex: prevent LLM from firing parallel checkout calls for the same session
+    if session_id in active_checkouts:
+        raise CheckoutUnavailable("Error: A checkout is already in progress for this session. Please wait.")
+    active_checkouts.add(session_id)
+
+    try:
+        # 1. Fetch current cart
+        cart_resp = await http_clients.get("session").get(f"{SESSION_URL}/{session_id}")
+        if cart_resp.status_code != 200:
+            raise CheckoutUnavailable("Cart is empty.")
+
+        cart = cart_resp.json()
+        items = cart.get("items", [])
+        if not items:
+            raise CheckoutUnavailable("Cart is empty.")
+
+        # 2. Resolve every product in one round trip instead of one per saga
+        try:
+            products = await fetch_products_by_ids([int(i["product_id"]) for i in items])
+        except httpx.HTTPError:
+            products = {}  # Each saga's fetch_product step will look it up itself
+
+        # 3. Process each item through its own isolated saga. The sagas share
+        #    nothing but the pooled clients, so they run concurrently (bounded);
+        #    gather() keeps results in cart order.
+        semaphore = asyncio.Semaphore(CHECKOUT_MAX_CONCURRENCY)
+
+        async def run_bounded(item: dict) -> dict:
+            async with semaphore:
+                return await _checkout_item(session_id, item, products.get(int(item["product_id"])))
+
+        return await asyncio.gather(*(run_bounded(item) for item in items))
+    finally:
+        active_checkouts.discard(session_id)
+
+
 class ECommerceTools:
 
     @tool
@@ -32,24 +310,8 @@ class ECommerceTools:
         """Useful to find products by name. Pass empty string or 'all' to list everything."""
         try:
             search_query = "" if query.lower() in ["", "all", "available", "products"] else query
-            async with httpx.AsyncClient(headers=API_HEADERS, timeout=10.0) as client:
-                resp = await client.get(f"{PRODUCT_URL}/", params={"query": search_query})
-                resp.raise_for_status()
-                products = resp.json()
-
-                if isinstance(products, list):
-                    for p in products:
-                        try:
-                            p["_sort_price"] = float(p.get("price", 0))
-                        except (ValueError, TypeError):
-                            p["_sort_price"] = float("inf")
-                    products.sort(key=lambda x: x["_sort_price"])
-                    for p in products:
-                        p.pop("_sort_price", None)
-                    if len(products) > 20:
-                        products = products[:20]
-
-                return str(products)
+            products = await list_products(search_query)
+            return encode_products(products)
         except Exception as e:
             return f"Error connecting to Product Service: {e}"
 
@@ -58,23 +320,15 @@ class ECommerceTools:
         """Adds a product to the user's cart. Requires session_id, product_id, quantity."""
         if quantity <= 0:
             return "Error: Quantity must be a positive integer greater than zero."
-        try:
-            payload = {"product_id": int(product_id), "quantity": int(quantity)}
-            async with httpx.AsyncClient(headers=API_HEADERS, timeout=10.0) as client:
-                resp = await client.post(f"{SESSION_URL}/{session_id}/items", json=payload)
-                resp.raise_for_status()
-                return f"Successfully added {quantity} of product {product_id} to cart."
-        except Exception as e:
-            return f"Error connecting to Session Service: {e}"
+        # Sibling add_to_cart calls from the same LLM step are sent as one batch
+        return await cart_batcher.add(session_id, int(product_id), int(quantity))
 
     @tool
     async def remove_from_cart(session_id: str, product_id: int) -> str:
         """Removes a product from the user's cart. Requires session_id and product_id."""
         try:
-            async with httpx.AsyncClient(headers=API_HEADERS, timeout=10.0) as client:
-                resp = await client.delete(f"{SESSION_URL}/{session_id}/items/{int(product_id)}")
-                resp.raise_for_status()
-                return f"Successfully removed product {product_id} from cart."
+            await remove_cart_line(session_id, product_id)
+            return f"Successfully removed product {product_id} from cart."
         except Exception as e:
             return f"Error connecting to Session Service: {e}"
 
@@ -82,66 +336,17 @@ class ECommerceTools:
     async def view_cart(session_id: str) -> str:
         """See what is inside the cart. Useful for the Checkout Agent to verify items."""
         try:
-            async with httpx.AsyncClient(headers=API_HEADERS, timeout=10.0) as client:
-                resp = await client.get(f"{SESSION_URL}/{session_id}")
-                if resp.status_code == 404:
-                    return "Cart is empty."
-                return str(resp.json())
+            return encode_cart(await load_cart(session_id))
         except Exception as e:
             return f"Error: {e}"
 
     @tool
     async def checkout(session_id: str) -> str:
         """Buys everything in the cart using the Saga pattern with automatic rollback on failure."""
-
-        # Mutex: prevent LLM from firing parallel checkout calls for the same session
-        if session_id in active_checkouts:
-            return "Error: A checkout is already in progress for this session. Please wait."
-        active_checkouts.add(session_id)
-
         try:
-            results = []
-            async with httpx.AsyncClient(headers=API_HEADERS, timeout=15.0) as client:
-                # 1. Fetch current cart
-                cart_resp = await client.get(f"{SESSION_URL}/{session_id}")
-                if cart_resp.status_code != 200:
-                    return "Cart is empty."
-
-                cart = cart_resp.json()
-                items = cart.get("items", [])
-                if not items:
-                    return "Cart is empty."
-
-                # 2. Process each item through its own isolated saga
-                for item in items:
-                    ctx = {
-                        "client": client,
-                        "session_id": session_id,
-                        "pid": int(item["product_id"]),
-                        "qty": int(item["quantity"]),
-                    }
-                    saga = build_checkout_saga()
-                    try:
-                        await saga.execute(ctx)
-                        results.append(
-                            f"Success! Ordered {ctx['product_name']}. "
-                            f"Order ID: {ctx['order_id']} | "
-                            f"Transaction ID: {ctx['transaction_id']} | "
-                            f"Total Paid: ${ctx['total_price']}"
-                        )
-                    except Exception:
-                        # Saga already rolled back internally; just report the failure
-                        results.append(
-                            f"Error processing Product {ctx['pid']}: "
-                            f"Transaction aborted and rolled back."
-                        )
-
-            if not results:
-                return "Cart is empty (or all items were already processed)."
-
-            return "\n".join(results)
-
+            results = await run_checkout(session_id)
+            return "\n".join(format_checkout_result(result) for result in results)
+        except CheckoutUnavailable as e:
+            return str(e)
         except Exception as e:
             return f"Checkout failed: {e}"
-        finally:
-            active_checkouts.discard(session_id)
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Bounded in-process read-through cache for single-product lookups.
+
+Every checkout saga does GET /{product_id} for data that almost never changes,
+so we keep the serialized product in an LRU with a TTL and drop the entry on
+every write path in this service (create, stock changes, reset).
+
+Stock is cached too, but it is NEVER used to authorise a sale: reduce_stock and
+reserve_stock re-check `stock >= quantity` inside the UPDATE itself, so a stale
+cached read can at worst display an outdated number, not oversell. The TTL caps
+how stale that number can get when another replica did the write.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from shared.observability import ecomm_product_cache_events_total
+
+from .schemas import ProductResponse
+
+PRODUCT_CACHE_MAXSIZE = int(os.getenv("PRODUCT_CACHE_MAXSIZE", "10000"))
+PRODUCT_CACHE_TTL_SECONDS = float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "30"))
+
+
+class ProductCache:
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, tuple[float, ProductResponse]]" = OrderedDict()
+        # Per-key generations. `_clock` ticks on every invalidation and
+        # `_invalidated` stamps each invalidated id with it (oldest first), so a
+        # loader that started before ITS product was written must not write its
+        # (possibly stale) result back, while loaders of other products still may.
+        # The stamps are capped at `maxsize`; `_floor` is the newest dropped
+        # stamp, which unknown ids are conservatively assumed to carry.
+        self._clock = 0
+        self._invalidated: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = 0
+
+    @property
+    def generation(self) -> int:
+        """Token for put(): take it BEFORE loading."""
+        return self._clock
+
+    def get(self, product_id: int) -> Optional[ProductResponse]:
+        entry = self._entries.get(product_id)
+        if entry is None:
+            ecomm_product_cache_events_total.labels(event="miss").inc()
+            return None
+
+        expires_at, product = entry
+        if expires_at < time.monotonic():
+            del self._entries[product_id]
+            ecomm_product_cache_events_total.labels(event="expired").inc()
+            ecomm_product_cache_events_total.labels(event="miss").inc()
+            return None
+
+        self._entries.move_to_end(product_id)
+        ecomm_product_cache_events_total.labels(event="hit").inc()
+        return product
+
+    def put(self, product_id: int, product: ProductResponse, generation: int):
+        if self._invalidated.get(product_id, self._floor) > generation or self.maxsize <= 0:
+            return
+        self._entries[product_id] = (time.monotonic() + self.ttl_seconds, product)
+        self._entries.move_to_end(product_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            ecomm_product_cache_events_total.labels(event="eviction").inc()
+
+    def invalidate(self, *product_ids: int):
+        self._clock += 1
+        for product_id in product_ids:
+            self._entries.pop(product_id, None)
+            self._invalidated[product_id] = self._clock
+            self._invalidated.move_to_end(product_id)
+        while len(self._invalidated) > max(self.maxsize, 1):
+            _, self._floor = self._invalidated.popitem(last=False)
+
+    def clear(self):
+        self._clock += 1
+        self._floor = self._clock
+        self._invalidated.clear()
+        self._entries.clear()
+
+    async def get_or_load(
+        self, product_id: int, loader: Callable[[], Awaitable[object]]
+    ) -> Optional[ProductResponse]:
+        cached = self.get(product_id)
+        if cached is not None:
+            return cached
+
+        generation = self.generation
+        product = await loader()
+        if product is None:
+            return None
+
+        response = ProductResponse.model_validate(product)
+        self.put(product_id, response, generation)
+        return response
+
+
+product_cache = ProductCache(PRODUCT_CACHE_MAXSIZE, PRODUCT_CACHE_TTL_SECONDS)
@@ -1,10 +1,12 @@
+import asyncio
 from fastapi import FastAPI
 from sqlalchemy import text
 from shared.config.database import engine, Base
 from shared.observability import setup_observability
 import builtins
 from .router import router, public_router
-from .models import Product
+from .service import StockHoldService
+from .models import Product, StockHold
 
 product_app = FastAPI(
     title="Product Service",
@@ -24,9 +26,19 @@ async def startup_event():
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS product_schema"))
         # Create tables
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips columns/indexes on tables that already exist
+        await conn.execute(text("ALTER TABLE product_schema.products ADD COLUMN IF NOT EXISTS sku VARCHAR"))
+        for index in [*Product.__table__.indexes, *StockHold.__table__.indexes]:
+            await conn.run_sync(index.create, checkfirst=True)
+
+    product_app.state.hold_reaper = asyncio.create_task(StockHoldService.run_reaper())
         
     print("TABLES:", Base.metadata.tables.keys())
     print(Base.metadata.tables)
     print(Base.metadata.tables.keys())
     print("STARTUP BASE ID:", builtins.id(Base))
-    print("METADATA TABLES:", Base.metadata.tables.keys())
\ No newline at end of file
+    print("METADATA TABLES:", Base.metadata.tables.keys())
+
+@product_app.on_event("shutdown")
+async def shutdown_event():
+    product_app.state.hold_reaper.cancel()
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, Sequence, func, literal_column, select
+from sqlalchemy.orm import column_property
 from shared.config.database import Base
 import builtins
 
@@ -10,5 +11,72 @@ class Product(Base):
     name = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False)
+    sku = Column(String, nullable=True)  # External catalog id, upsert key for bulk import
+
+
+class StockBucket(Base):
+    """
+    One shard of a hot SKU's reservable stock. Holds decrement a bucket row
+    instead of `products.stock`, so N concurrent checkouts on one SKU contend
+    on N rows instead of one. Buckets are refilled from `products.stock` in
+    chunks and drained back to it by the reaper once idle.
+    """
+    __tablename__ = "stock_buckets"
+    __table_args__ = {"schema": "product_schema"}
+
+    product_id = Column(Integer, ForeignKey("product_schema.products.id", ondelete="CASCADE"), primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    available = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class StockHold(Base):
+    """A short-lived stock reservation: held -> confirmed | released | expired."""
+    __tablename__ = "stock_holds"
+    __table_args__ = {"schema": "product_schema"}
+
+    id = Column(String, primary_key=True)  # UUID string
+    product_id = Column(Integer, ForeignKey("product_schema.products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="held")
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+# Sellable stock = unallocated `products.stock` + whatever sits in its buckets.
+# This is what every API response reports as `stock`.
+Product.available_stock = column_property(
+    Product.stock
+    + func.coalesce(
+        select(func.sum(StockBucket.available))
+        .where(StockBucket.product_id == Product.id)
+        .correlate_except(StockBucket)
+        .scalar_subquery(),
+        0,
+    )
+)
+
+# Catalog version shared by every replica (GET /catalog/version). Advanced with
+# nextval() after each committed product write; a sequence never takes a row
+# lock, so checkouts on different products do not queue behind one counter.
+catalog_version_seq = Sequence("catalog_version_seq", schema="product_schema", metadata=Base.metadata)
+
+# Only live holds are ever scanned by the reaper, so index just those
+Index("ix_stock_holds_live_expiry", StockHold.expires_at, postgresql_where=StockHold.status == "held")
+
+# Lower-cased, whitespace-split name words (the SQL twin of `name.lower().split()`).
+# The GIN index and the search query MUST use this exact expression, otherwise
+# Postgres cannot match the query to the index and falls back to a seq scan.
+product_name_words = func.regexp_split_to_array(func.lower(Product.name), literal_column(r"'\s+'"))
+
+Index("ix_products_name_words", product_name_words, postgresql_using="gin")
+
+# Keyset pagination / top-k indexes. `id` is the tie-breaker so the sort key is
+# unique and a cursor of (value, id) always resumes at exactly the right row.
+Index("ix_products_price_id", Product.price, Product.id)
+Index("ix_products_name_id", Product.name, Product.id)
+
+# Unique (NULLs allowed) so bulk import can INSERT ... ON CONFLICT (sku)
+Index("ux_products_sku", Product.sku, unique=True)
 
 print("MODEL BASE ID:", builtins.id(Base))
@@ -1,6 +1,30 @@
+from datetime import timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from .models import Product
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import select, insert, update, delete, func, bindparam, values, column, literal_column, any_, tuple_, text, Float, Integer, String, Text
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from .models import Product, StockBucket, StockHold, catalog_version_seq, product_name_words
+
+SORT_COLUMNS = {"id": Product.id, "price": Product.price, "name": Product.name}
+
+
+async def _update_returning_products(db: AsyncSession, stmt) -> list[Product]:
+    """
+    Runs an UPDATE of products and returns the updated rows WITH
+    `available_stock` loaded. RETURNING Product only carries the table columns;
+    the column_property would otherwise be lazy-loaded during response
+    serialization, outside the async greenlet, and fail after the write.
+    """
+    result = await db.execute(
+        stmt.returning(Product, Product.available_stock).execution_options(synchronize_session=False)
+    )
+    products = []
+    for product, available_stock in result.all():
+        set_committed_value(product, "available_stock", available_stock)
+        products.append(product)
+    return products
+
 
 class ProductRepository:
 
@@ -12,8 +36,39 @@ class ProductRepository:
         return product
 
     @staticmethod
-    async def get_all_products(db: AsyncSession):
-        result = await db.execute(select(Product))
+    async def search_products(
+        db: AsyncSession,
+        words: list[str] | None = None,
+        sort: str = "id",
+        descending: bool = False,
+        limit: int | None = None,
+        after: tuple | None = None,
+    ):
+        """
+        Filtered, ordered, keyset-paginated product listing.
+        - `words`: name must share at least one word (GIN-indexed overlap).
+        - `sort`: "id", "price" or "name"; `id` is always the tie-breaker.
+        - `after`: (sort_value, id) of the last row of the previous page.
+        """
+        sort_column = SORT_COLUMNS[sort]
+        stmt = select(Product)
+        if words:
+            stmt = stmt.where(product_name_words.op("&&")(bindparam("words", words, type_=ARRAY(Text))))
+
+        if sort == "id":
+            key, ordering = Product.id, [Product.id]
+            after_key = after[-1] if after else None
+        else:
+            key, ordering = tuple_(sort_column, Product.id), [sort_column, Product.id]
+            after_key = tuple_(*after) if after else None
+
+        if after_key is not None:
+            stmt = stmt.where(key < after_key if descending else key > after_key)
+        stmt = stmt.order_by(*[c.desc() if descending else c.asc() for c in ordering])
+
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        result = await db.execute(stmt)
         return result.scalars().all()
 
     @staticmethod
@@ -21,22 +76,330 @@ class ProductRepository:
         result = await db.execute(select(Product).where(Product.id == product_id))
         return result.scalars().first()
 
+    @staticmethod
+    async def get_products_by_ids(db: AsyncSession, product_ids: list[int]):
+        # `= ANY(:ids)` binds ONE array parameter, so every batch size shares a
+        # single prepared statement (unlike IN (...), which expands per id).
+        result = await db.execute(
+            select(Product).where(Product.id == any_(bindparam("ids", product_ids, type_=ARRAY(Integer))))
+        )
+        return result.scalars().all()
+
     @staticmethod
     async def update_product(db: AsyncSession, product: Product):
         db.add(product)
         await db.commit()
         await db.refresh(product)
         return product
-    
+
+    @staticmethod
+    async def reduce_stock(db: AsyncSession, product_id: int, quantity: int):
+        """
+        Conditional decrement in ONE statement. The `stock >= quantity` guard is
+        evaluated under the row lock, so concurrent checkouts cannot oversell.
+        Returns None if the product is missing or has insufficient stock.
+        """
+        products = await _update_returning_products(
+            db,
+            update(Product)
+            .where(Product.id == product_id, Product.stock >= quantity)
+            .values(stock=Product.stock - quantity),
+        )
+        await db.commit()
+        return products[0] if products else None
+
     @staticmethod
     async def restore_stock(db: AsyncSession, product_id: int, quantity: int):
-        result = await db.execute(select(Product).where(Product.id == product_id))
-        product = result.scalars().first()
-        
-        if not product:
-            return None
-            
-        product.stock += quantity
+        products = await _update_returning_products(
+            db,
+            update(Product)
+            .where(Product.id == product_id)
+            .values(stock=Product.stock + quantity),
+        )
         await db.commit()
-        await db.refresh(product)
-        return product
\ No newline at end of file
+        return products[0] if products else None
+
+    @staticmethod
+    async def delete_all_products(db: AsyncSession):
+        await db.execute(text("TRUNCATE TABLE product_schema.products RESTART IDENTITY CASCADE"))
+        await db.commit()
+
+    @staticmethod
+    async def bump_catalog_version(db: AsyncSession):
+        """
+        Call AFTER the product write has committed. Bumping inside the write's
+        transaction would publish the new version while readers can still see
+        the old rows, and a response cached in that gap would live on under the
+        new version. nextval() is never rolled back anyway, so it runs on its own
+        AUTOCOMMIT connection: one round trip, and nothing in the caller's
+        session to undo if it fails.
+        """
+        async with db.bind.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(select(catalog_version_seq.next_value()))
+
+    @staticmethod
+    async def get_catalog_version(db: AsyncSession) -> int:
+        # last_value is the start value until the first nextval(); report 0 then
+        result = await db.execute(text(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM product_schema.catalog_version_seq"
+        ))
+        return result.scalar_one()
+
+    @staticmethod
+    async def lock_products(db: AsyncSession, product_ids: list[int]):
+        """
+        SELECT ... FOR UPDATE in primary-key order. Every bulk writer locks rows in
+        the same order, so two overlapping carts can never deadlock each other.
+        Does NOT commit; the caller owns the transaction.
+        """
+        result = await db.execute(
+            select(Product.id, Product.name, Product.stock)
+            .where(Product.id.in_(product_ids))
+            .order_by(Product.id)
+            .with_for_update()
+        )
+        return {row.id: row for row in result.all()}
+
+    @staticmethod
+    async def adjust_stock_bulk(db: AsyncSession, deltas: dict[int, int]):
+        """
+        Applies `stock = stock + delta` for every product in a single
+        UPDATE ... FROM (VALUES ...) statement. Does NOT commit.
+        """
+        deltas_table = values(
+            column("product_id", Integer), column("delta", Integer), name="deltas"
+        ).data(sorted(deltas.items()))
+        products = await _update_returning_products(
+            db,
+            update(Product)
+            .where(Product.id == deltas_table.c.product_id)
+            .values(stock=Product.stock + deltas_table.c.delta),
+        )
+        return sorted(products, key=lambda p: p.id)
+
+
+    @staticmethod
+    async def upsert_by_sku(db: AsyncSession, rows: list[dict]) -> tuple[int, int]:
+        """
+        One INSERT ... ON CONFLICT (sku) DO UPDATE for the whole batch.
+        Returns (inserted, updated). Does NOT commit.
+        """
+        stmt = pg_insert(Product).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.sku],
+            set_={"name": stmt.excluded.name, "price": stmt.excluded.price, "stock": stmt.excluded.stock},
+        ).returning(literal_column("xmax = 0"))  # xmax is 0 only for freshly inserted rows
+        result = await db.execute(stmt)
+        flags = result.scalars().all()
+        inserted = sum(1 for was_inserted in flags if was_inserted)
+        return inserted, len(flags) - inserted
+
+    @staticmethod
+    async def upsert_by_name(db: AsyncSession, rows: list[dict]) -> tuple[int, int]:
+        """
+        Names are not unique in the table, so there is no ON CONFLICT target:
+        UPDATE every existing match in one statement, then multi-row INSERT the
+        rest. Returns (inserted, updated). Does NOT commit.
+        """
+        incoming = values(
+            column("name", String), column("price", Float), column("stock", Integer), name="incoming"
+        ).data([(r["name"], r["price"], r["stock"]) for r in rows])
+        result = await db.execute(
+            update(Product)
+            .where(Product.name == incoming.c.name)
+            .values(price=incoming.c.price, stock=incoming.c.stock)
+            .returning(Product.name)
+            .execution_options(synchronize_session=False)
+        )
+        updated_names = set(result.scalars().all())
+
+        new_rows = [r for r in rows if r["name"] not in updated_names]
+        if new_rows:
+            await db.execute(insert(Product), new_rows)
+        return len(new_rows), len(rows) - len(new_rows)
+
+    @staticmethod
+    async def stream_products(db: AsyncSession, batch_size: int):
+        """
+        Yields products in id order through a server-side cursor, `batch_size`
+        rows per fetch, so memory stays flat no matter how large the table is.
+        """
+        result = await db.stream(
+            select(Product).order_by(Product.id).execution_options(yield_per=batch_size)
+        )
+        async for product in result.scalars():
+            yield product
+
+
+
+class StockHoldRepository:
+    """
+    Bucketed stock reservations. NONE of these methods commit: a hold is
+    always taken/returned together with its bucket update, so the service
+    owns the transaction boundary.
+    """
+
+    @staticmethod
+    async def take_from_any_bucket(db: AsyncSession, product_id: int, quantity: int):
+        """
+        Fast path: decrement any bucket that has enough stock and is NOT locked
+        by another transaction (SKIP LOCKED), so concurrent holds on one SKU fan
+        out across buckets instead of queueing on a single row.
+        Returns the bucket number, or None if no free bucket could satisfy it.
+        """
+        # Aliased so the subquery is NOT auto-correlated to the UPDATE target
+        free = aliased(StockBucket)
+        candidate = (
+            select(free.bucket)
+            .where(free.product_id == product_id, free.available >= quantity)
+            .order_by(func.random())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(StockBucket)
+            .where(StockBucket.product_id == product_id, StockBucket.bucket == candidate)
+            .values(available=StockBucket.available - quantity, updated_at=func.now())
+            .returning(StockBucket.bucket)
+            .execution_options(synchronize_session=False)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def carve_from_product(db: AsyncSession, product_id: int, minimum: int, chunk: int) -> int:
+        """
+        Moves up to `chunk` (but at least `minimum`) units out of the single
+        `products.stock` row. This is the only path that locks the hot row, and
+        it runs once per chunk rather than once per checkout. Returns 0 if
+        `products.stock` is below `minimum`.
+        """
+        result = await db.execute(
+            select(Product.stock).where(Product.id == product_id).with_for_update()
+        )
+        stock = result.scalars().first()
+        if stock is None or stock < minimum:
+            return 0
+
+        carved = min(stock, max(chunk, minimum))
+        await db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(stock=Product.stock - carved)
+            .execution_options(synchronize_session=False)
+        )
+        return carved
+
+    @staticmethod
+    async def add_to_bucket(db: AsyncSession, product_id: int, bucket: int, quantity: int):
+        stmt = pg_insert(StockBucket).values(product_id=product_id, bucket=bucket, available=quantity)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StockBucket.product_id, StockBucket.bucket],
+                set_={"available": StockBucket.available + stmt.excluded.available, "updated_at": func.now()},
+            )
+        )
+
+    @staticmethod
+    async def lock_buckets(db: AsyncSession, product_id: int):
+        """Locks every bucket of a product in bucket order (deadlock-free slow path)."""
+        result = await db.execute(
+            select(StockBucket)
+            .where(StockBucket.product_id == product_id)
+            .order_by(StockBucket.bucket)
+            .with_for_update()
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def drain_buckets(db: AsyncSession, product_id: int, quantity: int) -> int:
+        """
+        Takes up to `quantity` units out of the product's buckets, locked in
+        bucket order. Returns how many were taken. Callers lock the products row
+        first, so this keeps the products -> buckets lock order.
+        """
+        remaining = quantity
+        for bucket in await StockHoldRepository.lock_buckets(db, product_id):
+            if not remaining:
+                break
+            taken = min(bucket.available, remaining)
+            bucket.available -= taken
+            remaining -= taken
+        await db.flush()
+        return quantity - remaining
+
+    @staticmethod
+    async def create_hold(db: AsyncSession, hold: StockHold):
+        db.add(hold)
+        await db.flush()
+        return hold
+
+    @staticmethod
+    async def get_hold(db: AsyncSession, hold_id: str):
+        result = await db.execute(select(StockHold).where(StockHold.id == hold_id))
+        return result.scalars().first()
+
+    @staticmethod
+    async def transition_hold(db: AsyncSession, hold_id: str, new_status: str, live_only_unexpired: bool = False):
+        """held -> `new_status`, atomically. Returns the hold, or None if it was not live."""
+        stmt = update(StockHold).where(StockHold.id == hold_id, StockHold.status == "held")
+        if live_only_unexpired:
+            stmt = stmt.where(StockHold.expires_at > func.now())
+        result = await db.execute(
+            stmt.values(status=new_status).returning(StockHold).execution_options(synchronize_session=False)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def expire_holds(db: AsyncSession, batch_size: int):
+        """Flips up to `batch_size` overdue holds to 'expired'; SKIP LOCKED lets replicas share the work."""
+        due = aliased(StockHold)
+        overdue = (
+            select(due.id)
+            .where(due.status == "held", due.expires_at <= func.now())
+            .order_by(due.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            update(StockHold)
+            .where(StockHold.id.in_(overdue))
+            .values(status="expired")
+            .returning(StockHold.product_id, StockHold.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
+
+    @staticmethod
+    async def find_idle_buckets(db: AsyncSession, idle_seconds: float, batch_size: int):
+        """(product_id, bucket) pairs untouched for `idle_seconds`. Takes no locks."""
+        result = await db.execute(
+            select(StockBucket.product_id, StockBucket.bucket)
+            .where(StockBucket.updated_at < func.now() - timedelta(seconds=idle_seconds))
+            .limit(batch_size)
+        )
+        return result.all()
+
+    @staticmethod
+    async def delete_idle_buckets(db: AsyncSession, keys: list[tuple[int, int]], idle_seconds: float):
+        """
+        Deletes the given buckets if they are STILL idle, returning
+        (product_id, available) so the caller can fold the stock back.
+        """
+        result = await db.execute(
+            delete(StockBucket)
+            .where(
+                tuple_(StockBucket.product_id, StockBucket.bucket).in_(keys),
+                StockBucket.updated_at < func.now() - timedelta(seconds=idle_seconds),
+            )
+            .returning(StockBucket.product_id, StockBucket.available)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
+
+    @staticmethod
+    async def count_live_holds(db: AsyncSession) -> int:
+        # Served from the partial index on live holds, so this stays cheap
+        result = await db.execute(select(func.count()).select_from(StockHold).where(StockHold.status == "held"))
+        return result.scalar_one()
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 from services.product_service.repository import ProductRepository
 from shared.config.database import get_db
 from shared.security.dependencies import verify_internal_api_key
-from .schemas import ProductCreate, ProductResponse, StockUpdate
-from .service import ProductService
+from .schemas import (
+    ProductCreate, ProductBatchResponse, ProductImportResult, ProductResponse,
+    StockHoldCreate, StockHoldResponse, StockUpdate, StockReservationRequest,
+)
+from .service import ProductService, StockHoldService
 
 router = APIRouter(dependencies=[Depends(verify_internal_api_key)])
 public_router = APIRouter()  # For any public endpoints (e.g. health check)
 
+MAX_BATCH_IDS = 500
+
 @public_router.get("/health")
 async def health_check():
     return {"service": "product", "status": "running"}
@@ -24,22 +30,20 @@ async def create_product(
 
 @router.get("/", response_model=list[ProductResponse])
 async def list_products(
+    response: Response,
     query: str | None = Query(default=None),
+    sort: Literal["id", "price", "name"] = Query(default="id"),
+    order: Literal["asc", "desc"] = Query(default="asc"),
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    after: str | None = Query(default=None, description="Opaque cursor from X-Next-Cursor"),
     db: AsyncSession = Depends(get_db)
 ):
-    products = await ProductService.list_products(db)
-
-    if query:
-        query_words = set(query.lower().split())
-        filtered = []
-
-        for p in products:
-            name_words = set(p.name.lower().split())
-            if query_words & name_words:
-                filtered.append(p)
-
-        products = filtered
-
+    try:
+        products, next_cursor = await ProductService.list_products(db, query, sort, order, limit, after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return products
 
 # Added proper route decorator and used Pydantic model for body
@@ -54,14 +58,106 @@ async def reduce_stock(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    
+
+@router.post("/reserve_stock", response_model=list[ProductResponse])
+async def reserve_stock(
+    payload: StockReservationRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Reserves every line item or none of them (single transaction)."""
+    try:
+        return await ProductService.reserve_stock(db, payload.items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/restore_stock", response_model=list[ProductResponse])
+async def restore_stock_bulk(
+    payload: StockReservationRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk compensation for /reserve_stock."""
+    return await ProductService.restore_stock_bulk(db, payload.items)
+
+@router.post("/holds", response_model=StockHoldResponse)
+async def create_hold(payload: StockHoldCreate, db: AsyncSession = Depends(get_db)):
+    """Reserves stock for `ttl_seconds`; auto-released by the reaper if never confirmed."""
+    try:
+        return await StockHoldService.create_hold(db, payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/holds/{hold_id}/confirm", response_model=StockHoldResponse)
+async def confirm_hold(hold_id: str, db: AsyncSession = Depends(get_db)):
+    try:
+        hold = await StockHoldService.confirm_hold(db, hold_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not hold:
+        raise HTTPException(status_code=404, detail="Hold not found")
+    return hold
+
+@router.post("/holds/{hold_id}/release", response_model=StockHoldResponse)
+async def release_hold(hold_id: str, db: AsyncSession = Depends(get_db)):
+    hold = await StockHoldService.release_hold(db, hold_id)
+    if not hold:
+        raise HTTPException(status_code=404, detail="Hold not found")
+    return hold
+
 @router.post("/reset_db")
 async def reset_db(db: AsyncSession = Depends(get_db)):
     """Deletes all products. FOR TESTING ONLY."""
-    await db.execute(text("TRUNCATE TABLE product_schema.products RESTART IDENTITY CASCADE"))
-    await db.commit()
+    await ProductService.reset_catalog(db)
     return {"status": "cleared"}
 
+async def _iter_body_lines(request: Request):
+    """Splits a streamed request body into lines without buffering it whole."""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if pending:
+        yield pending.decode("utf-8")
+
+@router.post("/import", response_model=ProductImportResult)
+async def import_products(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query(default="ndjson"),
+    key: Literal["sku", "name"] = Query(default="sku", description="Upsert key"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk upsert from an NDJSON or CSV (with header row) request body stream."""
+    return await ProductService.import_products(db, _iter_body_lines(request), format, key)
+
+# /export and /batch MUST be registered before /{product_id}, otherwise they are parsed as ids
+@router.get("/export")
+async def export_products():
+    """Streams the whole catalog as NDJSON, one product per line."""
+    return StreamingResponse(ProductService.export_products(), media_type="application/x-ndjson")
+
+
+@router.get("/catalog/version")
+async def get_catalog_version(db: AsyncSession = Depends(get_db)):
+    """Changes whenever product data changes, on any replica; lets callers key caches on the catalog state."""
+    return {"version": str(await ProductRepository.get_catalog_version(db))}
+
+
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    ids: str = Query(..., description="Comma-separated product ids, e.g. 1,2,3"),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        product_ids = [int(pid) for pid in ids.split(",") if pid.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="At least one product id is required")
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return await ProductService.get_products_by_ids(db, product_ids)
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
@@ -1,18 +1,54 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import AliasChoices, BaseModel, Field
 
 class ProductCreate(BaseModel):
     name: str
     price: float
     stock: int
+    sku: str | None = None
 
 class ProductResponse(BaseModel):
     id: int
     name: str
     price: float
-    stock: int
+    # ORM rows expose unallocated + bucketed stock as `available_stock`
+    stock: int = Field(validation_alias=AliasChoices("available_stock", "stock"))
+    sku: str | None = None
 
     class Config:
         from_attributes = True
 
+class ProductBatchResponse(BaseModel):
+    products: list[ProductResponse]  # In the order the ids were requested
+    missing: list[int]               # Requested ids that do not exist
+
 class StockUpdate(BaseModel):
     quantity: int
+
+class StockReservationItem(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+class StockReservationRequest(BaseModel):
+    items: list[StockReservationItem] = Field(min_length=1)
+
+class ProductImportResult(BaseModel):
+    inserted: int
+    updated: int
+    rejected: int
+    errors: list[str]  # First few rejected rows, "line N: reason"
+
+class StockHoldCreate(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+    ttl_seconds: int | None = Field(default=None, gt=0, le=3600)
+
+class StockHoldResponse(BaseModel):
+    id: str
+    product_id: int
+    quantity: int
+    status: str
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
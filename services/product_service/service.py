@@ -1,7 +1,63 @@
+import asyncio
+import base64
+import csv
+import json
+import logging
+import os
+import random
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import Product
-from .repository import ProductRepository
-from .schemas import ProductCreate
+from shared.config.database import AsyncSessionLocal
+from shared.observability import ecomm_stock_hold_events_total, ecomm_stock_hold_acquire_total, ecomm_stock_holds_active
+from .models import Product, StockHold
+from .cache import product_cache
+from .repository import ProductRepository, StockHoldRepository
+from .schemas import (
+    ProductCreate, ProductBatchResponse, ProductImportResult, ProductResponse,
+    StockHoldCreate, StockReservationItem,
+)
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_IMPORT_ERRORS = 20
+
+# Inventory holds
+STOCK_HOLD_TTL_SECONDS = int(os.getenv("STOCK_HOLD_TTL_SECONDS", "600"))
+STOCK_BUCKETS = int(os.getenv("STOCK_BUCKETS", "8"))
+STOCK_BUCKET_REFILL_CHUNK = int(os.getenv("STOCK_BUCKET_REFILL_CHUNK", "20"))
+STOCK_BUCKET_IDLE_SECONDS = float(os.getenv("STOCK_BUCKET_IDLE_SECONDS", "300"))
+STOCK_HOLD_REAP_INTERVAL_SECONDS = float(os.getenv("STOCK_HOLD_REAP_INTERVAL_SECONDS", "5"))
+STOCK_HOLD_REAP_BATCH = int(os.getenv("STOCK_HOLD_REAP_BATCH", "500"))
+
+# Python types a cursor's sort value may take, per sort column
+CURSOR_VALUE_TYPES = {"price": (int, float), "name": str}
+
+
+async def _products_changed(db: AsyncSession, *product_ids: int):
+    """After a committed write: drop those cached products, advance the shared catalog version."""
+    product_cache.invalidate(*product_ids)
+    await _bump_catalog_version(db)
+
+
+async def _catalog_replaced(db: AsyncSession):
+    product_cache.clear()
+    await _bump_catalog_version(db)
+
+
+async def _bump_catalog_version(db: AsyncSession):
+    # Best effort: the write has already committed, so this must never fail the
+    # request. Answers cached elsewhere under the old version just live out their TTL.
+    try:
+        await ProductRepository.bump_catalog_version(db)
+    except Exception as e:
+        logger.warning(f"Could not advance the catalog version: {e}")
+
 
 class ProductService:
 
@@ -10,33 +66,404 @@ class ProductService:
         product = Product(
             name=data.name,
             price=data.price,
-            stock=data.stock
+            stock=data.stock,
+            sku=data.sku
+        )
+        product = await ProductRepository.create_product(db, product)
+        await _products_changed(db, product.id)
+        return product
+
+    @staticmethod
+    async def reset_catalog(db: AsyncSession):
+        await ProductRepository.delete_all_products(db)
+        await _catalog_replaced(db)
+
+    @staticmethod
+    async def list_products(
+        db: AsyncSession,
+        query: str | None = None,
+        sort: str = "id",
+        order: str = "asc",
+        limit: int | None = None,
+        after: str | None = None,
+    ):
+        """Returns (products, next_cursor). next_cursor is None on the last page."""
+        # Same word-match semantics as before: any query word equal to a name word.
+        words = sorted(set(query.lower().split())) if query else []
+        if query and not words:
+            return [], None  # Whitespace only: no word to match, not "everything"
+        after_key = ProductService._decode_cursor(after, sort) if after else None
+
+        products = await ProductRepository.search_products(
+            db, words, sort=sort, descending=(order == "desc"), limit=limit, after=after_key
         )
-        return await ProductRepository.create_product(db, product)
+
+        next_cursor = None
+        if limit is not None and len(products) == limit:
+            next_cursor = ProductService._encode_cursor(products[-1], sort)
+        return products, next_cursor
+
+    @staticmethod
+    def _encode_cursor(product: Product, sort: str) -> str:
+        key = [sort, product.id] if sort == "id" else [sort, getattr(product, sort), product.id]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
 
     @staticmethod
-    async def list_products(db: AsyncSession):
-        return await ProductRepository.get_all_products(db)
+    def _decode_cursor(cursor: str, sort: str) -> tuple:
+        try:
+            key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise ValueError("Malformed 'after' cursor")
+        if not isinstance(key, list) or not key or key[0] != sort:
+            raise ValueError("'after' cursor does not match the requested sort")
+        # (id,) or (sort value, id), typed like the columns they are compared with
+        types = [int] if sort == "id" else [CURSOR_VALUE_TYPES[sort], int]
+        values = key[1:]
+        if len(values) != len(types) or not all(
+            isinstance(value, type_) and not isinstance(value, bool) for value, type_ in zip(values, types)
+        ):
+            raise ValueError("Malformed 'after' cursor")
+        return tuple(values)
 
     @staticmethod
     async def reduce_stock(db: AsyncSession, product_id: int, quantity: int):
-        # 1. Get Product
-        product = await ProductRepository.get_product_by_id(db, product_id)
-        if not product:
-            raise ValueError(f"Product {product_id} not found")
+        if quantity <= 0:
+            raise ValueError("Quantity must be a positive integer")
 
-        # 2. Check Stock
-        if product.stock < quantity:
-            raise ValueError(f"Insufficient stock for Product {product.name}")
+        # Happy path: one conditional UPDATE ... RETURNING round trip
+        product = await ProductRepository.reduce_stock(db, product_id, quantity)
+        if product:
+            await _products_changed(db, product_id)
+            return product
+
+        # products.stock alone is short, but units parked in hold buckets are
+        # still sellable (and counted in `stock` by every read)
+        products = await ProductService._take_stock(db, {product_id: quantity})
+        await _products_changed(db, product_id)
+        return products[0]
+
+    @staticmethod
+    async def reserve_stock(db: AsyncSession, items: list[StockReservationItem]):
+        """All-or-nothing stock reservation for a whole cart in one transaction."""
+        quantities = ProductService._merge_quantities(items)
+        products = await ProductService._take_stock(db, quantities)
+        await _products_changed(db, *quantities)
+        return products
+
+    @staticmethod
+    async def _take_stock(db: AsyncSession, quantities: dict[int, int]) -> list[Product]:
+        """
+        Takes every quantity from `products.stock` first and the rest from the
+        product's hold buckets, all or nothing, and commits. Locks products rows
+        before bucket rows, the same order as StockHoldService. Raises
+        ValueError (rolled back) if a product is missing or short.
+        """
+        locked = await ProductRepository.lock_products(db, list(quantities))
+        for product_id, quantity in quantities.items():
+            product = locked.get(product_id)
+            if not product:
+                await db.rollback()
+                raise ValueError(f"Product {product_id} not found")
+            shortfall = quantity - product.stock
+            if shortfall > 0 and await StockHoldRepository.drain_buckets(db, product_id, shortfall) < shortfall:
+                await db.rollback()
+                raise ValueError(f"Insufficient stock for Product {product.name}")
+
+        products = await ProductRepository.adjust_stock_bulk(
+            db, {pid: -min(qty, locked[pid].stock) for pid, qty in quantities.items()}
+        )
+        await db.commit()
+        return products
+
+    @staticmethod
+    async def restore_stock_bulk(db: AsyncSession, items: list[StockReservationItem]):
+        """Bulk compensation for reserve_stock. Unknown ids are ignored, not fatal."""
+        quantities = ProductService._merge_quantities(items)
+
+        locked = await ProductRepository.lock_products(db, list(quantities))
+        quantities = {pid: qty for pid, qty in quantities.items() if pid in locked}
+        if not quantities:
+            await db.rollback()
+            return []
+
+        products = await ProductRepository.adjust_stock_bulk(db, quantities)
+        await db.commit()
+        await _products_changed(db, *quantities)
+        return products
+
+    @staticmethod
+    def _merge_quantities(items: list[StockReservationItem]) -> dict[int, int]:
+        """Collapses duplicate product ids so each row is touched exactly once."""
+        quantities: dict[int, int] = {}
+        for item in items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        return quantities
 
-        # 3. Deduct
-        product.stock -= quantity
-        return await ProductRepository.update_product(db, product)
-    
     @staticmethod
     async def get_product_by_id(db: AsyncSession, product_id: int):
-        return await ProductRepository.get_product_by_id(db, product_id)
-    
+        return await product_cache.get_or_load(
+            product_id, lambda: ProductRepository.get_product_by_id(db, product_id)
+        )
+
+    @staticmethod
+    async def get_products_by_ids(db: AsyncSession, product_ids: list[int]) -> ProductBatchResponse:
+        """Cache hits first, then ONE query for the rest. Preserves request order."""
+        product_ids = list(dict.fromkeys(product_ids))  # de-dupe, keep order
+        found: dict[int, ProductResponse] = {}
+        for product_id in product_ids:
+            cached = product_cache.get(product_id)
+            if cached is not None:
+                found[product_id] = cached
+
+        to_load = [pid for pid in product_ids if pid not in found]
+        if to_load:
+            generation = product_cache.generation
+            for product in await ProductRepository.get_products_by_ids(db, to_load):
+                response = ProductResponse.model_validate(product)
+                product_cache.put(product.id, response, generation)
+                found[product.id] = response
+
+        return ProductBatchResponse(
+            products=[found[pid] for pid in product_ids if pid in found],
+            missing=[pid for pid in product_ids if pid not in found],
+        )
+
+    @staticmethod
+    async def update_product(db: AsyncSession, product: Product):
+        product = await ProductRepository.update_product(db, product)
+        await _products_changed(db, product.id)
+        return product
+
     @staticmethod
     async def restore_stock(db: AsyncSession, product_id: int, quantity: int):
-        return await ProductRepository.restore_stock(db, product_id, quantity)
\ No newline at end of file
+        product = await ProductRepository.restore_stock(db, product_id, quantity)
+        await _products_changed(db, product_id)
+        return product
+
+    @staticmethod
+    async def import_products(
+        db: AsyncSession, lines: AsyncIterator[str], fmt: str, key: str
+    ) -> ProductImportResult:
+        """
+        Streams NDJSON or CSV lines into batched upserts keyed by `key`
+        ("sku" or "name"). Each batch is its own transaction, so a 500k-row feed
+        never holds one giant transaction open; bad rows are skipped and reported.
+        """
+        result = ProductImportResult(inserted=0, updated=0, rejected=0, errors=[])
+        upsert = ProductRepository.upsert_by_sku if key == "sku" else ProductRepository.upsert_by_name
+        batch: dict[str, dict] = {}  # keyed, so a duplicate in one batch keeps the last row
+
+        async def flush():
+            if not batch:
+                return
+            inserted, updated = await upsert(db, list(batch.values()))
+            await db.commit()
+            result.inserted += inserted
+            result.updated += updated
+            batch.clear()
+
+        def reject(line_no: int, reason: str):
+            result.rejected += 1
+            if len(result.errors) < MAX_REPORTED_IMPORT_ERRORS:
+                result.errors.append(f"line {line_no}: {reason}")
+
+        async for line_no, raw in ProductService._parse_rows(lines, fmt):
+            if isinstance(raw, str):  # parse error
+                reject(line_no, raw)
+                continue
+            try:
+                row = ProductCreate.model_validate(raw).model_dump()
+            except ValidationError as e:
+                reject(line_no, e.errors()[0]["msg"])
+                continue
+            if not row[key]:
+                reject(line_no, f"missing '{key}'")
+                continue
+
+            batch[row[key]] = row
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+
+        await flush()
+        await _catalog_replaced(db)
+        return result
+
+    @staticmethod
+    async def _parse_rows(lines: AsyncIterator[str], fmt: str):
+        """Yields (line_no, dict) per row, or (line_no, error message) for bad lines."""
+        header = None
+        line_no = 0
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            if fmt == "ndjson":
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, f"invalid JSON ({e.msg})"
+                continue
+
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [h.strip() for h in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, f"expected {len(header)} columns, got {len(values)}"
+                continue
+            yield line_no, {h: (v if v != "" else None) for h, v in zip(header, values)}
+
+    @staticmethod
+    async def export_products() -> AsyncIterator[str]:
+        """
+        NDJSON export over a server-side cursor. Opens its OWN session: the
+        request-scoped one from get_db is closed before a streaming body is sent.
+        """
+        async with AsyncSessionLocal() as db:
+            async for product in ProductRepository.stream_products(db, EXPORT_BATCH_SIZE):
+                yield ProductResponse.model_validate(product).model_dump_json() + "\n"
+
+
+
+class StockHoldService:
+    """
+    TTL stock holds backed by bucketed availability (see models.StockBucket).
+
+    Lock order is ALWAYS products row -> bucket rows, never the reverse, so the
+    refill, rebalance and drain paths cannot deadlock each other. The fast
+    path only ever touches a single bucket with SKIP LOCKED.
+    """
+
+    @staticmethod
+    async def create_hold(db: AsyncSession, data: StockHoldCreate) -> StockHold:
+        product_id, quantity = data.product_id, data.quantity
+
+        # 1. Fast path: any unlocked bucket with enough stock
+        path = "bucket"
+        bucket = await StockHoldRepository.take_from_any_bucket(db, product_id, quantity)
+
+        if bucket is None:
+            # 2. Refill: carve a chunk off products.stock, keep the surplus in a bucket
+            path = "refill"
+            carved = await StockHoldRepository.carve_from_product(
+                db, product_id, quantity, STOCK_BUCKET_REFILL_CHUNK
+            )
+            if carved > quantity:
+                await StockHoldRepository.add_to_bucket(
+                    db, product_id, random.randrange(STOCK_BUCKETS), carved - quantity
+                )
+            elif not carved:
+                # 3. Rebalance: stock exists but is spread over several buckets
+                path = "rebalance"
+                if not await StockHoldService._take_across_buckets(db, product_id, quantity):
+                    await db.rollback()
+                    ecomm_stock_hold_acquire_total.labels(path="insufficient").inc()
+                    product = await ProductRepository.get_product_by_id(db, product_id)
+                    if not product:
+                        raise ValueError(f"Product {product_id} not found")
+                    raise ValueError(f"Insufficient stock for Product {product.name}")
+
+        ttl = data.ttl_seconds or STOCK_HOLD_TTL_SECONDS
+        hold = StockHold(
+            id=str(uuid.uuid4()),
+            product_id=product_id,
+            quantity=quantity,
+            status="held",
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl),
+        )
+        await StockHoldRepository.create_hold(db, hold)
+        await db.commit()
+
+        await _products_changed(db, product_id)
+        ecomm_stock_hold_acquire_total.labels(path=path).inc()
+        ecomm_stock_hold_events_total.labels(event="created").inc()
+        return hold
+
+    @staticmethod
+    async def _take_across_buckets(db: AsyncSession, product_id: int, quantity: int) -> bool:
+        """Slow path: drain buckets (and any products.stock remainder) under locks."""
+        remaining = quantity - await StockHoldRepository.drain_buckets(db, product_id, quantity)
+        if remaining:
+            remaining -= await StockHoldRepository.carve_from_product(db, product_id, 0, remaining)
+        return remaining == 0
+
+    @staticmethod
+    async def confirm_hold(db: AsyncSession, hold_id: str) -> StockHold | None:
+        """
+        Payment succeeded: the held units become a sale. Raises ValueError if the
+        hold already expired or was released, so the caller can compensate.
+        """
+        hold = await StockHoldRepository.transition_hold(db, hold_id, "confirmed", live_only_unexpired=True)
+        if hold:
+            await db.commit()
+            ecomm_stock_hold_events_total.labels(event="confirmed").inc()
+            return hold
+
+        hold = await StockHoldRepository.get_hold(db, hold_id)
+        if not hold:
+            return None
+        if hold.status == "held":
+            # Past its TTL but the reaper has not got to it yet; give the stock back now
+            await StockHoldService.release_hold(db, hold_id, event="expired")
+            raise ValueError(f"Hold {hold_id} is expired")
+        raise ValueError(f"Hold {hold_id} is {hold.status}")
+
+    @staticmethod
+    async def release_hold(db: AsyncSession, hold_id: str, event: str = "released") -> StockHold | None:
+        """Saga compensation. Idempotent: releasing a non-live hold is a no-op."""
+        hold = await StockHoldRepository.transition_hold(db, hold_id, event)
+        if not hold:
+            return await StockHoldRepository.get_hold(db, hold_id)
+
+        await StockHoldRepository.add_to_bucket(
+            db, hold.product_id, random.randrange(STOCK_BUCKETS), hold.quantity
+        )
+        await db.commit()
+        await _products_changed(db, hold.product_id)
+        ecomm_stock_hold_events_total.labels(event=event).inc()
+        return hold
+
+    @staticmethod
+    async def reap_once(db: AsyncSession):
+        # 1. Expired holds: hand their units back to the bucket pool
+        expired = await StockHoldRepository.expire_holds(db, STOCK_HOLD_REAP_BATCH)
+        returned: dict[int, int] = defaultdict(int)
+        for product_id, quantity in expired:
+            returned[product_id] += quantity
+        for product_id, quantity in sorted(returned.items()):
+            await StockHoldRepository.add_to_bucket(db, product_id, random.randrange(STOCK_BUCKETS), quantity)
+        await db.commit()
+        if expired:
+            await _products_changed(db, *returned)
+            ecomm_stock_hold_events_total.labels(event="expired").inc(len(expired))
+
+        # 2. Idle buckets: fold their stock back into products.stock so the
+        #    single-statement reduce_stock fast path can use it again
+        idle = await StockHoldRepository.find_idle_buckets(db, STOCK_BUCKET_IDLE_SECONDS, STOCK_HOLD_REAP_BATCH)
+        if idle:
+            await ProductRepository.lock_products(db, sorted({product_id for product_id, _ in idle}))
+            drained = await StockHoldRepository.delete_idle_buckets(
+                db, [tuple(key) for key in idle], STOCK_BUCKET_IDLE_SECONDS
+            )
+            deltas: dict[int, int] = defaultdict(int)
+            for product_id, available in drained:
+                deltas[product_id] += available
+            deltas = {pid: qty for pid, qty in deltas.items() if qty}
+            if deltas:
+                await ProductRepository.adjust_stock_bulk(db, deltas)
+            await db.commit()
+
+        ecomm_stock_holds_active.set(await StockHoldRepository.count_live_holds(db))
+
+    @staticmethod
+    async def run_reaper():
+        """Background loop started by main.py. Safe to run on every replica (SKIP LOCKED)."""
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    await StockHoldService.reap_once(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stock hold reaper iteration failed: {e}")
+            await asyncio.sleep(STOCK_HOLD_REAP_INTERVAL_SECONDS)
@@ -3,14 +3,25 @@ FIX GAP #8: Added setup_observability() call.
 Previously session_service produced no structured logs, traces, or metrics.
 Every cart operation was invisible to the observability stack.
 """
+import asyncio
+import logging
+import os
 from fastapi import FastAPI
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 
-from shared.config.database import Base, engine
+from shared.config.database import AsyncSessionLocal, Base, engine
+from shared.observability import ecomm_active_carts
 from shared.observability.setup import setup_observability
 
 from .models import Session, SessionItem  
 from .router import router, public_router
+from .store import cart_store
+
+logger = logging.getLogger(__name__)
+
+CART_LINE_INDEX = "ux_session_items_session_product"
+CART_SWEEP_INTERVAL_SECONDS = float(os.getenv("CART_SWEEP_INTERVAL_SECONDS", "60"))
+CART_SWEEP_BATCH = int(os.getenv("CART_SWEEP_BATCH", "1000"))
 
 session_app = FastAPI(title="Session Service", version="2.0.0")
 
@@ -23,4 +34,67 @@ session_app.include_router(router)
 async def startup_event():
     async with engine.begin() as conn:
         await conn.execute(text("CREATE SCHEMA IF NOT EXISTS session_schema"))
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all skips columns/indexes on tables that already exist
+        await conn.execute(text(
+            "ALTER TABLE session_schema.sessions "
+            "ADD COLUMN IF NOT EXISTS last_activity_at TIMESTAMPTZ NOT NULL DEFAULT now()"
+        ))
+        for index in Session.__table__.indexes:
+            await conn.run_sync(index.create, checkfirst=True)
+        await conn.run_sync(_ensure_unique_cart_lines)
+
+    session_app.state.cart_sweeper = asyncio.create_task(_sweep_expired_carts())
+
+
+@session_app.on_event("shutdown")
+async def shutdown_event():
+    session_app.state.cart_sweeper.cancel()
+
+
+async def _sweep_expired_carts():
+    """
+    Deletes abandoned carts in bounded batches, each in its own transaction,
+    then recounts ecomm_active_carts from the store. Counting (rather than
+    tracking this process's own creates and deletes) makes every replica
+    report the same store-wide number.
+    """
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                while await cart_store.sweep_expired(db, CART_SWEEP_BATCH) == CART_SWEEP_BATCH:
+                    await asyncio.sleep(0)  # Full batch: more may be due, but yield first
+                active = await cart_store.count_carts(db)
+            if active is not None:
+                ecomm_active_carts.set(active)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cart sweeper iteration failed: {e}")
+        await asyncio.sleep(CART_SWEEP_INTERVAL_SECONDS)
+
+
+def _ensure_unique_cart_lines(sync_conn):
+    """
+    One-off upgrade for pre-existing tables: merge duplicate (session, product)
+    rows left by the old SELECT-then-INSERT add_item, then build the unique index.
+    """
+    if inspect(sync_conn).has_index("session_items", CART_LINE_INDEX, schema="session_schema"):
+        return
+    sync_conn.execute(text("""
+        UPDATE session_schema.session_items s SET quantity = d.total
+        FROM (
+            SELECT min(id) AS keep_id, sum(quantity) AS total
+            FROM session_schema.session_items
+            GROUP BY session_id, product_id HAVING count(*) > 1
+        ) d
+        WHERE s.id = d.keep_id
+    """))
+    sync_conn.execute(text("""
+        DELETE FROM session_schema.session_items s
+        USING session_schema.session_items k
+        WHERE s.session_id = k.session_id AND s.product_id = k.product_id AND s.id > k.id
+    """))
+    for index in SessionItem.__table__.indexes:
+        if index.name == CART_LINE_INDEX:
+            index.create(sync_conn)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from shared.config.database import Base
 
@@ -9,6 +9,8 @@ class Session(Base):
     session_id = Column(String, primary_key=True, index=True) # UUID string
     user_id = Column(Integer, nullable=True)
     is_active = Column(Boolean, default=True)
+    # Bumped on every cart mutation; indexed so the expiry sweep is a range scan
+    last_activity_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
     
     # Relationship to items
     items = relationship("SessionItem", back_populates="session", lazy="selectin")
@@ -22,4 +24,8 @@ class SessionItem(Base):
     product_id = Column(Integer, nullable=False)
     quantity = Column(Integer, default=1)
 
-    session = relationship("Session", back_populates="items")
\ No newline at end of file
+    session = relationship("Session", back_populates="items")
+
+# One row per (cart, product): lets add_item be a single INSERT ... ON CONFLICT
+# and makes concurrent adds of the same product merge instead of duplicating.
+Index("ux_session_items_session_product", SessionItem.session_id, SessionItem.product_id, unique=True)
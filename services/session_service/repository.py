@@ -1,5 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, values, column, func, text, true, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import joinedload
 from .models import Session, SessionItem
 
 class SessionRepository:
@@ -12,26 +14,58 @@ class SessionRepository:
 
     @staticmethod
     async def get_session(db: AsyncSession, session_id: str):
-        result = await db.execute(select(Session).where(Session.session_id == session_id))
-        return result.scalars().first()
-
-    @staticmethod
-    async def add_item(db: AsyncSession, item: SessionItem):
+        """Session + items in ONE joined query (populate_existing refreshes a stale identity map)."""
         result = await db.execute(
-            select(SessionItem)
-            .where(SessionItem.session_id == item.session_id)
-            .where(SessionItem.product_id == item.product_id)
+            select(Session)
+            .options(joinedload(Session.items))
+            .where(Session.session_id == session_id)
+            .execution_options(populate_existing=True)
         )
-        existing_item = result.scalars().first()
+        return result.unique().scalars().first()
 
-        if existing_item:
-            existing_item.quantity += item.quantity
-        else:
-            db.add(item)
-            
-        await db.commit()
-        return True
+    @staticmethod
+    async def add_items(db: AsyncSession, session_id: str, lines: dict[int, int]) -> list[int]:
+        """
+        Atomic multi-line upsert on the (session_id, product_id) unique index, in
+        ONE statement. Concurrent adds of the same product add up instead of
+        racing a SELECT-then-INSERT, and the same statement bumps the session's
+        last_activity_at. `lines` is {product_id: quantity} (already de-duplicated,
+        since ON CONFLICT cannot touch one row twice). Returns the resulting
+        quantities; empty means the session does not exist. Does NOT commit.
+        """
+        touched = (
+            update(Session)
+            .where(Session.session_id == session_id)
+            .values(last_activity_at=func.now())
+            .returning(Session.session_id)
+            .cte("touched")
+        )
+        incoming = values(
+            column("product_id", Integer), column("quantity", Integer), name="incoming"
+        ).data(sorted(lines.items()))
+        stmt = pg_insert(SessionItem).from_select(
+            ["session_id", "product_id", "quantity"],
+            # touched has one row, or none if the session is missing (then nothing is inserted)
+            select(touched.c.session_id, incoming.c.product_id, incoming.c.quantity)
+            .select_from(touched.join(incoming, true())),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SessionItem.session_id, SessionItem.product_id],
+            set_={"quantity": SessionItem.quantity + stmt.excluded.quantity},
+        ).returning(SessionItem.quantity).add_cte(touched)
+        result = await db.execute(stmt)
+        return result.scalars().all()
     
+    @staticmethod
+    async def touch_session(db: AsyncSession, session_id: str):
+        """Marks the cart as active now. Does NOT commit."""
+        await db.execute(
+            update(Session)
+            .where(Session.session_id == session_id)
+            .values(last_activity_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
     @staticmethod
     async def remove_item(db: AsyncSession, session_id: str, product_id: int):
         stmt = delete(SessionItem).where(
@@ -39,6 +73,7 @@ class SessionRepository:
             SessionItem.product_id == product_id
         )
         await db.execute(stmt)
+        await SessionRepository.touch_session(db, session_id)
         await db.commit()
 
     @staticmethod
@@ -46,4 +81,40 @@ class SessionRepository:
         """Deletes all items for the session and forces a commit."""
         stmt = delete(SessionItem).where(SessionItem.session_id == session_id)
         await db.execute(stmt)
-        await db.commit() 
\ No newline at end of file
+        await SessionRepository.touch_session(db, session_id)
+        await db.commit()
+
+    @staticmethod
+    async def delete_expired_sessions(db: AsyncSession, ttl_seconds: int, batch_size: int) -> int:
+        """
+        Deletes up to `batch_size` sessions idle for longer than `ttl_seconds`,
+        items included, in ONE statement. The oldest-first range scan on
+        ix_..._last_activity_at keeps each batch cheap; SKIP LOCKED lets
+        several replicas sweep without blocking carts being used right now.
+        """
+        result = await db.execute(
+            text("""
+                WITH expired AS (
+                    SELECT session_id FROM session_schema.sessions
+                    WHERE last_activity_at < now() - make_interval(secs => :ttl)
+                    ORDER BY last_activity_at
+                    LIMIT :batch
+                    FOR UPDATE SKIP LOCKED
+                ), dropped_items AS (
+                    DELETE FROM session_schema.session_items
+                    WHERE session_id IN (SELECT session_id FROM expired)
+                )
+                DELETE FROM session_schema.sessions
+                WHERE session_id IN (SELECT session_id FROM expired)
+                RETURNING session_id
+            """),
+            {"ttl": ttl_seconds, "batch": batch_size},
+        )
+        deleted = len(result.all())
+        await db.commit()
+        return deleted
+
+    @staticmethod
+    async def count_sessions(db: AsyncSession) -> int:
+        result = await db.execute(select(func.count()).select_from(Session))
+        return result.scalar_one()
\ No newline at end of file
@@ -12,7 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from shared.config.database import get_db
 from shared.security.dependencies import verify_internal_api_key
 
-from .schemas import SessionCreate, SessionItemCreate, SessionResponse
+from .schemas import SessionCreate, SessionItemCreate, SessionItemsBatch, SessionResponse
 from .service import SessionService
 
 router = APIRouter(dependencies=[Depends(verify_internal_api_key)])
@@ -40,10 +40,22 @@ async def get_session(session_id: str, db: AsyncSession = Depends(get_db)):
 async def add_item(
     session_id: str, item: SessionItemCreate, db: AsyncSession = Depends(get_db)
 ):
-    session = await SessionService.get_session(db, session_id)
+    # No existence pre-check: the upsert's FK tells us if the session is missing
+    session = await SessionService.add_item_to_session(db, session_id, item)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+@router.post("/{session_id}/items:batch", response_model=SessionResponse)
+async def add_items_batch(
+    session_id: str, batch: SessionItemsBatch, db: AsyncSession = Depends(get_db)
+):
+    """Adds many line items in one transaction (all or nothing)."""
+    session = await SessionService.add_items_to_session(db, session_id, batch)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return await SessionService.add_item_to_session(db, session_id, item)
+    return session
 
 
 @router.delete("/{session_id}/items/{product_id}", response_model=SessionResponse)
@@ -1,9 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class SessionItemCreate(BaseModel):
     product_id: int
-    quantity: int
+    # A zero or negative add would write a bogus cart line; reject it per item
+    quantity: int = Field(gt=0)
+
+class SessionItemsBatch(BaseModel):
+    items: List[SessionItemCreate] = Field(min_length=1, max_length=500)
 
 class SessionItemResponse(BaseModel):
     product_id: int
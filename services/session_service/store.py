@@ -0,0 +1,300 @@
+"""
+Pluggable cart storage backends.
+
+Carts are short-lived, write-heavy state, so Postgres is not always the right
+home for them. Every backend implements the same CartStore contract and returns
+SessionResponse-compatible objects, so router/service code is backend-agnostic.
+
+Select with CART_STORE_BACKEND:
+  - "postgres" (default): durable, via SessionRepository; idle carts are
+                           deleted by the sweeper in main.py.
+  - "memory": in-process dict with sliding TTL. Single replica only.
+  - "redis": any Redis-protocol server (Redis, Valkey, KeyDB, a local stand-in)
+             at CART_STORE_REDIS_URL. Needs the optional `redis` package.
+"""
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Session
+from .repository import SessionRepository
+from .schemas import SessionItemResponse, SessionResponse
+
+CART_STORE_BACKEND = os.getenv("CART_STORE_BACKEND", "postgres")
+CART_STORE_REDIS_URL = os.getenv("CART_STORE_REDIS_URL", "redis://localhost:6379/0")
+CART_TTL_SECONDS = int(os.getenv("CART_TTL_SECONDS", "86400"))
+
+
+class CartStore(ABC):
+    """Storage contract. `db` is only used by the Postgres backend."""
+
+    @abstractmethod
+    async def create_session(self, db: AsyncSession, session_id: str, user_id: Optional[int]):
+        """Creates an empty, active cart and returns it."""
+
+    @abstractmethod
+    async def get_session(self, db: AsyncSession, session_id: str):
+        """Returns the session with its items, or None if it does not exist."""
+
+    @abstractmethod
+    async def add_item(self, db: AsyncSession, session_id: str, product_id: int, quantity: int):
+        """Adds `quantity` to the line. Returns the updated session, or None if missing."""
+
+    @abstractmethod
+    async def add_items(self, db: AsyncSession, session_id: str, lines: dict[int, int]):
+        """Applies many {product_id: quantity} adds atomically. Same return as add_item."""
+
+    @abstractmethod
+    async def remove_item(self, db: AsyncSession, session_id: str, product_id: int):
+        """Drops the line. Returns the updated session, or None if missing."""
+
+    @abstractmethod
+    async def clear_cart(self, db: AsyncSession, session_id: str) -> None:
+        """Empties the cart's lines; a no-op if the session does not exist."""
+
+    @abstractmethod
+    async def sweep_expired(self, db: AsyncSession, batch_size: int) -> int:
+        """Deletes up to `batch_size` carts idle longer than the TTL. Returns how many."""
+
+    @abstractmethod
+    async def count_carts(self, db: AsyncSession) -> int | None:
+        """Carts in the whole store, for ecomm_active_carts after each sweep (None = not tracked)."""
+
+
+class PostgresCartStore(CartStore):
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+
+    async def create_session(self, db, session_id, user_id):
+        session = Session(session_id=session_id, user_id=user_id, is_active=True)
+        session = await SessionRepository.create_session(db, session)
+        return session
+
+    async def get_session(self, db, session_id):
+        return await SessionRepository.get_session(db, session_id)
+
+    async def add_item(self, db, session_id, product_id, quantity):
+        return await self.add_items(db, session_id, {product_id: quantity})
+
+    async def add_items(self, db, session_id, lines):
+        if not await SessionRepository.add_items(db, session_id, lines):
+            await db.rollback()
+            return None  # The session does not exist
+        session = await SessionRepository.get_session(db, session_id)
+        await db.commit()
+        return session
+
+    async def remove_item(self, db, session_id, product_id):
+        await SessionRepository.remove_item(db, session_id, product_id)
+        return await SessionRepository.get_session(db, session_id)
+
+    async def clear_cart(self, db, session_id):
+        await SessionRepository.clear_cart(db, session_id)
+
+    async def sweep_expired(self, db, batch_size):
+        return await SessionRepository.delete_expired_sessions(db, self.ttl_seconds, batch_size)
+
+    async def count_carts(self, db):
+        return await SessionRepository.count_sessions(db)
+
+
+def _snapshot(session_id: str, user_id: Optional[int], is_active: bool, items: dict[int, int]) -> SessionResponse:
+    return SessionResponse(
+        session_id=session_id,
+        user_id=user_id,
+        is_active=is_active,
+        items=[SessionItemResponse(product_id=pid, quantity=qty) for pid, qty in items.items()],
+    )
+
+
+class MemoryCartStore(CartStore):
+    """
+    Sliding-TTL carts in a dict ordered by last access. Every mutation is
+    synchronous (no await inside), so the event loop makes them atomic without
+    locks, and expired carts are evicted from the cold end in O(1) amortised.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        # session_id -> [expires_at, user_id, is_active, {product_id: quantity}]
+        self._carts: "OrderedDict[str, list]" = OrderedDict()
+
+    def _evict_expired(self, limit: int | None = None) -> int:
+        now = time.monotonic()
+        evicted = 0
+        while self._carts and (limit is None or evicted < limit):
+            session_id, cart = next(iter(self._carts.items()))
+            if cart[0] > now:
+                break
+            del self._carts[session_id]
+            evicted += 1
+        return evicted
+
+    def _touch(self, session_id: str) -> Optional[list]:
+        self._evict_expired()
+        cart = self._carts.get(session_id)
+        if cart is not None:
+            cart[0] = time.monotonic() + self.ttl_seconds
+            self._carts.move_to_end(session_id)
+        return cart
+
+    def _render(self, session_id: str, cart: Optional[list]):
+        if cart is None:
+            return None
+        _, user_id, is_active, items = cart
+        return _snapshot(session_id, user_id, is_active, items)
+
+    async def create_session(self, db, session_id, user_id):
+        self._evict_expired()
+        self._carts[session_id] = [time.monotonic() + self.ttl_seconds, user_id, True, {}]
+        return self._render(session_id, self._carts[session_id])
+
+    async def get_session(self, db, session_id):
+        return self._render(session_id, self._touch(session_id))
+
+    async def add_item(self, db, session_id, product_id, quantity):
+        return await self.add_items(db, session_id, {product_id: quantity})
+
+    async def add_items(self, db, session_id, lines):
+        cart = self._touch(session_id)
+        if cart is not None:
+            items = cart[3]
+            for product_id, quantity in lines.items():
+                items[product_id] = items.get(product_id, 0) + quantity
+        return self._render(session_id, cart)
+
+    async def remove_item(self, db, session_id, product_id):
+        cart = self._touch(session_id)
+        if cart is not None:
+            cart[3].pop(product_id, None)
+        return self._render(session_id, cart)
+
+    async def clear_cart(self, db, session_id):
+        cart = self._touch(session_id)
+        if cart is not None:
+            cart[3].clear()
+
+    async def sweep_expired(self, db, batch_size):
+        return self._evict_expired(batch_size)
+
+    async def count_carts(self, db):
+        return len(self._carts)
+
+
+class RedisCartStore(CartStore):
+    """
+    One hash per cart, `cart:{session_id}`: metadata under `_user_id`/`_active`,
+    lines under `item:{product_id}`. Each call is a single MULTI/EXEC pipeline
+    (one round trip), and EXPIRE gives the cart a sliding TTL. add_items also
+    WATCHes the cart, since HINCRBY would recreate one that was just deleted.
+    Only core commands are used (no Lua), so any Redis-protocol stand-in will do.
+
+    Expiry is Redis' own EXPIRE and counting carts would need a SCAN, so
+    ecomm_active_carts is not reported for this backend.
+    """
+
+    def __init__(self, url: str, ttl_seconds: int):
+        try:
+            import redis.asyncio as aioredis
+            from redis.exceptions import WatchError
+        except ImportError as e:
+            raise RuntimeError(
+                "CART_STORE_BACKEND=redis requires the 'redis' package (pip install 'redis>=5.0')"
+            ) from e
+        self.client = aioredis.from_url(url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self._watch_error = WatchError
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"cart:{session_id}"
+
+    @staticmethod
+    def _render(session_id: str, fields: dict):
+        if not fields:
+            return None
+        user_id = fields.get("_user_id")
+        items = {
+            int(name.removeprefix("item:")): int(qty)
+            for name, qty in fields.items()
+            if name.startswith("item:")
+        }
+        return _snapshot(session_id, int(user_id) if user_id else None, fields.get("_active") == "1", items)
+
+    async def create_session(self, db, session_id, user_id):
+        key = self._key(session_id)
+        fields = {"_user_id": "" if user_id is None else str(user_id), "_active": "1"}
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+        return self._render(session_id, fields)
+
+    async def get_session(self, db, session_id):
+        key = self._key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(key)
+            pipe.expire(key, self.ttl_seconds)
+            fields, _ = await pipe.execute()
+        return self._render(session_id, fields)
+
+    async def add_item(self, db, session_id, product_id, quantity):
+        return await self.add_items(db, session_id, {product_id: quantity})
+
+    async def add_items(self, db, session_id, lines):
+        key = self._key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # EXEC fails if the cart changes after the check (e.g. it expires),
+                    # so HINCRBY never recreates a cart that is gone
+                    await pipe.watch(key)
+                    if not await pipe.exists(key):
+                        return None
+                    pipe.multi()
+                    for product_id, quantity in lines.items():
+                        pipe.hincrby(key, f"item:{product_id}", quantity)
+                    pipe.expire(key, self.ttl_seconds)
+                    pipe.hgetall(key)
+                    fields = (await pipe.execute())[-1]
+                    return self._render(session_id, fields)
+                except self._watch_error:
+                    continue  # Raced another write to this cart; check again
+
+    async def remove_item(self, db, session_id, product_id):
+        key = self._key(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hdel(key, f"item:{product_id}")
+            pipe.expire(key, self.ttl_seconds)
+            pipe.hgetall(key)
+            _, _, fields = await pipe.execute()
+        return self._render(session_id, fields)
+
+    async def clear_cart(self, db, session_id):
+        key = self._key(session_id)
+        lines = [name for name in await self.client.hkeys(key) if name.startswith("item:")]
+        if lines:
+            await self.client.hdel(key, *lines)
+
+    async def sweep_expired(self, db, batch_size):
+        return 0  # Redis expires keys itself
+
+    async def count_carts(self, db):
+        return None
+
+
+def create_cart_store(backend: str = CART_STORE_BACKEND) -> CartStore:
+    if backend == "postgres":
+        return PostgresCartStore(CART_TTL_SECONDS)
+    if backend == "memory":
+        return MemoryCartStore(CART_TTL_SECONDS)
+    if backend == "redis":
+        return RedisCartStore(CART_STORE_REDIS_URL, CART_TTL_SECONDS)
+    raise ValueError(f"Unknown CART_STORE_BACKEND '{backend}' (expected postgres, memory or redis)")
+
+
+cart_store = create_cart_store()
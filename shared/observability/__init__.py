@@ -3,6 +3,31 @@ from .metrics import (
     ecomm_checkout_total,
     ecomm_checkout_duration_seconds,
     ecomm_saga_compensation_total,
+    ecomm_saga_compensation_retries_total,
+    ecomm_saga_compensation_queue_depth,
+    ecomm_saga_compensation_lag_seconds,
+    ecomm_chat_latency_seconds,
+    ecomm_chat_ttfb_seconds,
     ecomm_llm_tokens_total,
-    ecomm_active_carts
+    ecomm_llm_latency_seconds,
+    ecomm_graph_node_latency_seconds,
+    ecomm_tool_latency_seconds,
+    ecomm_tool_step_fanout,
+    ecomm_tool_step_latency_seconds,
+    ecomm_tool_wait_seconds,
+    ecomm_llm_prompt_tokens,
+    ecomm_fast_path_requests_total,
+    ecomm_fast_path_latency_seconds,
+    ecomm_response_cache_events_total,
+    ecomm_active_carts,
+    ecomm_product_cache_events_total,
+    ecomm_stock_hold_events_total,
+    ecomm_stock_hold_acquire_total,
+    ecomm_stock_holds_active,
+    ecomm_http_pool_in_use,
+    ecomm_http_pool_limit,
+    ecomm_http_pool_wait_seconds,
+    ecomm_checkpoint_threads,
+    ecomm_checkpoint_bytes,
+    ecomm_checkpoint_evictions_total
 )
\ No newline at end of file
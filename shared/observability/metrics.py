@@ -18,13 +18,175 @@ ecomm_saga_compensation_total = Counter(
     ["step_name"] # Labels: 'lock_cart_item', 'reduce_stock', etc.
 )
 
+ecomm_saga_compensation_retries_total = Counter(
+    "ecomm_saga_compensation_retries_total",
+    "Queued saga compensations that failed and were rescheduled",
+    ["step_name"]
+)
+
+ecomm_saga_compensation_queue_depth = Gauge(
+    "ecomm_saga_compensation_queue_depth",
+    "Failed sagas whose compensations are still pending"
+)
+
+ecomm_saga_compensation_lag_seconds = Gauge(
+    "ecomm_saga_compensation_lag_seconds",
+    "Age of the oldest pending saga compensation"
+)
+
+# Chat Latency Metrics
+ecomm_chat_latency_seconds = Histogram(
+    "ecomm_chat_latency_seconds",
+    "Total chat turn latency",
+    ["endpoint"], # Labels: 'chat', 'chat_stream'
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+)
+
+ecomm_chat_ttfb_seconds = Histogram(
+    "ecomm_chat_ttfb_seconds",
+    "Time until the first streamed event of a chat turn",
+    ["endpoint"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+)
+
 ecomm_llm_tokens_total = Counter(
     "ecomm_llm_tokens_total", 
     "Total LLM tokens used", 
     ["model", "type"] # Labels: type='prompt' or 'completion'
 )
 
+ecomm_llm_latency_seconds = Histogram(
+    "ecomm_llm_latency_seconds",
+    "Latency of a single LLM call",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+)
+
+ecomm_graph_node_latency_seconds = Histogram(
+    "ecomm_graph_node_latency_seconds",
+    "Latency of one agent graph node or router run",
+    ["node"], # Labels: 'Sales', 'Checkout', 'FastPath', 'supervisor', 'post_sales_router'
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0)
+)
+
+ecomm_tool_latency_seconds = Histogram(
+    "ecomm_tool_latency_seconds",
+    "Latency of one agent tool call",
+    ["tool", "status"], # Labels: status='ok' or 'error'
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+ecomm_tool_step_fanout = Histogram(
+    "ecomm_tool_step_fanout",
+    "Tool calls emitted in one LLM step",
+    ["agent"], # Labels: 'Sales', 'Checkout'
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64)
+)
+
+ecomm_tool_step_latency_seconds = Histogram(
+    "ecomm_tool_step_latency_seconds",
+    "Wall time to execute all tool calls of one LLM step",
+    ["agent"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+ecomm_tool_wait_seconds = Histogram(
+    "ecomm_tool_wait_seconds",
+    "Time a tool call waited before running",
+    ["tool", "reason"], # Labels: reason='concurrency' (per-tool cap) or 'session' (cart write ordering)
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+ecomm_llm_prompt_tokens = Histogram(
+    "ecomm_llm_prompt_tokens",
+    "Estimated prompt tokens per LLM call, before and after the context policy",
+    ["agent", "stage"], # Labels: stage='history' (whole thread) or 'prompt' (sent)
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+
+# Supervisor Fast Path Metrics
+ecomm_fast_path_requests_total = Counter(
+    "ecomm_fast_path_requests_total",
+    "Chat turns seen by the supervisor's fast-path parser",
+    ["intent"] # Labels: 'view_cart', 'remove_item', 'list_products', 'none' (fell through to LLM)
+)
+
+ecomm_fast_path_latency_seconds = Histogram(
+    "ecomm_fast_path_latency_seconds",
+    "Latency of turns answered by the fast path",
+    ["intent"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+ecomm_response_cache_events_total = Counter(
+    "ecomm_response_cache_events_total",
+    "Orchestrator response cache events for read-only chat turns",
+    ["event"] # Labels: 'hit', 'miss', 'store', 'eviction', 'expired'
+)
+
 ecomm_active_carts = Gauge(
     "ecomm_active_carts", 
-    "Number of currently active carts"
-)
\ No newline at end of file
+    "Carts in the whole cart store, recounted after each sweep (same value on every replica)"
+)
+
+# Cache Metrics
+ecomm_product_cache_events_total = Counter(
+    "ecomm_product_cache_events_total",
+    "Product read-through cache events",
+    ["event"] # Labels: 'hit', 'miss', 'eviction', 'expired'
+)
+
+# Inventory Hold Metrics
+ecomm_stock_hold_events_total = Counter(
+    "ecomm_stock_hold_events_total",
+    "Stock hold lifecycle events",
+    ["event"] # Labels: 'created', 'confirmed', 'released', 'expired'
+)
+
+ecomm_stock_hold_acquire_total = Counter(
+    "ecomm_stock_hold_acquire_total",
+    "How stock holds were satisfied (contention indicator)",
+    ["path"] # Labels: 'bucket', 'refill', 'rebalance', 'insufficient'
+)
+
+ecomm_stock_holds_active = Gauge(
+    "ecomm_stock_holds_active",
+    "Stock holds currently in 'held' state"
+)
+
+# Outbound HTTP Pool Metrics (orchestrator -> downstream services)
+ecomm_http_pool_in_use = Gauge(
+    "ecomm_http_pool_in_use",
+    "Requests currently holding a pooled connection",
+    ["downstream"] # Labels: 'product', 'order', 'payment', 'session'
+)
+
+ecomm_http_pool_limit = Gauge(
+    "ecomm_http_pool_limit",
+    "Configured max connections per downstream pool",
+    ["downstream"]
+)
+
+ecomm_http_pool_wait_seconds = Histogram(
+    "ecomm_http_pool_wait_seconds",
+    "Time a request waited for a free pooled connection",
+    ["downstream"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+# Conversation Checkpointer Metrics (in-memory backend)
+ecomm_checkpoint_threads = Gauge(
+    "ecomm_checkpoint_threads",
+    "Conversation threads held by the in-memory checkpointer"
+)
+
+ecomm_checkpoint_bytes = Gauge(
+    "ecomm_checkpoint_bytes",
+    "Serialized bytes held by the in-memory checkpointer"
+)
+
+ecomm_checkpoint_evictions_total = Counter(
+    "ecomm_checkpoint_evictions_total",
+    "Conversation threads evicted from the in-memory checkpointer",
+    ["reason"] # Labels: 'expired', 'lru', 'memory'
+)
@@ -0,0 +1,125 @@
+"""
+Benchmark for TOOL_RESULT_FORMAT (services/orchestrator/tool_encoding.py).
+
+1. Tokens (offline, always): encodes search results of several sizes and a
+   cart in both formats and counts tokens with tiktoken (o200k_base, the
+   gpt-4o family), falling back to ~4 chars/token if tiktoken is unavailable.
+   A result is re-sent on every later LLM call, so the saving is multiplied
+   by the number of calls it stays in the history for.
+
+2. Turn latency (--url): replays a browsing/cart conversation against a
+   running orchestrator and reports p50/p95 per turn. The format is a
+   server-side setting, so run it once per format and compare:
+
+    TOOL_RESULT_FORMAT=repr  docker compose up -d orchestrator
+    python tests/bench_tool_encoding.py --url http://localhost:8000/chat --label repr
+    TOOL_RESULT_FORMAT=table docker compose up -d orchestrator
+    python tests/bench_tool_encoding.py --url http://localhost:8000/chat --label table
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from termcolor import colored
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.orchestrator.tool_encoding import encode_cart, encode_products  # noqa: E402
+from load_test import create_sessions, get_token, percentile  # noqa: E402
+
+SEARCH_SIZES = [1, 5, 20, 100]
+
+CONVERSATION = [
+    "What balls do you have?",
+    "list every product you sell",
+    "Buy 1 Rubber Keychain",
+    # Reaches the LLM's view_cart only with CHECKOUT_NODE_MODE=agent
+    "What's in my cart?",
+]
+
+
+def count_tokens():
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("o200k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken o200k_base"
+    except Exception:
+        # Not installed, or no network to fetch the encoding file
+        return (lambda text: max(len(text) // 4, 1)), "~4 chars/token, tiktoken unavailable"
+
+
+def sample_products(n: int) -> list[dict]:
+    # Shaped like GET / on product_service (ProductResponse)
+    return [
+        {"id": i, "name": f"Yonex Arcsaber {i} Pro", "price": round(10 + i * 7.25, 2), "stock": 5 + i % 40, "sku": f"YNX-{i:05d}"}
+        for i in range(1, n + 1)
+    ]
+
+
+def sample_cart(n: int) -> dict:
+    # Shaped like load_cart(): SessionResponse with name/price merged into each line
+    return {
+        "session_id": "3f1c9a8e-5b7d-4e2a-9c41-7d2e8f6a1b90",
+        "user_id": 1,
+        "is_active": True,
+        "items": [
+            {"product_id": p["id"], "quantity": 1 + p["id"] % 3, "name": p["name"], "price": p["price"]}
+            for p in sample_products(n)
+        ],
+    }
+
+
+def token_report():
+    tokens, tokenizer = count_tokens()
+    print(colored(f"🔢 Tool result size ({tokenizer})", "cyan"))
+    print(f"   {'result':<22}{'repr':>8}{'table':>8}{'saved':>8}")
+    cases = [(f"search_products x{n}", lambda fmt, n=n: encode_products(sample_products(n), fmt)) for n in SEARCH_SIZES]
+    cases.append(("view_cart x5", lambda fmt: encode_cart(sample_cart(5), fmt)))
+    for name, encode in cases:
+        before, after = tokens(encode("repr")), tokens(encode("table"))
+        print(f"   {name:<22}{before:>8}{after:>8}{1 - after / before:>8.0%}")
+
+
+async def latency_report(url: str, label: str, rounds: int):
+    token = await get_token()
+    sessions = await create_sessions(rounds)
+    per_turn: dict[str, list[float]] = {message: [] for message in CONVERSATION}
+    errors = 0
+    async with httpx.AsyncClient(headers={"Authorization": f"Bearer {token}"}, timeout=120.0) as client:
+        for session_id in sessions:
+            for message in CONVERSATION:
+                started = time.perf_counter()
+                resp = await client.post(url, json={"session_id": session_id, "message": message})
+                if resp.status_code != 200:
+                    errors += 1
+                    continue
+                per_turn[message].append(time.perf_counter() - started)
+
+    print(colored(f"\n⏱  Turn latency [{label}] over {rounds} conversations ({errors} errors)", "cyan"))
+    all_turns = []
+    for message, latencies in per_turn.items():
+        latencies.sort()
+        all_turns.extend(latencies)
+        print(f"   {message[:40]:<42} p50 {percentile(latencies, 50):.3f}s  p95 {percentile(latencies, 95):.3f}s")
+    all_turns.sort()
+    print(f"   {'all turns':<42} p50 {percentile(all_turns, 50):.3f}s  p95 {percentile(all_turns, 95):.3f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare repr vs table tool-result encoding.")
+    parser.add_argument("--url", help="Orchestrator /chat URL; omit to only count tokens")
+    parser.add_argument("--label", default=os.getenv("TOOL_RESULT_FORMAT", "table"), help="Name of the server config being measured")
+    parser.add_argument("--rounds", type=int, default=10, help="Conversations to replay (one fresh session each)")
+    args = parser.parse_args()
+
+    token_report()
+    if args.url:
+        await latency_report(args.url, args.label, args.rounds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,221 @@
+"""
+Open-loop load generator for the orchestrator's /chat endpoint.
+
+Sends chat turns at a fixed target rate (--rps) for --duration seconds,
+spread round-robin over --sessions carts. Each session replays a short
+shopping script. A session never has two turns in flight, like a real user,
+but the schedule does not wait for slow responses: a turn's latency is
+measured from the moment it was DUE, so server queueing shows up in the
+percentiles instead of silently lowering the offered rate.
+
+Run the cluster with the scripted model and a relaxed rate limit, e.g.
+
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MS=300 RATE_LIMIT_CHAT=100000/minute docker compose up -d
+    python tests/load_test.py --rps 20 --duration 60 --sessions 50 --seed
+
+and read p50/p95/p99 and the error breakdown at the end (--json for machines).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import Counter
+
+import httpx
+from termcolor import colored
+
+# Configuration
+AGENT_URL = os.getenv("AGENT_URL", "http://localhost:8000/chat")
+PRODUCT_URL = os.getenv("PRODUCT_URL", "http://localhost:8001")
+SESSION_URL = os.getenv("SESSION_URL", "http://localhost:8004")
+AUTH_URL = os.getenv("AUTH_URL", "http://localhost:8005/auth")
+
+INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY", "internal-cluster-key-change-me")
+HEADERS = {"X-Internal-API-Key": INTERNAL_API_KEY}
+
+# One shopping visit; every session cycles through it
+DEFAULT_SCRIPT = [
+    "What balls do you have?",
+    "Buy 1 Rubber Keychain",
+    "show my cart",
+    "Buy a Water Bottle and a Tennis Ball",
+    "checkout",
+    "list all products",
+]
+
+# Deep stock so a long run measures the agents, not sold-out errors
+LOAD_INVENTORY = [
+    {"name": "MacBook Pro", "price": 2000.0, "stock": 1_000_000},
+    {"name": "Tennis Ball", "price": 5.0, "stock": 1_000_000},
+    {"name": "Ping Pong Ball", "price": 5.0, "stock": 1_000_000},
+    {"name": "Rubber Keychain", "price": 2.0, "stock": 1_000_000},
+    {"name": "Water Bottle", "price": 10.0, "stock": 1_000_000},
+]
+
+
+async def seed_catalog():
+    async with httpx.AsyncClient(headers=HEADERS) as client:
+        ndjson = "\n".join(json.dumps(p) for p in LOAD_INVENTORY)
+        resp = await client.post(
+            f"{PRODUCT_URL}/import",
+            params={"format": "ndjson", "key": "name"},
+            content=ndjson,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        resp.raise_for_status()
+
+
+async def get_token() -> str:
+    """Registers (if needed) and logs in the load-test user."""
+    async with httpx.AsyncClient() as client:
+        credentials = {"email": "load@evals.com", "password": "password123"}
+        try:
+            await client.post(f"{AUTH_URL}/register", json=credentials)
+        except httpx.HTTPError:
+            pass  # User might already exist
+        resp = await client.post(f"{AUTH_URL}/login", json=credentials)
+        resp.raise_for_status()
+        return resp.json()["access_token"]
+
+
+async def create_sessions(count: int) -> list[str]:
+    async with httpx.AsyncClient(headers=HEADERS, timeout=30.0) as client:
+        async def create(i: int) -> str:
+            resp = await client.post(f"{SESSION_URL}/", json={"user_id": i + 1})
+            resp.raise_for_status()
+            return resp.json()["session_id"]
+
+        return await asyncio.gather(*(create(i) for i in range(count)))
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class LoadRun:
+    def __init__(self, token: str, sessions: list[str], script: list[str], timeout: float):
+        self.sessions = sessions
+        self.script = script
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=len(sessions)),
+        )
+        self.locks = {s: asyncio.Lock() for s in sessions}
+        self.steps = Counter()
+        self.latencies: list[float] = []
+        self.errors = Counter()
+
+    async def turn(self, session_id: str, due: float):
+        async with self.locks[session_id]:
+            message = self.script[self.steps[session_id] % len(self.script)]
+            self.steps[session_id] += 1
+            try:
+                resp = await self.client.post(AGENT_URL, json={"session_id": session_id, "message": message})
+                if resp.status_code != 200:
+                    self.errors[f"HTTP {resp.status_code}"] += 1
+                    return
+                if "response" not in resp.json():
+                    self.errors["malformed body"] += 1
+                    return
+            except httpx.TimeoutException:
+                self.errors["timeout"] += 1
+                return
+            except Exception as e:
+                self.errors[type(e).__name__] += 1
+                return
+            self.latencies.append(time.perf_counter() - due)
+
+    async def run(self, rps: float, duration: float) -> float:
+        total = int(rps * duration)
+        started = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            due = started + i / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            session_id = self.sessions[i % len(self.sessions)]
+            tasks.append(asyncio.create_task(self.turn(session_id, due)))
+        await asyncio.gather(*tasks)
+        await self.client.aclose()
+        return time.perf_counter() - started
+
+    def report(self, rps: float, elapsed: float) -> dict:
+        ok = len(self.latencies)
+        failed = sum(self.errors.values())
+        sent = ok + failed
+        latencies = sorted(self.latencies)
+        return {
+            "target_rps": rps,
+            "requests": sent,
+            "ok": ok,
+            "errors": failed,
+            "error_rate": failed / sent if sent else 0.0,
+            "error_breakdown": dict(self.errors),
+            "achieved_rps": ok / elapsed if elapsed else 0.0,
+            "elapsed_seconds": elapsed,
+            "latency_seconds": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1] if latencies else float("nan"),
+                "mean": sum(latencies) / ok if ok else float("nan"),
+            },
+        }
+
+
+def print_report(result: dict):
+    latency = result["latency_seconds"]
+    print(colored("\n📈 Load test results", "cyan"))
+    print(f"   Requests:     {result['requests']} (target {result['target_rps']} rps, achieved {result['achieved_rps']:.2f} rps)")
+    errors = f"{result['errors']} ({result['error_rate']:.2%})"
+    print(f"   Errors:       {colored(errors, 'green' if result['errors'] == 0 else 'red')}")
+    for kind, count in sorted(result["error_breakdown"].items()):
+        print(f"      {kind}: {count}")
+    print(
+        f"   Latency (s):  p50 {latency['p50']:.3f} | p95 {latency['p95']:.3f} | "
+        f"p99 {latency['p99']:.3f} | max {latency['max']:.3f} | mean {latency['mean']:.3f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Drive /chat at a target rate and report latency percentiles.")
+    parser.add_argument("--rps", type=float, default=5.0, help="Target chat turns per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep sending")
+    parser.add_argument("--sessions", type=int, default=20, help="Number of concurrent carts")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--script", help="JSON file with a list of messages replayed by every session")
+    parser.add_argument("--seed", action="store_true", help="Restock the catalog with deep inventory first")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, "r") as f:
+            script = json.load(f)
+
+    if args.seed:
+        await seed_catalog()
+    token = await get_token()
+    sessions = await create_sessions(args.sessions)
+
+    print(colored(f"🚀 {args.rps} rps for {args.duration}s across {args.sessions} sessions...", "cyan"))
+    load = LoadRun(token, sessions, script, args.timeout)
+    elapsed = await load.run(args.rps, args.duration)
+    result = load.report(args.rps, elapsed)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
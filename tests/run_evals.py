@@ -60,19 +60,27 @@ async def setup_environment():
         except:
             pass 
             
-        # 1. Base Inventory
-        await client.post(f"{PRODUCT_URL}/", json={"name": "MacBook Pro", "price": 2000.0, "stock": 10})
-        await client.post(f"{PRODUCT_URL}/", json={"name": "Yonex Arcsaber 11 Pro", "price": 200.0, "stock": 10})
-        
-        # 2. Tie-Breaker Items ($5.00)
-        await client.post(f"{PRODUCT_URL}/", json={"name": "Tennis Ball", "price": 5.0, "stock": 50})
-        await client.post(f"{PRODUCT_URL}/", json={"name": "Ping Pong Ball", "price": 5.0, "stock": 50})
-        
-        # 3. NEW: Absolute Cheapest Item ($2.00)
-        await client.post(f"{PRODUCT_URL}/", json={"name": "Rubber Keychain", "price": 2.0, "stock": 100})
-        
-        # Mid-range
-        await client.post(f"{PRODUCT_URL}/", json={"name": "Water Bottle", "price": 10.0, "stock": 20})
+        inventory = [
+            # 1. Base Inventory
+            {"name": "MacBook Pro", "price": 2000.0, "stock": 10},
+            {"name": "Yonex Arcsaber 11 Pro", "price": 200.0, "stock": 10},
+            # 2. Tie-Breaker Items ($5.00)
+            {"name": "Tennis Ball", "price": 5.0, "stock": 50},
+            {"name": "Ping Pong Ball", "price": 5.0, "stock": 50},
+            # 3. NEW: Absolute Cheapest Item ($2.00)
+            {"name": "Rubber Keychain", "price": 2.0, "stock": 100},
+            # Mid-range
+            {"name": "Water Bottle", "price": 10.0, "stock": 20},
+        ]
+        # One bulk request instead of one POST per product
+        ndjson = "\n".join(json.dumps(p) for p in inventory)
+        resp = await client.post(
+            f"{PRODUCT_URL}/import",
+            params={"format": "ndjson", "key": "name"},
+            content=ndjson,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        resp.raise_for_status()
         
         print("   ✅ Environment Restocked with 6 products.")
 
@@ -0,0 +1,87 @@
+"""CartBatcher: sibling add_to_cart calls share one request, and each gets its own result."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from services.orchestrator import tools
+from services.orchestrator.tools import CartBatcher
+
+
+class FakeSessionService:
+    """items:batch handler: 422 for lines with quantity > 5, 404 for unknown sessions."""
+
+    def __init__(self):
+        self.requests: list[list[dict]] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        items = json.loads(request.content)["items"]
+        self.requests.append(items)
+        if "/missing/" in request.url.path:
+            return httpx.Response(404, json={"detail": "Session not found"})
+        errors = [
+            {"loc": ["body", "items", i, "quantity"], "msg": "Input should be less than or equal to 5", "type": "less_than_equal"}
+            for i, item in enumerate(items)
+            if item["quantity"] > 5
+        ]
+        if errors:
+            return httpx.Response(422, json={"detail": errors})
+        return httpx.Response(200, json={"session_id": "s1", "items": items})
+
+
+@pytest.fixture
+def session_service(monkeypatch):
+    service = FakeSessionService()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(service))
+    monkeypatch.setitem(tools.http_clients._clients, "session", client)
+    return service
+
+
+async def test_sibling_calls_share_one_request(session_service):
+    batcher = CartBatcher(window_seconds=0.01)
+    results = await asyncio.gather(batcher.add("s1", 1, 1), batcher.add("s1", 2, 3))
+
+    assert results == ["Successfully added 1 of product 1 to cart.", "Successfully added 3 of product 2 to cart."]
+    assert session_service.requests == [[{"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 3}]]
+    await asyncio.sleep(0)
+    assert not batcher._tasks
+
+
+async def test_rejected_line_gets_its_own_error_and_siblings_are_resent(session_service):
+    batcher = CartBatcher(window_seconds=0.01)
+    results = await asyncio.gather(batcher.add("s1", 1, 1), batcher.add("s1", 2, 9), batcher.add("s1", 3, 2))
+
+    assert results[0] == "Successfully added 1 of product 1 to cart."
+    assert results[1] == "Error adding product 2 to cart: quantity: Input should be less than or equal to 5"
+    assert results[2] == "Successfully added 2 of product 3 to cart."
+    assert session_service.requests[1] == [{"product_id": 1, "quantity": 1}, {"product_id": 3, "quantity": 2}]
+
+
+async def test_batch_level_error_reports_the_service_detail(session_service):
+    batcher = CartBatcher(window_seconds=0.01)
+    results = await asyncio.gather(batcher.add("missing", 1, 1), batcher.add("missing", 2, 1))
+    assert results == [
+        "Error adding product 1 to cart: Session not found (HTTP 404)",
+        "Error adding product 2 to cart: Session not found (HTTP 404)",
+    ]
+
+
+async def test_connection_error(monkeypatch):
+    def unreachable(request):
+        raise httpx.ConnectError("connection refused")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(unreachable))
+    monkeypatch.setitem(tools.http_clients._clients, "session", client)
+    batcher = CartBatcher(window_seconds=0.01)
+    assert await batcher.add("s1", 1, 1) == "Error connecting to Session Service: connection refused"
+
+
+async def test_flush_task_is_referenced_until_done(session_service):
+    batcher = CartBatcher(window_seconds=0.01)
+    pending = asyncio.ensure_future(batcher.add("s1", 1, 1))
+    await asyncio.sleep(0)
+    assert len(batcher._tasks) == 1
+    await pending
+    await asyncio.sleep(0)
+    assert not batcher._tasks
@@ -0,0 +1,212 @@
+"""
+CartStore contract: every backend must behave the same behind the router.
+
+memory always runs. redis uses the server at CART_STORE_REDIS_URL if one
+answers, else fakeredis, else is skipped. postgres runs only when
+TEST_DATABASE_URL points at a scratch database (postgresql+asyncpg://...).
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+
+from services.session_service import store as store_module
+from services.session_service.store import MemoryCartStore, PostgresCartStore, RedisCartStore
+
+TTL_SECONDS = 60
+
+
+async def _redis_client():
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        return None
+    client = aioredis.from_url(store_module.CART_STORE_REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+        return client
+    except Exception:
+        await client.aclose()
+    try:
+        import fakeredis
+    except ImportError:
+        return None
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture(params=["memory", "redis", "postgres"])
+async def backend(request):
+    """(store, db) for one backend; db is None except for postgres."""
+    if request.param == "memory":
+        yield MemoryCartStore(TTL_SECONDS), None
+
+    elif request.param == "redis":
+        client = await _redis_client()
+        if client is None:
+            pytest.skip("no Redis server and fakeredis is not installed")
+        cart_store = RedisCartStore(store_module.CART_STORE_REDIS_URL, TTL_SECONDS)
+        cart_store.client = client
+        yield cart_store, None
+        await client.aclose()
+
+    else:
+        url = os.getenv("TEST_DATABASE_URL")
+        if not url:
+            pytest.skip("TEST_DATABASE_URL not set")
+        from sqlalchemy import text
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        from services.session_service.models import Session
+
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE SCHEMA IF NOT EXISTS session_schema"))
+            await conn.run_sync(Session.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield PostgresCartStore(TTL_SECONDS), db
+        await engine.dispose()
+
+
+def _lines(session) -> dict[int, int]:
+    return {item.product_id: item.quantity for item in session.items}
+
+
+@pytest.fixture
+def session_id():
+    return f"test-{uuid.uuid4()}"
+
+
+async def test_create_and_get(backend, session_id):
+    cart_store, db = backend
+    await cart_store.create_session(db, session_id, 7)
+
+    session = await cart_store.get_session(db, session_id)
+    assert session.session_id == session_id
+    assert session.user_id == 7
+    assert session.is_active
+    assert _lines(session) == {}
+
+
+async def test_add_item_upserts_quantity(backend, session_id):
+    cart_store, db = backend
+    await cart_store.create_session(db, session_id, None)
+
+    await cart_store.add_item(db, session_id, 1, 2)
+    session = await cart_store.add_item(db, session_id, 1, 3)
+    assert _lines(session) == {1: 5}
+
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")  # e.g. a cartesian product in the upsert
+async def test_add_items_applies_every_line(backend, session_id):
+    cart_store, db = backend
+    await cart_store.create_session(db, session_id, None)
+    await cart_store.add_item(db, session_id, 1, 1)
+
+    session = await cart_store.add_items(db, session_id, {1: 1, 2: 4})
+    assert _lines(session) == {1: 2, 2: 4}
+
+
+async def test_remove_item(backend, session_id):
+    cart_store, db = backend
+    await cart_store.create_session(db, session_id, None)
+    await cart_store.add_items(db, session_id, {1: 1, 2: 1})
+
+    session = await cart_store.remove_item(db, session_id, 1)
+    assert _lines(session) == {2: 1}
+    # Removing a line that is not there is not an error
+    session = await cart_store.remove_item(db, session_id, 99)
+    assert _lines(session) == {2: 1}
+
+
+async def test_clear_cart_keeps_the_session(backend, session_id):
+    cart_store, db = backend
+    await cart_store.create_session(db, session_id, 3)
+    await cart_store.add_items(db, session_id, {1: 1, 2: 1})
+
+    await cart_store.clear_cart(db, session_id)
+    session = await cart_store.get_session(db, session_id)
+    assert session is not None
+    assert _lines(session) == {}
+
+
+async def test_missing_session(backend, session_id):
+    cart_store, db = backend
+    assert await cart_store.get_session(db, session_id) is None
+    assert await cart_store.add_item(db, session_id, 1, 1) is None
+    assert await cart_store.add_items(db, session_id, {1: 1}) is None
+    assert await cart_store.remove_item(db, session_id, 1) is None
+    await cart_store.clear_cart(db, session_id)
+    # None of the writes may have created the cart as a side effect
+    assert await cart_store.get_session(db, session_id) is None
+
+
+async def test_redis_add_items_never_recreates_a_cart_deleted_mid_call(backend, session_id):
+    cart_store, db = backend
+    if not isinstance(cart_store, RedisCartStore):
+        pytest.skip("redis only")
+    await cart_store.create_session(db, session_id, None)
+    client = cart_store.client
+    pipeline = client.pipeline
+
+    def racing_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        exists = pipe.exists
+
+        async def exists_then_expire(key):
+            found = await exists(key)
+            await client.delete(key)  # The cart expires right after the check
+            return found
+
+        pipe.exists = exists_then_expire
+        return pipe
+
+    client.pipeline = racing_pipeline
+    assert await cart_store.add_items(db, session_id, {1: 1}) is None
+    assert not await client.exists(RedisCartStore._key(session_id))
+
+
+async def test_memory_ttl_expiry(monkeypatch, session_id):
+    clock = [1000.0]
+    monkeypatch.setattr(store_module.time, "monotonic", lambda: clock[0])
+    cart_store = MemoryCartStore(TTL_SECONDS)
+    await cart_store.create_session(None, session_id, None)
+
+    # Any access slides the expiry forward
+    clock[0] += TTL_SECONDS - 1
+    assert await cart_store.get_session(None, session_id) is not None
+    clock[0] += TTL_SECONDS - 1
+    assert await cart_store.get_session(None, session_id) is not None
+
+    clock[0] += TTL_SECONDS + 1
+    assert await cart_store.sweep_expired(None, 100) == 1
+    assert await cart_store.get_session(None, session_id) is None
+    assert await cart_store.count_carts(None) == 0
+
+
+async def test_sweeper_reports_the_store_wide_cart_count(monkeypatch):
+    from services.session_service import main as session_main
+    from shared.observability import ecomm_active_carts
+
+    clock = [1000.0]
+    monkeypatch.setattr(store_module.time, "monotonic", lambda: clock[0])
+    cart_store = MemoryCartStore(TTL_SECONDS)
+    for n in range(3):
+        await cart_store.create_session(None, f"cart-{n}", None)
+    clock[0] += TTL_SECONDS / 2
+    await cart_store.create_session(None, "cart-3", None)
+    clock[0] += TTL_SECONDS / 2 + 1  # The first three are now idle past the TTL
+    monkeypatch.setattr(session_main, "cart_store", cart_store)
+    ecomm_active_carts.set(-1)
+
+    sweeper = asyncio.create_task(session_main._sweep_expired_carts())
+    try:
+        for _ in range(100):
+            if ecomm_active_carts._value.get() != -1:
+                break
+            await asyncio.sleep(0)  # Not a timed sleep: the loop's clock is frozen too
+    finally:
+        sweeper.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await sweeper
+    assert ecomm_active_carts._value.get() == 1
@@ -0,0 +1,106 @@
+"""BoundedMemorySaver retention and eviction, and CompressedSerializer compatibility."""
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from services.orchestrator import checkpointer as checkpointer_module
+from services.orchestrator.checkpointer import BoundedMemorySaver, CompressedSerializer
+
+
+def _config(thread_id: str, checkpoint_ns: str = "") -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}}
+
+
+def _put(saver, thread_id: str, checkpoint_ns: str = "", payload: str = "") -> str:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": payload}
+    saver.put(_config(thread_id, checkpoint_ns), checkpoint, {}, {})
+    return checkpoint["id"]
+
+
+def _saver(**kwargs) -> BoundedMemorySaver:
+    options = {"max_threads": 100, "ttl_seconds": 3600, "max_bytes": 10**9, "keep_per_thread": 2}
+    return BoundedMemorySaver(**{**options, **kwargs})
+
+
+def test_keeps_only_the_newest_checkpoints_and_their_writes():
+    saver = _saver()
+    ids = []
+    for _ in range(4):
+        ids.append(_put(saver, "t1"))
+        config = {"configurable": {**_config("t1")["configurable"], "checkpoint_id": ids[-1]}}
+        saver.put_writes(config, [("messages", "pending")], "task")
+
+    assert set(saver.storage["t1"][""]) == set(ids[2:])
+    assert {key[2] for key in saver.writes if saver.writes[key]} == set(ids[2:])
+    assert saver.get_tuple(_config("t1")).checkpoint["id"] == ids[3]
+
+
+def test_drops_earlier_turns_subgraph_namespaces():
+    saver = _saver()
+    for turn in range(3):
+        _put(saver, "t1")
+        _put(saver, "t1", f"Sales:task-{turn}")
+        _put(saver, "t1")
+
+    assert set(saver.storage["t1"]) == {"", "Sales:task-2"}
+    assert not any(key[1] in ("Sales:task-0", "Sales:task-1") for key in saver.writes)
+
+
+def test_idle_threads_expire(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(checkpointer_module.time, "monotonic", lambda: clock[0])
+    saver = _saver(ttl_seconds=60)
+    _put(saver, "idle")
+    clock[0] += 30
+    _put(saver, "active")
+
+    clock[0] += 40
+    assert saver.get_tuple(_config("active")) is not None
+    assert saver.get_tuple(_config("idle")) is None
+    assert "idle" not in saver._threads
+
+
+def test_least_recently_used_thread_goes_first():
+    saver = _saver(max_threads=2)
+    _put(saver, "a")
+    _put(saver, "b")
+    saver.get_tuple(_config("a"))  # a is now more recent than b
+    _put(saver, "c")
+
+    assert list(saver._threads) == ["a", "c"]
+    assert "b" not in saver.storage
+
+
+def test_byte_cap_evicts_others_but_never_the_thread_being_written():
+    saver = _saver(max_bytes=7000, serde=CompressedSerializer(min_bytes=10**9))
+    _put(saver, "a", payload="x" * 3000)
+    _put(saver, "b", payload="y" * 3000)
+    assert list(saver._threads) == ["a", "b"]
+
+    _put(saver, "b", payload="y" * 8000)
+    assert list(saver._threads) == ["b"]
+    assert saver._total_bytes > saver.max_bytes  # b alone is over the cap, and kept
+    assert saver._total_bytes == saver._threads["b"][1]
+
+
+def test_compressed_serializer_round_trips():
+    serde = CompressedSerializer(min_bytes=100)
+    small = {"messages": "hi"}
+    large = {"messages": "hello " * 1000}
+
+    assert not serde.dumps_typed(small)[0].startswith(CompressedSerializer.PREFIX)
+    type_, data = serde.dumps_typed(large)
+    assert type_.startswith(CompressedSerializer.PREFIX)
+    assert len(data) < len(large["messages"])
+    assert serde.loads_typed((type_, data)) == large
+    assert serde.loads_typed(serde.dumps_typed(small)) == small
+
+
+def test_compressed_serializer_reads_uncompressed_blobs_written_before_it():
+    legacy = MemorySaver(serde=JsonPlusSerializer())
+    _put(legacy, "t1", payload="hello " * 1000)
+
+    saver = _saver()
+    saver.storage = legacy.storage
+    assert saver.get_tuple(_config("t1")).checkpoint["channel_values"]["messages"] == "hello " * 1000
@@ -0,0 +1,168 @@
+"""CompensationQueue: claims, leases, claim tokens and the inline fallback, against a real database."""
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from services.orchestrator import compensation_queue as queue_module
+from services.orchestrator.compensation_queue import CompensationQueue
+from services.orchestrator.models import SagaCompensation
+from services.orchestrator.saga import SagaOrchestrator
+
+
+class Steps:
+    """Saga a -> b -> c whose compensations log their calls; `failing` ones raise."""
+
+    def __init__(self):
+        self.calls: list[str] = []
+        self.failing: set[str] = set()
+        self.during: dict[str, object] = {}  # step name -> coroutine function run inside it
+
+    def build(self, queue=None) -> SagaOrchestrator:
+        saga = SagaOrchestrator("test", queue)
+        for name in ("a", "b", "c"):
+            saga.add_step(name, self._action(name), self._compensation(name))
+        return saga
+
+    def _action(self, name):
+        async def action(ctx):
+            if name in self.failing:
+                raise RuntimeError(f"{name} failed")
+        return action
+
+    def _compensation(self, name):
+        async def compensation(ctx):
+            if name in self.during:
+                await self.during[name]()
+            if f"undo {name}" in self.failing:
+                raise RuntimeError(f"undo {name} failed")
+            self.calls.append(name)
+        return compensation
+
+
+@pytest.fixture
+def steps():
+    return Steps()
+
+
+@pytest.fixture
+async def queue(pg_engine, monkeypatch, steps):
+    monkeypatch.setattr(queue_module, "engine", pg_engine)
+    monkeypatch.setattr(queue_module, "AsyncSessionLocal", async_sessionmaker(pg_engine, expire_on_commit=False))
+    monkeypatch.setattr(queue_module, "SAGA_COMPENSATION_MODE", "queue")
+    monkeypatch.setattr(queue_module, "COMPENSATION_POLL_INTERVAL_SECONDS", 0.05)
+    queue = CompensationQueue()
+    queue.register("test", steps.build)
+    yield queue
+    await queue.stop()
+
+
+async def _rows(db) -> list[SagaCompensation]:
+    db.expire_all()
+    return (await db.execute(select(SagaCompensation).order_by(SagaCompensation.id))).scalars().all()
+
+
+async def _expire_leases(db):
+    await db.execute(update(SagaCompensation).values(next_attempt_at=func.now() - timedelta(seconds=1)))
+    await db.commit()
+
+
+async def test_without_a_worker_the_saga_rolls_back_inline(queue, steps, db):
+    assert not queue.enabled
+    steps.failing.add("c")
+    with pytest.raises(RuntimeError):
+        await steps.build(queue).execute({})
+    assert steps.calls == ["b", "a"]
+    assert await _rows(db) == []
+
+
+async def test_started_worker_drains_queued_rollbacks(queue, steps, db):
+    await queue.start()
+    assert queue.enabled
+    steps.failing.add("c")
+    with pytest.raises(RuntimeError):
+        await steps.build(queue).execute({})
+
+    for _ in range(100):
+        if steps.calls == ["b", "a"]:
+            break
+        await asyncio.sleep(0.02)
+    assert steps.calls == ["b", "a"]
+    await asyncio.sleep(0.05)
+    assert [(row.status, row.remaining_steps) for row in await _rows(db)] == [("done", [])]
+
+    await queue.stop()
+    assert not queue.enabled
+
+
+async def test_inline_mode_never_starts_a_worker(queue, monkeypatch):
+    monkeypatch.setattr(queue_module, "SAGA_COMPENSATION_MODE", "inline")
+    await queue.start()
+    assert not queue.enabled
+
+
+async def test_claims_one_row_at_a_time(queue, db):
+    await queue.enqueue("test", "c", ["b", "a"], {})
+    await queue.enqueue("test", "c", ["b", "a"], {})
+
+    first = await queue._claim(db)
+    second = await queue._claim(db)
+    assert first.id != second.id
+    assert first.claim_token and second.claim_token and first.claim_token != second.claim_token
+    # Both are leased now
+    assert await queue._claim(db) is None
+
+
+async def test_failed_step_backs_off_then_goes_dead(queue, steps, db, monkeypatch):
+    monkeypatch.setattr(queue_module, "COMPENSATION_MAX_ATTEMPTS", 2)
+    steps.failing.add("undo a")
+    await queue.enqueue("test", "c", ["b", "a"], {})
+
+    assert await queue.drain_once(db) == 1
+    [row] = await _rows(db)
+    assert (row.status, row.attempts, row.remaining_steps) == ("pending", 1, ["a"])
+    assert "undo a failed" in row.last_error
+    assert await queue.drain_once(db) == 0  # Backing off
+
+    await _expire_leases(db)
+    assert await queue.drain_once(db) == 1
+    [row] = await _rows(db)
+    assert (row.status, row.attempts) == ("dead", 2)
+    assert steps.calls == ["b"]  # b is never replayed
+
+
+async def test_worker_whose_lease_lapsed_does_not_run_steps(queue, steps, db, pg_engine):
+    await queue.enqueue("test", "c", ["b", "a"], {})
+    stale = await queue._claim(db)
+    await _expire_leases(db)
+
+    sessions = async_sessionmaker(pg_engine, expire_on_commit=False)
+    async with sessions() as other:
+        fresh = await queue._claim(other)
+        assert fresh.id == stale.id
+
+        await queue._run_entry(db, stale)
+        assert steps.calls == []
+
+        await queue._run_entry(other, fresh)
+        assert steps.calls == ["b", "a"]
+
+
+async def test_claim_lost_mid_step_stops_before_the_next_step(queue, steps, db, pg_engine):
+    sessions = async_sessionmaker(pg_engine, expire_on_commit=False)
+
+    async def reclaimed_elsewhere():
+        async with sessions() as other:
+            await other.execute(update(SagaCompensation).values(claim_token="someone-else"))
+            await other.commit()
+
+    steps.during["b"] = reclaimed_elsewhere
+    await queue.enqueue("test", "c", ["b", "a"], {})
+    await queue.drain_once(db)
+
+    assert steps.calls == ["b"]
+    [row] = await _rows(db)
+    # The new owner re-runs b (at most the in-flight step is repeated), then a
+    assert (row.status, row.remaining_steps, row.claim_token) == ("pending", ["b", "a"], "someone-else")
@@ -0,0 +1,98 @@
+"""parse_intent: which messages skip the agents, and which must not; run_intent replies."""
+import pytest
+
+from services.orchestrator import fast_path
+from services.orchestrator.fast_path import parse_intent, run_intent
+
+
+@pytest.mark.parametrize("message", [
+    "show my cart",
+    "Show me my cart.",
+    "please view the cart",
+    "Can you check my cart?",
+    "what's in my cart",
+    "Whats in my cart?!",
+    "my cart",
+    "  SHOW   my\tcart  please ",
+])
+def test_view_cart(message):
+    assert parse_intent(message) == ("view_cart", {})
+
+
+@pytest.mark.parametrize("message, product_id", [
+    ("remove item 3", 3),
+    ("Remove product #12 from my cart", 12),
+    ("please delete item id 7 from the cart.", 7),
+    ("could you remove product 42 please", 42),
+])
+def test_remove_item(message, product_id):
+    assert parse_intent(message) == ("remove_item", {"product_id": product_id})
+
+
+@pytest.mark.parametrize("message", [
+    "list products",
+    "Show me all the products",
+    "list all available products",
+    "display your products please",
+    "What do you sell?",
+    "what products do you have",
+])
+def test_list_products(message):
+    assert parse_intent(message) == ("list_products", {})
+
+
+@pytest.mark.parametrize("message", [
+    # Compound or free-form requests need the agents
+    "show my cart and buy a mouse",
+    "remove item 3 and add item 4",
+    "buy 2 tennis balls",
+    "what balls do you have",
+    "list every product you sell",
+    # Not a product id
+    "remove the mouse from my cart",
+    "remove item -1",
+    "checkout",
+    "",
+])
+def test_falls_through_to_agents(message):
+    assert parse_intent(message) is None
+
+
+@pytest.fixture
+def cart_service(monkeypatch):
+    """Fake session service: {session_id: {product_id: quantity}}; records removals."""
+    carts = {"s1": {1: 2, 5: 1}}
+    removed = []
+
+    async def load_cart(session_id):
+        if session_id not in carts:
+            return None
+        return {"items": [{"product_id": pid, "quantity": qty} for pid, qty in carts[session_id].items()]}
+
+    async def remove_cart_line(session_id, product_id):
+        removed.append((session_id, product_id))
+        carts[session_id].pop(product_id, None)
+
+    monkeypatch.setattr(fast_path, "load_cart", load_cart)
+    monkeypatch.setattr(fast_path, "remove_cart_line", remove_cart_line)
+    return removed
+
+
+async def test_remove_item_in_cart(cart_service):
+    reply = await run_intent("remove_item", {"product_id": 5}, "s1")
+    assert cart_service == [("s1", 5)]
+    assert reply.startswith("Removed product 5 from your cart.")
+    assert "(ID 1) x 2" in reply and "(ID 5)" not in reply
+
+
+async def test_remove_item_not_in_cart(cart_service):
+    reply = await run_intent("remove_item", {"product_id": 9}, "s1")
+    assert cart_service == []
+    assert reply.startswith("Product 9 is not in your cart")
+    assert "(ID 1) x 2" in reply
+
+
+async def test_remove_item_without_a_cart(cart_service):
+    reply = await run_intent("remove_item", {"product_id": 9}, "unknown")
+    assert cart_service == []
+    assert reply.startswith("Product 9 is not in your cart")
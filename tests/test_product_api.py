@@ -0,0 +1,121 @@
+"""Product Service endpoints against a real database (see conftest.py)."""
+import base64
+import json
+
+
+async def _create(product_api, name: str, stock: int, price: float = 5.0) -> dict:
+    resp = await product_api.post("/", json={"name": name, "price": price, "stock": stock})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+async def test_reserve_stock_returns_the_updated_products(product_api):
+    ball = await _create(product_api, "Tennis Ball", 10)
+    bat = await _create(product_api, "Cricket Bat", 3)
+
+    resp = await product_api.post("/reserve_stock", json={"items": [
+        {"product_id": bat["id"], "quantity": 1},
+        {"product_id": ball["id"], "quantity": 2},
+        {"product_id": ball["id"], "quantity": 1},
+    ]})
+    assert resp.status_code == 200, resp.text
+    assert [(p["id"], p["stock"]) for p in resp.json()] == [(ball["id"], 7), (bat["id"], 2)]
+    assert (await product_api.get(f"/{ball['id']}")).json()["stock"] == 7
+
+
+async def test_reserve_stock_is_all_or_nothing(product_api):
+    ball = await _create(product_api, "Tennis Ball", 10)
+    bat = await _create(product_api, "Cricket Bat", 1)
+
+    resp = await product_api.post("/reserve_stock", json={"items": [
+        {"product_id": ball["id"], "quantity": 2},
+        {"product_id": bat["id"], "quantity": 2},
+    ]})
+    assert resp.status_code == 400
+    assert "Insufficient stock" in resp.json()["detail"]
+    assert (await product_api.get(f"/{ball['id']}")).json()["stock"] == 10
+
+
+async def test_restore_stock_returns_the_updated_products(product_api):
+    ball = await _create(product_api, "Tennis Ball", 10)
+
+    resp = await product_api.post("/restore_stock", json={"items": [
+        {"product_id": ball["id"], "quantity": 4},
+        {"product_id": 999, "quantity": 1},  # unknown ids are skipped
+    ]})
+    assert resp.status_code == 200, resp.text
+    assert [(p["id"], p["stock"]) for p in resp.json()] == [(ball["id"], 14)]
+
+
+async def test_reduce_and_restore_single_product(product_api):
+    ball = await _create(product_api, "Tennis Ball", 10)
+
+    resp = await product_api.post(f"/{ball['id']}/reduce_stock", json={"quantity": 3})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["stock"] == 7
+    resp = await product_api.post(f"/{ball['id']}/reduce_stock", json={"quantity": 8})
+    assert resp.status_code == 400
+    resp = await product_api.post(f"/{ball['id']}/restore_stock", json={"quantity": 3})
+    assert resp.status_code == 200, resp.text
+    assert (await product_api.get(f"/{ball['id']}")).json()["stock"] == 10
+
+
+async def test_search_matches_name_words(product_api):
+    await _create(product_api, "Tennis Ball", 1)
+    await _create(product_api, "Cricket Bat", 1)
+
+    async def names(query):
+        resp = await product_api.get("/", params={"query": query})
+        assert resp.status_code == 200, resp.text
+        return sorted(p["name"] for p in resp.json())
+
+    assert await names("ball") == ["Tennis Ball"]
+    assert await names("BAT racket") == ["Cricket Bat"]
+    assert await names("") == ["Cricket Bat", "Tennis Ball"]
+    assert await names("   ") == []
+
+
+async def test_writes_advance_the_catalog_version(product_api):
+    before = int((await product_api.get("/catalog/version")).json()["version"])
+    ball = await _create(product_api, "Tennis Ball", 10)
+    await product_api.post(f"/{ball['id']}/reduce_stock", json={"quantity": 1})
+    assert int((await product_api.get("/catalog/version")).json()["version"]) == before + 2
+
+    assert (await product_api.post("/reset_db")).status_code == 200
+    assert int((await product_api.get("/catalog/version")).json()["version"]) == before + 3
+    assert (await product_api.get(f"/{ball['id']}")).status_code == 404
+
+
+def _cursor(*key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+async def test_cursor_pagination_by_price(product_api):
+    for name, price in [("Ball", 3.0), ("Bat", 1.0), ("Net", 2.0), ("Cap", 2.0)]:
+        await _create(product_api, name, 1, price=price)
+
+    names, after = [], None
+    while True:
+        params = {"sort": "price", "limit": 3, **({"after": after} if after else {})}
+        resp = await product_api.get("/", params=params)
+        assert resp.status_code == 200, resp.text
+        names += [p["name"] for p in resp.json()]
+        after = resp.headers.get("X-Next-Cursor")
+        if not after:
+            break
+    assert names == ["Bat", "Net", "Cap", "Ball"]
+
+
+async def test_bad_cursors_are_rejected(product_api):
+    bad = {
+        "id": ["not base64 json", _cursor("id"), _cursor("id", "1"), _cursor("id", 1, 2), _cursor("price", 1)],
+        "price": [_cursor("price", 1.0), _cursor("price", "cheap", 1), _cursor("price", 1.0, 1.5), _cursor("price", True, 1)],
+        "name": [_cursor("name", 5, 1), _cursor("name", "Ball", None)],
+    }
+    for sort, cursors in bad.items():
+        for after in cursors:
+            resp = await product_api.get("/", params={"sort": sort, "limit": 2, "after": after})
+            assert resp.status_code == 400, (sort, after)
+
+    resp = await product_api.get("/", params={"sort": "name", "limit": 2, "after": _cursor("name", "Ball", 1)})
+    assert resp.status_code == 200
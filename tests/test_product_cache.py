@@ -0,0 +1,140 @@
+"""ProductCache: writes drop only the products they touched, and in-flight loads of those."""
+import asyncio
+
+from services.product_service.cache import ProductCache
+from services.product_service.schemas import ProductResponse
+
+
+def _product(product_id: int, stock: int = 10) -> ProductResponse:
+    return ProductResponse(id=product_id, name=f"Product {product_id}", price=1.0, stock=stock)
+
+
+def test_invalidate_drops_only_that_product():
+    cache = ProductCache(maxsize=10, ttl_seconds=60)
+    cache.put(1, _product(1), cache.generation)
+    cache.put(2, _product(2), cache.generation)
+
+    cache.invalidate(1)
+    assert cache.get(1) is None
+    assert cache.get(2) is not None
+
+
+async def test_load_racing_a_write_to_the_same_product_is_discarded():
+    cache = ProductCache(maxsize=10, ttl_seconds=60)
+    loading = asyncio.Event()
+    written = asyncio.Event()
+
+    async def slow_loader():
+        loading.set()
+        await written.wait()
+        return _product(1, stock=10)  # read before the write landed
+
+    load = asyncio.create_task(cache.get_or_load(1, slow_loader))
+    await loading.wait()
+    cache.invalidate(1)  # e.g. reduce_stock committed stock=9
+    written.set()
+
+    assert (await load).stock == 10  # the caller still gets its answer...
+    assert cache.get(1) is None  # ...but it is not cached
+
+
+async def test_load_racing_a_write_to_another_product_is_kept():
+    cache = ProductCache(maxsize=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate(2)  # checkout traffic on another product
+    cache.put(1, _product(1), generation)
+    assert cache.get(1) is not None
+
+
+def test_put_with_a_generation_from_before_the_write_is_ignored():
+    cache = ProductCache(maxsize=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate(1, 3)
+    cache.put(1, _product(1), generation)
+    cache.put(3, _product(3), generation)
+    assert cache.get(1) is None
+    assert cache.get(3) is None
+
+    cache.put(1, _product(1), cache.generation)
+    assert cache.get(1) is not None
+
+
+def test_trimmed_stamps_stay_conservative():
+    cache = ProductCache(maxsize=2, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate(1)
+    cache.invalidate(2)
+    cache.invalidate(3)  # 1's stamp is trimmed away
+
+    cache.put(1, _product(1), generation)
+    assert cache.get(1) is None
+    # A load started after the trim is fine again
+    cache.put(1, _product(1), cache.generation)
+    assert cache.get(1) is not None
+
+
+def test_clear_discards_everything_in_flight():
+    cache = ProductCache(maxsize=10, ttl_seconds=60)
+    cache.put(1, _product(1), cache.generation)
+    generation = cache.generation
+
+    cache.clear()
+    assert cache.get(1) is None
+    cache.put(2, _product(2), generation)
+    assert cache.get(2) is None
+
+
+def test_ttl_expiry(monkeypatch):
+    from services.product_service import cache as cache_module
+
+    clock = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: clock[0])
+    cache = ProductCache(maxsize=10, ttl_seconds=30)
+    cache.put(1, _product(1), cache.generation)
+
+    clock[0] += 29
+    assert cache.get(1) is not None
+    clock[0] += 2
+    assert cache.get(1) is None
+
+
+async def test_writes_advance_the_shared_catalog_version(monkeypatch):
+    from services.product_service import service as service_module
+    from services.product_service.repository import ProductRepository
+
+    calls = []
+
+    async def reduce_stock(db, product_id, quantity):
+        calls.append("write")
+        return _product(product_id)
+
+    async def bump_catalog_version(db):
+        calls.append("bump")
+
+    cache = ProductCache(maxsize=10, ttl_seconds=60)
+    cache.put(1, _product(1), cache.generation)
+    monkeypatch.setattr(service_module, "product_cache", cache)
+    monkeypatch.setattr(ProductRepository, "reduce_stock", reduce_stock)
+    monkeypatch.setattr(ProductRepository, "bump_catalog_version", bump_catalog_version)
+
+    await service_module.ProductService.reduce_stock(None, 1, 1)
+    # Bumped only after the write has committed, never before
+    assert calls == ["write", "bump"]
+    assert cache.get(1) is None
+
+
+async def test_failing_version_bump_does_not_fail_the_committed_write(monkeypatch):
+    from services.product_service import service as service_module
+    from services.product_service.repository import ProductRepository
+
+    async def reduce_stock(db, product_id, quantity):
+        return _product(product_id, stock=9)
+
+    async def bump_catalog_version(db):
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(service_module, "product_cache", ProductCache(maxsize=10, ttl_seconds=60))
+    monkeypatch.setattr(ProductRepository, "reduce_stock", reduce_stock)
+    monkeypatch.setattr(ProductRepository, "bump_catalog_version", bump_catalog_version)
+
+    assert (await service_module.ProductService.reduce_stock(None, 1, 1)).stock == 9
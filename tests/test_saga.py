@@ -0,0 +1,175 @@
+"""SagaOrchestrator DAG executor: dependency order, parallel branches, abort and rollback."""
+import asyncio
+
+import pytest
+
+from services.orchestrator.saga import SagaOrchestrator
+
+STEP_SECONDS = 0.02
+
+
+class Steps:
+    """Fake saga steps that log start/end/undo events; `fail` steps raise, `slow` ones take longer."""
+
+    def __init__(self, fail=(), slow=(), fail_undo=()):
+        self.events: list[tuple[str, str]] = []
+        self.fail, self.slow, self.fail_undo = set(fail), set(slow), set(fail_undo)
+        self.active = 0
+        self.peak = 0
+
+    def action(self, name):
+        async def run(ctx):
+            self.events.append(("start", name))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(STEP_SECONDS * (3 if name in self.slow else 1))
+            self.active -= 1
+            if name in self.fail:
+                self.events.append(("fail", name))
+                raise RuntimeError(f"{name} failed")
+            ctx.setdefault("done", []).append(name)
+            self.events.append(("end", name))
+        return run
+
+    def compensation(self, name):
+        async def undo(ctx):
+            self.events.append(("undo", name))
+            if name in self.fail_undo:
+                raise RuntimeError(f"undo {name} failed")
+        return undo
+
+    def add(self, saga, name, **kwargs):
+        saga.add_step(name, self.action(name), self.compensation(name), **kwargs)
+
+    def at(self, kind, name) -> int:
+        return self.events.index((kind, name))
+
+    def of(self, kind) -> list[str]:
+        return [name for event, name in self.events if event == kind]
+
+
+def _checkout(steps: Steps) -> SagaOrchestrator:
+    """reserve -> (order, payment) -> confirm"""
+    saga = SagaOrchestrator("checkout")
+    steps.add(saga, "reserve")
+    steps.add(saga, "order", depends_on=["reserve"])
+    steps.add(saga, "payment", depends_on=["reserve"])
+    steps.add(saga, "confirm", depends_on=["order", "payment"])
+    return saga
+
+
+async def test_steps_run_sequentially_by_default():
+    steps = Steps()
+    saga = SagaOrchestrator()
+    for name in ("a", "b", "c"):
+        steps.add(saga, name)
+
+    ctx = {}
+    assert await saga.execute(ctx) is True
+    assert ctx["done"] == ["a", "b", "c"]
+    assert steps.peak == 1
+    assert steps.at("end", "a") < steps.at("start", "b")
+    assert steps.at("end", "b") < steps.at("start", "c")
+
+
+async def test_independent_branches_run_in_parallel_after_their_dependency():
+    steps = Steps()
+    await _checkout(steps).execute({})
+
+    assert steps.peak == 2
+    assert steps.at("end", "reserve") < steps.at("start", "order")
+    assert steps.at("end", "reserve") < steps.at("start", "payment")
+    # The join waits for both branches
+    assert steps.at("end", "order") < steps.at("start", "confirm")
+    assert steps.at("end", "payment") < steps.at("start", "confirm")
+    assert steps.of("undo") == []
+
+
+async def test_failure_mid_dag_lets_in_flight_steps_finish_and_starts_nothing_new():
+    steps = Steps(fail={"payment"}, slow={"order"})
+    with pytest.raises(RuntimeError, match="payment failed"):
+        await _checkout(steps).execute({})
+
+    # order was already running when payment failed: it completes, then is undone
+    assert steps.at("fail", "payment") < steps.at("end", "order")
+    assert "confirm" not in steps.of("start")
+    assert steps.at("end", "order") < steps.at("undo", "order")
+
+
+async def test_rollback_undoes_only_completed_steps_in_reverse_completion_order():
+    steps = Steps(fail={"payment"}, slow={"order"})
+    with pytest.raises(RuntimeError):
+        await _checkout(steps).execute({})
+
+    # payment failed (nothing to undo), confirm never ran
+    assert steps.of("undo") == ["order", "reserve"]
+
+
+async def test_a_failing_compensation_does_not_stop_the_others():
+    steps = Steps(fail={"c"}, fail_undo={"b"})
+    saga = SagaOrchestrator()
+    for name in ("a", "b", "c"):
+        steps.add(saga, name)
+
+    with pytest.raises(RuntimeError, match="c failed"):
+        await saga.execute({})
+    assert steps.of("undo") == ["b", "a"]
+
+
+async def test_steps_without_a_compensation_are_skipped_on_rollback():
+    steps = Steps(fail={"c"})
+    saga = SagaOrchestrator()
+    steps.add(saga, "a")
+    saga.add_step("b", steps.action("b"))
+    steps.add(saga, "c")
+
+    with pytest.raises(RuntimeError):
+        await saga.execute({})
+    assert steps.of("undo") == ["a"]
+
+
+async def test_failure_is_queued_when_the_queue_is_enabled():
+    class Queue:
+        enabled = True
+
+        def __init__(self):
+            self.queued = []
+
+        async def enqueue(self, saga_name, failed_step, plan, ctx):
+            self.queued.append((saga_name, failed_step, plan))
+
+    steps = Steps(fail={"confirm"})
+    saga = _checkout(steps)
+    saga.compensation_queue = queue = Queue()
+    with pytest.raises(RuntimeError):
+        await saga.execute({})
+
+    [(saga_name, failed_step, plan)] = queue.queued
+    assert (saga_name, failed_step) == ("checkout", "confirm")
+    assert plan[-1] == "reserve" and sorted(plan[:2]) == ["order", "payment"]
+    assert steps.of("undo") == []  # The worker runs them, not the request
+
+
+async def test_unstorable_plan_falls_back_to_inline_rollback():
+    class Queue:
+        enabled = True
+
+        async def enqueue(self, *args):
+            raise ConnectionError("database unavailable")
+
+    steps = Steps(fail={"b"})
+    saga = SagaOrchestrator(compensation_queue=Queue())
+    steps.add(saga, "a")
+    steps.add(saga, "b")
+    with pytest.raises(RuntimeError):
+        await saga.execute({})
+    assert steps.of("undo") == ["a"]
+
+
+def test_add_step_rejects_duplicates_and_unknown_dependencies():
+    saga = SagaOrchestrator()
+    saga.add_step("a", None)
+    with pytest.raises(ValueError, match="Duplicate"):
+        saga.add_step("a", None)
+    with pytest.raises(ValueError, match="unknown"):
+        saga.add_step("b", None, depends_on=["later"])
@@ -0,0 +1,136 @@
+"""Stock holds, bucketed availability and the reaper, against a real database (see conftest.py)."""
+from sqlalchemy import select, text
+
+from services.product_service import service as service_module
+from services.product_service.models import Product, StockBucket
+from services.product_service.service import StockHoldService
+
+
+async def _create(product_api, name: str, stock: int) -> int:
+    resp = await product_api.post("/", json={"name": name, "price": 5.0, "stock": stock})
+    assert resp.status_code == 200, resp.text
+    return resp.json()["id"]
+
+
+async def _stock(product_api, product_id: int) -> int:
+    return (await product_api.get(f"/{product_id}")).json()["stock"]
+
+
+async def _hold(product_api, product_id: int, quantity: int) -> dict:
+    resp = await product_api.post("/holds", json={"product_id": product_id, "quantity": quantity})
+    assert resp.status_code == 200, resp.text
+    return resp.json()
+
+
+async def _split(db, product_id: int) -> tuple[int, int]:
+    """(products.stock, units in buckets)."""
+    stock = (await db.execute(select(Product.stock).where(Product.id == product_id))).scalar_one()
+    bucketed = (await db.execute(
+        select(StockBucket.available).where(StockBucket.product_id == product_id)
+    )).scalars().all()
+    return stock, sum(bucketed)
+
+
+async def test_hold_moves_stock_into_buckets_and_reads_still_count_it(product_api, db):
+    ball = await _create(product_api, "Tennis Ball", 50)
+
+    hold = await _hold(product_api, ball, 2)
+    assert hold["status"] == "held"
+    assert await _stock(product_api, ball) == 48
+    stock, bucketed = await _split(db, ball)
+    assert bucketed > 0
+    assert stock + bucketed == 48
+
+
+async def test_direct_paths_sell_units_parked_in_buckets(product_api, db):
+    ball = await _create(product_api, "Tennis Ball", 30)
+    await _hold(product_api, ball, 1)
+    stock, bucketed = await _split(db, ball)
+    assert stock < 25 <= stock + bucketed
+
+    resp = await product_api.post(f"/{ball}/reduce_stock", json={"quantity": 25})
+    assert resp.status_code == 200, resp.text
+    assert await _stock(product_api, ball) == 4
+
+    resp = await product_api.post("/reserve_stock", json={"items": [{"product_id": ball, "quantity": 4}]})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()[0]["stock"] == 0
+    assert await _split(db, ball) == (0, 0)
+
+    resp = await product_api.post(f"/{ball}/reduce_stock", json={"quantity": 1})
+    assert resp.status_code == 400
+    assert "Insufficient stock" in resp.json()["detail"]
+
+
+async def test_hold_insufficient_stock(product_api):
+    ball = await _create(product_api, "Tennis Ball", 3)
+    resp = await product_api.post("/holds", json={"product_id": ball, "quantity": 4})
+    assert resp.status_code == 400
+    assert "Insufficient stock" in resp.json()["detail"]
+
+
+async def test_release_returns_the_units_and_is_idempotent(product_api):
+    ball = await _create(product_api, "Tennis Ball", 10)
+    hold = await _hold(product_api, ball, 3)
+
+    resp = await product_api.post(f"/holds/{hold['id']}/release")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "released"
+    assert await _stock(product_api, ball) == 10
+
+    resp = await product_api.post(f"/holds/{hold['id']}/release")
+    assert resp.status_code == 200
+    assert await _stock(product_api, ball) == 10
+
+
+async def test_confirm_keeps_the_units_sold(product_api):
+    ball = await _create(product_api, "Tennis Ball", 10)
+    hold = await _hold(product_api, ball, 3)
+
+    resp = await product_api.post(f"/holds/{hold['id']}/confirm")
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "confirmed"
+    assert await _stock(product_api, ball) == 7
+
+    # A confirmed hold can no longer be released
+    await product_api.post(f"/holds/{hold['id']}/release")
+    assert await _stock(product_api, ball) == 7
+    assert (await product_api.post("/holds/missing/confirm")).status_code == 404
+
+
+async def test_reaper_expires_overdue_holds(product_api, db):
+    ball = await _create(product_api, "Tennis Ball", 10)
+    hold = await _hold(product_api, ball, 3)
+    await db.execute(text("UPDATE product_schema.stock_holds SET expires_at = now() - interval '1 second'"))
+    await db.commit()
+
+    await StockHoldService.reap_once(db)
+    status = (await db.execute(text("SELECT status FROM product_schema.stock_holds"))).scalar_one()
+    assert status == "expired"
+    assert await _stock(product_api, ball) == 10
+
+    resp = await product_api.post(f"/holds/{hold['id']}/confirm")
+    assert resp.status_code == 409
+
+
+async def test_confirming_an_overdue_hold_releases_it(product_api, db):
+    ball = await _create(product_api, "Tennis Ball", 10)
+    hold = await _hold(product_api, ball, 3)
+    await db.execute(text("UPDATE product_schema.stock_holds SET expires_at = now() - interval '1 second'"))
+    await db.commit()
+
+    # Past its TTL before the reaper ran: confirm refuses and gives the units back
+    resp = await product_api.post(f"/holds/{hold['id']}/confirm")
+    assert resp.status_code == 409
+    assert await _stock(product_api, ball) == 10
+
+
+async def test_reaper_folds_idle_buckets_back(product_api, db, monkeypatch):
+    ball = await _create(product_api, "Tennis Ball", 50)
+    await _hold(product_api, ball, 2)
+    assert (await _split(db, ball))[1] > 0
+
+    monkeypatch.setattr(service_module, "STOCK_BUCKET_IDLE_SECONDS", 0)
+    await StockHoldService.reap_once(db)
+    assert await _split(db, ball) == (48, 0)
+    assert await _stock(product_api, ball) == 48
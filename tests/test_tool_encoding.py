@@ -0,0 +1,75 @@
+"""tool_encoding: the table format round-trips and degrades to the old repr on request."""
+import pytest
+
+from services.orchestrator.llm_provider import _parse_products
+from services.orchestrator.tool_encoding import (
+    CART_FIELDS,
+    PRODUCT_FIELDS,
+    decode_table,
+    encode_cart,
+    encode_products,
+    encode_table,
+)
+
+PRODUCTS = [
+    {"id": 3, "name": "Tennis Ball", "price": 5.0, "stock": 50, "sku": "TB-1"},
+    {"id": 4, "name": "Ping Pong Ball", "price": 4.5, "stock": 0, "sku": "PP-1"},
+]
+CART = {
+    "session_id": "s-1",
+    "user_id": 1,
+    "is_active": True,
+    "items": [{"product_id": 3, "quantity": 2, "name": "Tennis Ball", "price": 5.0}],
+}
+
+
+def test_products_table_keeps_only_agent_fields():
+    text = encode_products(PRODUCTS, "table")
+    assert text.splitlines() == ["id|name|price|stock", "3|Tennis Ball|5.0|50", "4|Ping Pong Ball|4.5|0"]
+    assert "sku" not in text
+
+
+def test_round_trip_restores_numbers():
+    rows = decode_table(encode_products(PRODUCTS, "table"))
+    assert rows == [{field: p[field] for field in PRODUCT_FIELDS} for p in PRODUCTS]
+    assert isinstance(rows[0]["id"], int)
+    assert isinstance(rows[0]["price"], float)
+
+
+def test_cart_table():
+    rows = decode_table(encode_cart(CART, "table"))
+    assert rows == [{field: CART["items"][0][field] for field in CART_FIELDS}]
+
+
+@pytest.mark.parametrize("cart", [None, {"items": []}, {"session_id": "s-1"}])
+def test_empty_cart(cart):
+    assert encode_cart(cart, "table") == "Cart is empty."
+
+
+def test_no_products():
+    assert encode_products([], "table") == "No products found."
+    assert _parse_products(encode_products([], "table")) == []
+
+
+def test_delimiter_and_newline_in_a_cell_do_not_shift_columns():
+    text = encode_table([{"id": 1, "name": "Bat | Glove\nSet", "price": None, "stock": 2}], PRODUCT_FIELDS)
+    assert decode_table(text) == [{"id": 1, "name": "Bat / Glove Set", "price": "", "stock": 2}]
+
+
+def test_decode_rejects_ragged_rows():
+    with pytest.raises(ValueError):
+        decode_table("id|name\n1|a|b")
+
+
+def test_repr_format_is_the_previous_output():
+    assert encode_products(PRODUCTS, "repr") == str(PRODUCTS)
+    assert encode_cart(CART, "repr") == str(CART)
+    assert encode_cart(None, "repr") == "Cart is empty."
+
+
+@pytest.mark.parametrize("fmt", ["table", "repr"])
+def test_fake_model_reads_both_formats(fmt):
+    parsed = _parse_products(encode_products(PRODUCTS, fmt))
+    assert [(p["id"], p["name"], p["price"], p["stock"]) for p in parsed] == [
+        (p["id"], p["name"], p["price"], p["stock"]) for p in PRODUCTS
+    ]
@@ -0,0 +1,151 @@
+"""ParallelToolNode: results in call order, cart writes serialized per session, per-tool caps."""
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from services.orchestrator import tool_executor
+from services.orchestrator.tool_executor import ParallelToolNode, ToolConcurrencyLimits, _parse_limits
+from services.orchestrator.tools import session_locks
+
+STEP_SECONDS = 0.02
+
+
+class Recorder:
+    """Tools that log when each call starts and ends, and how many ran at once."""
+
+    def __init__(self):
+        self.events: list[tuple] = []
+        self.active = 0
+        self.peak = 0
+
+    def build(self):
+        async def step(event: tuple):
+            self.events.append(("start",) + event)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(STEP_SECONDS)
+            self.active -= 1
+            self.events.append(("end",) + event)
+
+        @tool
+        async def search_products(query: str = "") -> str:
+            """Search."""
+            await step(("search", query))
+            return f"results for {query}"
+
+        @tool
+        async def add_to_cart(session_id: str, product_id: int, quantity: int) -> str:
+            """Add."""
+            await step(("add", session_id, product_id))
+            return f"added {product_id} to {session_id}"
+
+        @tool
+        async def remove_from_cart(session_id: str, product_id: int) -> str:
+            """Remove."""
+            await step(("remove", session_id, product_id))
+            return f"removed {product_id} from {session_id}"
+
+        return [search_products, add_to_cart, remove_from_cart]
+
+    def index(self, kind: str, *event) -> int:
+        return self.events.index((kind,) + event)
+
+
+def _call(name: str, call_id: str, **args) -> dict:
+    return {"name": name, "args": args, "id": call_id, "type": "tool_call"}
+
+
+async def _run(node: ParallelToolNode, calls: list[dict]):
+    out = await node.ainvoke({"messages": [AIMessage(content="", tool_calls=calls)]})
+    return out["messages"]
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+@pytest.fixture
+def node(recorder):
+    return ParallelToolNode(recorder.build(), agent="Sales")
+
+
+async def test_results_come_back_in_call_order(node):
+    calls = [
+        _call("add_to_cart", "c0", session_id="s1", product_id=1, quantity=1),
+        _call("search_products", "c1", query="ball"),
+        _call("remove_from_cart", "c2", session_id="s1", product_id=1),
+        _call("no_such_tool", "c3"),
+        _call("search_products", "c4", query="bat"),
+    ]
+    messages = await _run(node, calls)
+
+    assert [m.tool_call_id for m in messages] == ["c0", "c1", "c2", "c3", "c4"]
+    assert messages[1].content == "results for ball"
+    assert messages[2].content == "removed 1 from s1"
+    assert "no_such_tool" in messages[3].content
+
+
+async def test_writes_to_one_session_apply_in_call_order(node, recorder):
+    calls = [
+        _call("add_to_cart", "c0", session_id="s1", product_id=1, quantity=1),
+        _call("add_to_cart", "c1", session_id="s1", product_id=2, quantity=1),
+        _call("remove_from_cart", "c2", session_id="s1", product_id=1),
+        _call("add_to_cart", "c3", session_id="s1", product_id=3, quantity=1),
+    ]
+    await _run(node, calls)
+
+    # Consecutive adds go out together (so CartBatcher can coalesce them)...
+    assert recorder.index("start", "add", "s1", 2) < recorder.index("end", "add", "s1", 1)
+    # ...but the remove waits for both, and the later add waits for the remove
+    assert recorder.index("end", "add", "s1", 1) < recorder.index("start", "remove", "s1", 1)
+    assert recorder.index("end", "add", "s1", 2) < recorder.index("start", "remove", "s1", 1)
+    assert recorder.index("end", "remove", "s1", 1) < recorder.index("start", "add", "s1", 3)
+
+
+async def test_other_sessions_and_reads_are_not_serialized(node, recorder):
+    calls = [
+        _call("remove_from_cart", "c0", session_id="s1", product_id=1),
+        _call("remove_from_cart", "c1", session_id="s2", product_id=1),
+        _call("search_products", "c2", query="ball"),
+    ]
+    await _run(node, calls)
+    assert recorder.peak == 3
+
+
+async def test_step_waits_for_a_session_held_elsewhere(node, recorder):
+    async def other_request():
+        async with session_locks.hold("s1"):
+            recorder.events.append(("other", "s1"))
+            await asyncio.sleep(STEP_SECONDS * 2)
+            recorder.events.append(("other-done", "s1"))
+
+    holder = asyncio.create_task(other_request())
+    await asyncio.sleep(0)
+    await _run(node, [
+        _call("remove_from_cart", "c0", session_id="s1", product_id=1),
+        _call("remove_from_cart", "c1", session_id="s2", product_id=1),
+    ])
+    await holder
+
+    assert recorder.events.index(("other-done", "s1")) < recorder.index("start", "remove", "s1", 1)
+    # s2 was free and did not wait
+    assert recorder.index("start", "remove", "s2", 1) < recorder.events.index(("other-done", "s1"))
+
+
+async def test_per_tool_concurrency_cap(node, recorder, monkeypatch):
+    monkeypatch.setattr(tool_executor, "tool_limits", ToolConcurrencyLimits(8, {"search_products": 2}))
+    await _run(node, [_call("search_products", f"c{i}", query=str(i)) for i in range(6)])
+    assert recorder.peak == 2
+
+
+def test_add_to_cart_is_uncapped_unless_listed():
+    assert ToolConcurrencyLimits(1, {}).get("add_to_cart") is None
+    assert ToolConcurrencyLimits(1, {"add_to_cart": 3}).get("add_to_cart") is not None
+
+
+def test_parse_limits():
+    assert _parse_limits("") == {}
+    assert _parse_limits(" search_products=4, checkout=2 ,") == {"search_products": 4, "checkout": 2}